@@ -2,9 +2,21 @@
 ComfyUI Replicate Nodes - Core Module
 """
 
-from .replicate_client import ReplicateClient, ModelInfo, PredictionStatus
+from .replicate_client import ReplicateClient, ReplicateAPIError, PredictionFailedError, ModelInfo, PredictionStatus, StreamEvent
+from .polling import PollingPolicy, CompletionHistory, get_completion_history
+from .rate_limit import RateLimitConfig, RateLimiter, TokenBucket, get_rate_limiter
+from .concurrency import AdaptiveConcurrencyLimiter, get_concurrency_limiter
+from .retry import RetryPolicy, CircuitBreaker, CircuitOpenError, ReplicateNetworkError, AmbiguousCreateError
+from .batch import ImageBatchBuffer, BatchCheckpoint
+from .hedging import HedgeBudget, get_hedge_budget
+from .codec import CodecConfig, CodecPool, get_codec_pool
+from .image_cache import ImageCache, get_image_cache
+from .lifecycle import PredictionLifecycle, LifecycleRegistry, get_lifecycle_registry
+from .client_pool import ClientPoolConfig, ReplicateClientPool, get_client_pool
+from .runtime import BackgroundLoopRunner, get_background_runner
 from .utils import (
     load_api_token, save_api_token, convert_image_to_base64,
+    UploadEncoding, EncodedImage, encode_image,
     format_model_display_name, extract_model_schema, get_parameter_type,
     get_parameter_options, is_image_parameter, sanitize_inputs,
     format_error_message
@@ -12,8 +24,20 @@ from .utils import (
 from .nodes import NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS
 
 __all__ = [
-    'ReplicateClient', 'ModelInfo', 'PredictionStatus',
+    'ReplicateClient', 'ReplicateAPIError', 'PredictionFailedError', 'ModelInfo', 'PredictionStatus', 'StreamEvent',
+    'PollingPolicy', 'CompletionHistory', 'get_completion_history',
+    'RateLimitConfig', 'RateLimiter', 'TokenBucket', 'get_rate_limiter',
+    'AdaptiveConcurrencyLimiter', 'get_concurrency_limiter',
+    'RetryPolicy', 'CircuitBreaker', 'CircuitOpenError', 'ReplicateNetworkError', 'AmbiguousCreateError',
+    'ImageBatchBuffer', 'BatchCheckpoint',
+    'HedgeBudget', 'get_hedge_budget',
+    'CodecConfig', 'CodecPool', 'get_codec_pool',
+    'ImageCache', 'get_image_cache',
+    'PredictionLifecycle', 'LifecycleRegistry', 'get_lifecycle_registry',
+    'ClientPoolConfig', 'ReplicateClientPool', 'get_client_pool',
+    'BackgroundLoopRunner', 'get_background_runner',
     'load_api_token', 'save_api_token', 'convert_image_to_base64',
+    'UploadEncoding', 'EncodedImage', 'encode_image',
     'format_model_display_name', 'extract_model_schema', 'get_parameter_type',
     'get_parameter_options', 'is_image_parameter', 'sanitize_inputs',
     'format_error_message',
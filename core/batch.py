@@ -0,0 +1,185 @@
+"""
+Large-batch support
+Preallocated output buffer and on-disk checkpoints for node runs that
+generate hundreds of images in waves
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+from PIL import Image
+
+from .utils import read_env_setting
+
+logger = logging.getLogger(__name__)
+
+
+class ImageBatchBuffer:
+    """Fixed-capacity float32 image batch filled as results arrive
+
+    The array is allocated once, from the shape of the first image, so the
+    final batch is never assembled by stacking a list of copies. Images of a
+    different size are resized to the batch shape.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.count = 0
+        self._data: Optional[np.ndarray] = None
+
+    @property
+    def shape(self) -> Optional[tuple]:
+        return None if self._data is None else self._data.shape[1:]
+
+    def put(self, image: np.ndarray) -> int:
+        """Store one HxWxC image (float32 0-1); returns its index"""
+        if self.count >= self.capacity:
+            raise IndexError("Image batch is full")
+
+        if self._data is None:
+            self._data = np.empty((self.capacity,) + image.shape, dtype=np.float32)
+        elif image.shape != self._data.shape[1:]:
+            height, width = self._data.shape[1:3]
+            logger.warning(
+                "Resizing %sx%s output to batch size %sx%s",
+                image.shape[1], image.shape[0], width, height,
+            )
+            resized = Image.fromarray(np.clip(image * 255.0, 0, 255).astype(np.uint8)).resize(
+                (width, height), Image.LANCZOS
+            )
+            image = np.asarray(resized, dtype=np.float32) / 255.0
+
+        self._data[self.count] = image
+        self.count += 1
+        return self.count - 1
+
+    def result(self) -> Optional[np.ndarray]:
+        """The filled part of the batch (a view, not a copy)"""
+        if self._data is None:
+            return None
+        return self._data[: self.count]
+
+
+def _replace_image_values(value: Any, image_keys: Dict[str, str]) -> Any:
+    if isinstance(value, str) and value in image_keys:
+        return f"image:{image_keys[value]}"
+    if isinstance(value, list):
+        return [_replace_image_values(item, image_keys) for item in value]
+    return value
+
+
+class BatchCheckpoint:
+    """Completed images of one large batch, kept on disk until it finishes
+
+    A rerun of the same node with the same inputs and count picks up from
+    the saved images instead of generating them again.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @classmethod
+    def for_run(cls, model_key: str, payload: Dict[str, Any], desired_count: int,
+                root: Optional[str] = None,
+                image_keys: Optional[Dict[str, str]] = None) -> "BatchCheckpoint":
+        """Checkpoint of one run, identified by model, payload and count
+
+        Payload values found in ``image_keys`` (upload URLs or data URIs of
+        reference images) are identified by their content key instead, as
+        re-uploading the same image yields a new URL.
+        """
+        if image_keys:
+            payload = {name: _replace_image_values(value, image_keys) for name, value in payload.items()}
+        if root is None:
+            plugin_root = os.path.dirname(os.path.dirname(__file__))
+            root = read_env_setting(
+                'REPLICATE_CHECKPOINT_DIR', os.path.join(plugin_root, 'batch_checkpoints')
+            )
+        identity = json.dumps(
+            {"model": model_key, "payload": payload, "count": desired_count},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        digest = hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+        cls.prune(root, read_env_setting('REPLICATE_CHECKPOINT_MAX_AGE_DAYS', 7.0) * 86400)
+        return cls(os.path.join(root, f"{model_key.replace('/', '_')}-{digest}"))
+
+    @classmethod
+    def prune(cls, root: str, max_age: float) -> int:
+        """Delete checkpoints of runs abandoned more than ``max_age`` seconds ago"""
+        try:
+            names = os.listdir(root)
+        except OSError:
+            return 0
+
+        removed = 0
+        cutoff = time.time() - max_age
+        for name in names:
+            directory = os.path.join(root, name)
+            try:
+                if not os.path.isdir(directory) or os.path.getmtime(directory) >= cutoff:
+                    continue
+            except OSError:
+                continue
+            shutil.rmtree(directory, ignore_errors=True)
+            removed += 1
+        if removed:
+            logger.info("Removed %d stale batch checkpoint(s) from %s", removed, root)
+        return removed
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, self.MANIFEST)
+
+    def _image_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"{index:05d}.png")
+
+    def completed(self) -> int:
+        try:
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                return int(json.load(f).get("completed", 0))
+        except (OSError, ValueError, TypeError):
+            return 0
+
+    def load(self, limit: Optional[int] = None) -> Iterator[np.ndarray]:
+        """Images saved by an earlier run, in order, decoded one at a time
+
+        Callers copy each image into their own storage (e.g. an
+        ImageBatchBuffer) before asking for the next, so a resume never holds
+        the saved images twice.
+        """
+        count = self.completed()
+        if limit is not None:
+            count = min(count, limit)
+        for index in range(count):
+            try:
+                with Image.open(self._image_path(index)) as image:
+                    pixels = np.asarray(image.convert("RGB"))
+            except OSError as exc:
+                logger.warning("Ignoring unreadable checkpoint image %d: %s", index, exc)
+                return
+            yield pixels.astype(np.float32) / 255.0
+
+    def save(self, images: np.ndarray, start: int) -> None:
+        """Persist images ``start`` onwards of ``images`` and advance the manifest"""
+        os.makedirs(self.directory, exist_ok=True)
+        for index in range(start, len(images)):
+            pixels = np.clip(images[index] * 255.0, 0, 255).round().astype(np.uint8)
+            # Fast compression: checkpoints are temporary
+            Image.fromarray(pixels).save(self._image_path(index), format="PNG", compress_level=1)
+
+        tmp_path = f"{self._manifest_path()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"completed": len(images)}, f)
+        os.replace(tmp_path, self._manifest_path())
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
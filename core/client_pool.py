@@ -0,0 +1,144 @@
+"""
+Shared Replicate client pool
+Keeps one long-lived aiohttp session per API token so node executions reuse
+TCP connections and TLS handshakes instead of opening a new session each call
+"""
+
+import asyncio
+import atexit
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+from .replicate_client import ReplicateClient
+from .utils import read_env_setting
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.replicate.com/v1"
+
+
+@dataclass
+class ClientPoolConfig:
+    """Connection settings for pooled sessions"""
+    limit: int = 100
+    limit_per_host: int = 20
+    keepalive_timeout: float = 60.0
+    total_timeout: float = 300.0
+    poll_rate: float = 10.0  # shared status-poll budget per client, requests/second
+    download_concurrency: int = 8  # parallel output downloads per client
+    download_timeout: float = 120.0
+
+    @classmethod
+    def from_env(cls) -> "ClientPoolConfig":
+        """Build config from REPLICATE_POOL_* environment variables"""
+        defaults = cls()
+        return cls(
+            limit=read_env_setting('REPLICATE_POOL_LIMIT', defaults.limit),
+            limit_per_host=read_env_setting('REPLICATE_POOL_LIMIT_PER_HOST', defaults.limit_per_host),
+            keepalive_timeout=read_env_setting('REPLICATE_POOL_KEEPALIVE', defaults.keepalive_timeout),
+            total_timeout=read_env_setting('REPLICATE_POOL_TIMEOUT', defaults.total_timeout),
+            poll_rate=read_env_setting('REPLICATE_POLL_RATE', defaults.poll_rate),
+            download_concurrency=read_env_setting(
+                'REPLICATE_DOWNLOAD_CONCURRENCY', defaults.download_concurrency
+            ),
+            download_timeout=read_env_setting('REPLICATE_DOWNLOAD_TIMEOUT', defaults.download_timeout),
+        )
+
+
+class ReplicateClientPool:
+    """Thread-safe pool of ReplicateClient instances keyed by API token.
+
+    aiohttp sessions are bound to the event loop that created them, so each
+    pooled client is also tied to its loop and only reused from that loop.
+    """
+
+    def __init__(self, config: Optional[ClientPoolConfig] = None,
+                 base_url: str = DEFAULT_BASE_URL):
+        self.config = config or ClientPoolConfig.from_env()
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[int, str], Tuple[asyncio.AbstractEventLoop, ReplicateClient]] = {}
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.config.limit,
+            limit_per_host=self.config.limit_per_host,
+            keepalive_timeout=self.config.keepalive_timeout,
+        )
+        # No auth headers here: the session also downloads outputs from delivery hosts
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.config.total_timeout),
+        )
+
+    def get_client(self, api_token: str) -> ReplicateClient:
+        """Return the pooled client for a token on the running event loop"""
+        loop = asyncio.get_running_loop()
+        key = (id(loop), api_token)
+
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None:
+                owner_loop, client = entry
+                if owner_loop is loop and client.session is not None and not client.session.closed:
+                    return client
+
+            client = ReplicateClient(
+                api_token,
+                base_url=self.base_url,
+                session=self._create_session(),
+                max_polls_per_second=self.config.poll_rate,
+                download_concurrency=self.config.download_concurrency,
+                download_timeout=self.config.download_timeout,
+            )
+            self._clients[key] = (loop, client)
+            return client
+
+    async def release_loop(self) -> None:
+        """Close every pooled session bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            keys = [key for key, (owner_loop, _) in self._clients.items() if owner_loop is loop]
+            clients = [self._clients.pop(key)[1] for key in keys]
+
+        for client in clients:
+            await client.poller.close()
+            if client.session is not None and not client.session.closed:
+                await client.session.close()
+
+    def shutdown(self) -> None:
+        """Close all pooled sessions; safe to call from any thread"""
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+
+        for loop, client in entries:
+            session = client.session
+            if session is None or session.closed or loop.is_closed():
+                continue
+            try:
+                if loop.is_running():
+                    future = asyncio.run_coroutine_threadsafe(session.close(), loop)
+                    future.result(timeout=5)
+                else:
+                    loop.run_until_complete(session.close())
+            except Exception as e:
+                logger.warning(f"Failed to close pooled session: {str(e)}")
+
+
+_default_pool: Optional[ReplicateClientPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> ReplicateClientPool:
+    """Return the process-wide client pool, creating it on first use"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ReplicateClientPool()
+            atexit.register(_default_pool.shutdown)
+        return _default_pool
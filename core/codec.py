@@ -0,0 +1,242 @@
+"""
+Image codec worker pool
+Runs CPU-heavy image decoding and encoding on worker threads or processes
+so the event loop keeps polling while large outputs are processed
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .utils import read_env_setting
+
+logger = logging.getLogger(__name__)
+
+MODE_THREAD = "thread"
+MODE_PROCESS = "process"
+
+
+@dataclass
+class CodecConfig:
+    """Executor kind and size for image codec work"""
+    mode: str = MODE_THREAD     # thread | process
+    workers: int = 0            # 0: min(8, CPU count)
+    # Process mode: batches at least this large reach workers through shared memory
+    shared_memory_min_mb: float = 8.0
+
+    @classmethod
+    def from_env(cls) -> "CodecConfig":
+        """Build config from REPLICATE_CODEC_* environment variables"""
+        defaults = cls()
+        return cls(
+            mode=read_env_setting('REPLICATE_CODEC_MODE', defaults.mode),
+            workers=read_env_setting('REPLICATE_CODEC_WORKERS', defaults.workers),
+            shared_memory_min_mb=read_env_setting(
+                'REPLICATE_CODEC_SHM_MIN_MB', defaults.shared_memory_min_mb
+            ),
+        )
+
+
+def _timed_call(fn: Callable[..., Any], args: Tuple[Any, ...]) -> Tuple[Any, float, float]:
+    """Run ``fn`` in a worker; returns (result, start wall time, run seconds)"""
+    started = time.time()
+    run_start = time.perf_counter()
+    result = fn(*args)
+    return result, started, time.perf_counter() - run_start
+
+
+def _apply_shared(fn: Callable[[np.ndarray], Any], block_name: str,
+                  shape: Tuple[int, ...], dtype: str, index: int) -> Any:
+    """Run ``fn`` on one image of a batch held in shared memory (worker side)"""
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        batch = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        result = fn(batch[index])
+        # Views must be gone before the block can be closed
+        del batch
+        return result
+    finally:
+        block.close()
+
+
+class _TaskStats:
+    __slots__ = ('count', 'errors', 'total_run', 'max_run', 'total_wait', 'max_wait')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_run = 0.0
+        self.max_run = 0.0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_run': round(self.total_run / self.count, 4) if self.count else 0.0,
+            'max_run': round(self.max_run, 4),
+            'avg_wait': round(self.total_wait / self.count, 4) if self.count else 0.0,
+            'max_wait': round(self.max_wait, 4),
+        }
+
+
+class CodecPool:
+    """Thread or process executor for decode/encode tasks, with metrics
+
+    ``queue_depth`` counts tasks submitted but not yet finished beyond the
+    number of workers; per task name the pool records how long tasks waited
+    for a worker and how long they ran.
+    """
+
+    def __init__(self, config: Optional[CodecConfig] = None):
+        self.config = config or CodecConfig.from_env()
+        self.mode = MODE_PROCESS if self.config.mode == MODE_PROCESS else MODE_THREAD
+        self.workers = self.config.workers or min(8, os.cpu_count() or 1)
+        self._executor: Optional[concurrent.futures.Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.max_queue_depth = 0
+        self._stats: Dict[str, _TaskStats] = {}
+
+    def _get_executor(self) -> concurrent.futures.Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == MODE_PROCESS:
+                    if os.name == 'posix':
+                        # Workers then share our tracker, so blocks they attach
+                        # to are not reported as leaked when a worker exits
+                        resource_tracker.ensure_running()
+                    self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="replicate-codec"
+                    )
+            return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        with self._lock:
+            return max(0, self._pending - self.workers)
+
+    def submit(self, fn: Callable[..., Any], *args: Any,
+               name: Optional[str] = None) -> concurrent.futures.Future:
+        """Schedule ``fn(*args)``; the future resolves to its return value
+
+        In process mode ``fn`` and its arguments must be picklable.
+        """
+        task_name = name or getattr(fn, '__name__', 'task')
+        submitted = time.time()
+        with self._lock:
+            self._pending += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._pending - self.workers)
+
+        inner = self._get_executor().submit(_timed_call, fn, args)
+        outer: concurrent.futures.Future = concurrent.futures.Future()
+
+        def finished(future: concurrent.futures.Future) -> None:
+            with self._lock:
+                self._pending -= 1
+                stats = self._stats.setdefault(task_name, _TaskStats())
+                stats.count += 1
+                if future.cancelled() or future.exception() is not None:
+                    stats.errors += 1
+                else:
+                    _, started, run_time = future.result()
+                    wait = max(0.0, started - submitted)
+                    stats.total_run += run_time
+                    stats.max_run = max(stats.max_run, run_time)
+                    stats.total_wait += wait
+                    stats.max_wait = max(stats.max_wait, wait)
+
+            if future.cancelled():
+                outer.cancel()
+            elif future.exception() is not None:
+                outer.set_exception(future.exception())
+            else:
+                outer.set_result(future.result()[0])
+
+        inner.add_done_callback(finished)
+        return outer
+
+    async def run(self, fn: Callable[..., Any], *args: Any, name: Optional[str] = None) -> Any:
+        """Run ``fn(*args)`` on the pool from a coroutine"""
+        return await asyncio.wrap_future(self.submit(fn, *args, name=name))
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any],
+            name: Optional[str] = None) -> List[Any]:
+        """Apply ``fn`` to every item in parallel from synchronous code, keeping order"""
+        futures = [self.submit(fn, item, name=name) for item in items]
+        return [future.result() for future in futures]
+
+    def map_batch(self, fn: Callable[[np.ndarray], Any], batch: np.ndarray,
+                  name: Optional[str] = None) -> List[Any]:
+        """Apply ``fn`` to every image of a ``[B,...]`` array in parallel, keeping order
+
+        Threads work on views of ``batch``. In process mode a large batch is
+        copied once into a shared memory block that the workers read,
+        instead of pickling every image into every task.
+        """
+        min_bytes = self.config.shared_memory_min_mb * 1024 * 1024
+        if self.mode != MODE_PROCESS or len(batch) < 2 or batch.nbytes < min_bytes:
+            return self.map(fn, list(batch), name=name)
+
+        block = shared_memory.SharedMemory(create=True, size=batch.nbytes)
+        futures: List[concurrent.futures.Future] = []
+        try:
+            np.copyto(np.ndarray(batch.shape, dtype=batch.dtype, buffer=block.buf), batch)
+            futures = [
+                self.submit(
+                    _apply_shared, fn, block.name, batch.shape, batch.dtype.str, index, name=name
+                )
+                for index in range(len(batch))
+            ]
+            return [future.result() for future in futures]
+        finally:
+            # No worker may still be reading when the block goes away
+            concurrent.futures.wait(futures)
+            block.close()
+            block.unlink()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'workers': self.workers,
+                'queue_depth': max(0, self._pending - self.workers),
+                'in_flight': self._pending,
+                'max_queue_depth': self.max_queue_depth,
+                'tasks': {name: stats.as_dict() for name, stats in self._stats.items()},
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_pool: Optional[CodecPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_codec_pool() -> CodecPool:
+    """Return the process-wide codec pool"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = CodecPool()
+            logger.debug(
+                "Codec pool: %s mode, %d workers", _default_pool.mode, _default_pool.workers
+            )
+            atexit.register(_default_pool.shutdown)
+        return _default_pool
@@ -0,0 +1,121 @@
+"""
+Adaptive concurrency control
+AIMD limiter for the number of predictions kept in flight per model
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_CONGESTED = "congested"   # 429, 5xx or a queue-time spike
+OUTCOME_FAILED = "failed"         # errors that say nothing about capacity
+
+
+class AdaptiveConcurrencyLimiter:
+    """Additive-increase / multiplicative-decrease concurrency limit
+
+    Each healthy completion raises the limit by ``increase / limit``, i.e. by
+    ``increase`` per full window of in-flight predictions. Congestion
+    signals (rate limiting, server errors, or a queue time well above the
+    running baseline) multiply the limit by ``backoff``, at most once per
+    ``cooldown`` seconds so one burst of failures counts as one signal.
+    """
+
+    def __init__(self, initial: float = 4.0, minimum: int = 1, maximum: int = 16,
+                 increase: float = 1.0, backoff: float = 0.5, cooldown: float = 2.0,
+                 queue_spike_factor: float = 3.0, queue_spike_floor: float = 2.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.increase = increase
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.queue_spike_factor = queue_spike_factor
+        self.queue_spike_floor = queue_spike_floor
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.decreases = 0
+        self._queue_baseline: Optional[float] = None
+        self._last_decrease = float("-inf")
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def _capacity(self) -> int:
+        return max(self.minimum, int(self.limit))
+
+    async def acquire(self) -> None:
+        """Wait until a prediction slot is free"""
+        while self.in_flight >= self._capacity():
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif waiter.done() and not waiter.cancelled():
+                    # We were woken but are leaving: pass the wake-up on
+                    self._wake()
+                raise
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self, outcome: str, queue_time: Optional[float] = None) -> None:
+        """Free a slot and adapt the limit to the prediction's outcome"""
+        self.in_flight = max(0, self.in_flight - 1)
+
+        if outcome == OUTCOME_SUCCESS and self._is_queue_spike(queue_time):
+            outcome = OUTCOME_CONGESTED
+
+        if outcome == OUTCOME_SUCCESS:
+            self.limit = min(float(self.maximum), self.limit + self.increase / max(self.limit, 1.0))
+        elif outcome == OUTCOME_CONGESTED:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(float(self.minimum), self.limit * self.backoff)
+                self._last_decrease = now
+                self.decreases += 1
+
+        self._wake()
+
+    def _is_queue_spike(self, queue_time: Optional[float]) -> bool:
+        if queue_time is None or queue_time < 0:
+            return False
+        baseline = self._queue_baseline
+        self._queue_baseline = queue_time if baseline is None else 0.8 * baseline + 0.2 * queue_time
+        if baseline is None:
+            return False
+        return queue_time > max(self.queue_spike_floor, baseline * self.queue_spike_factor)
+
+    def _wake(self) -> None:
+        free = self._capacity() - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'queued': len(self._waiters),
+            'decreases': self.decreases,
+        }
+
+
+_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_concurrency_limiter(model_key: str, **kwargs: Any) -> AdaptiveConcurrencyLimiter:
+    """Return the process-wide limiter for a model, created with ``kwargs``"""
+    with _limiters_lock:
+        limiter = _limiters.get(model_key)
+        if limiter is None:
+            limiter = AdaptiveConcurrencyLimiter(**kwargs)
+            _limiters[model_key] = limiter
+        return limiter
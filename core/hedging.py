@@ -0,0 +1,71 @@
+"""
+Hedged predictions
+Budget that caps how many duplicate predictions are launched to cut the
+latency tail caused by slow (cold) starts
+"""
+
+import threading
+from typing import Any, Dict
+
+
+class HedgeBudget:
+    """Allows hedges up to a fixed fraction of primary predictions
+
+    Every primary prediction deposits ``ratio`` tokens and every hedge
+    spends one, so over time hedges add at most ``ratio`` extra predictions
+    per primary. ``reserve`` caps the balance (and is the initial balance),
+    which allows a few hedges before any history has built up.
+    """
+
+    def __init__(self, ratio: float = 0.1, reserve: float = 2.0):
+        self.ratio = max(0.0, ratio)
+        self.reserve = max(1.0, reserve)
+        self._tokens = self.reserve
+        self._lock = threading.Lock()
+        self.primaries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+    def record_primary(self) -> None:
+        with self._lock:
+            self.primaries += 1
+            self._tokens = min(self.reserve, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one hedge from the budget; False when it is exhausted"""
+        with self._lock:
+            if self._tokens < 1.0:
+                self.denied += 1
+                return False
+            self._tokens -= 1.0
+            self.hedges += 1
+            return True
+
+    def record_win(self) -> None:
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'primaries': self.primaries,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'denied': self.denied,
+                'overhead': round(self.hedges / self.primaries, 3) if self.primaries else 0.0,
+            }
+
+
+_budgets: Dict[str, HedgeBudget] = {}
+_budgets_lock = threading.Lock()
+
+
+def get_hedge_budget(model_key: str, ratio: float = 0.1, reserve: float = 2.0) -> HedgeBudget:
+    """Return the process-wide hedge budget for a model"""
+    with _budgets_lock:
+        budget = _budgets.get(model_key)
+        if budget is None:
+            budget = HedgeBudget(ratio, reserve)
+            _budgets[model_key] = budget
+        return budget
@@ -0,0 +1,150 @@
+"""
+Reference image cache
+Content-addressed cache of encoded reference images and the Files API URLs
+they were uploaded to, so reruns with an unchanged input image skip both
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .utils import EncodedImage, UploadEncoding, read_env_setting
+
+logger = logging.getLogger(__name__)
+
+# Stop reusing an uploaded file this long before Replicate deletes it
+UPLOAD_EXPIRY_MARGIN = 600.0
+
+
+@dataclass
+class _CacheEntry:
+    encoded: EncodedImage
+    # Token scope -> (file URL, time after which it is no longer reused)
+    urls: Dict[str, Tuple[str, float]] = field(default_factory=dict)
+
+
+class ImageCache:
+    """LRU cache keyed by a hash of the image pixels and the upload encoding
+
+    Entries are evicted least recently used first once the encoded bytes
+    exceed ``max_bytes``. Uploaded file URLs belong to the account that
+    uploaded them, so they are stored per token scope, and are only reused
+    for ``url_ttl`` seconds (and never close to the file's own expiry).
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, url_ttl: float = 3600.0):
+        self.max_bytes = max_bytes
+        self.url_ttl = url_ttl
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.url_hits = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ImageCache":
+        """Build cache from REPLICATE_IMAGE_CACHE_MB / REPLICATE_UPLOAD_URL_TTL"""
+        return cls(
+            max_bytes=int(read_env_setting('REPLICATE_IMAGE_CACHE_MB', 256.0) * 1024 * 1024),
+            url_ttl=read_env_setting('REPLICATE_UPLOAD_URL_TTL', 3600.0),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def image_key(image: np.ndarray, encoding: UploadEncoding) -> str:
+        """Hash of one image's pixel buffer, shape and dtype, and the encoding"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((image.shape, image.dtype.str, encoding)).encode())
+        digest.update(memoryview(np.ascontiguousarray(image)).cast("B"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def token_scope(api_token: str) -> str:
+        return hashlib.sha256(api_token.encode()).hexdigest()[:16]
+
+    def get(self, key: str) -> Optional[EncodedImage]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.encoded
+
+    def put(self, key: str, encoded: EncodedImage) -> None:
+        if encoded.bytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous.encoded.bytes
+            self._entries[key] = _CacheEntry(encoded)
+            self.total_bytes += encoded.bytes
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.encoded.bytes
+                self.evictions += 1
+
+    def get_url(self, key: str, scope: str) -> Optional[str]:
+        """Uploaded file URL for an image, if it is still safe to reuse"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or scope not in entry.urls:
+                return None
+            url, reuse_until = entry.urls[scope]
+            if time.time() >= reuse_until:
+                del entry.urls[scope]
+                return None
+            self._entries.move_to_end(key)
+            self.url_hits += 1
+            return url
+
+    def put_url(self, key: str, scope: str, url: str, expires_at: Optional[float] = None) -> None:
+        reuse_until = time.time() + self.url_ttl
+        if expires_at is not None:
+            reuse_until = min(reuse_until, expires_at - UPLOAD_EXPIRY_MARGIN)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.urls[scope] = (url, reuse_until)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'url_hits': self.url_hits,
+                'evictions': self.evictions,
+            }
+
+
+_default_cache: Optional[ImageCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageCache:
+    """Return the process-wide reference image cache"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ImageCache.from_env()
+        return _default_cache
@@ -0,0 +1,200 @@
+"""
+Prediction lifecycle management
+Tracks the predictions started by each node execution and cancels the ones
+still running on Replicate when the execution times out, is interrupted,
+fails fatally or the process exits
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+
+from .replicate_client import ReplicateClient
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionsCanceledError(RuntimeError):
+    """Raised for work skipped because its node execution was aborted"""
+
+
+@dataclass
+class _TrackedPrediction:
+    prediction_id: str
+    started: float
+    expected_duration: Optional[float] = None
+
+
+class PredictionLifecycle:
+    """In-flight predictions of one node execution
+
+    Use as ``async with``: leaving the block with an exception (timeout,
+    task cancellation on interrupt, a fatal error) cancels every prediction
+    that is still tracked. ``abort`` does the same while the execution keeps
+    running, e.g. when one of several concurrent slots fails fatally.
+    """
+
+    def __init__(self, client: ReplicateClient, label: str = ""):
+        self.client = client
+        self.label = label
+        self.canceled = 0
+        # Estimated prediction seconds no longer billed, from historical durations
+        self.reclaimed_seconds = 0.0
+        self.abort_cause: Optional[BaseException] = None
+        self._active: Dict[str, _TrackedPrediction] = {}
+
+    @property
+    def aborted(self) -> bool:
+        return self.abort_cause is not None
+
+    @property
+    def active_count(self) -> int:
+        return len(self._active)
+
+    def track(self, prediction_id: str, expected_duration: Optional[float] = None) -> None:
+        """Start tracking a created prediction"""
+        self._active[prediction_id] = _TrackedPrediction(
+            prediction_id, time.monotonic(), expected_duration
+        )
+
+    def finish(self, prediction_id: str) -> None:
+        """Stop tracking a prediction that reached a terminal status"""
+        self._active.pop(prediction_id, None)
+
+    def raise_if_aborted(self) -> None:
+        if self.abort_cause is not None:
+            raise PredictionsCanceledError(f"已取消：同批次预测失败（{self.abort_cause}）")
+
+    async def cancel(self, prediction_id: str, reason: str) -> bool:
+        """Cancel one tracked prediction on Replicate; returns whether it was stopped"""
+        tracked = self._active.pop(prediction_id, None)
+        if tracked is None:
+            return False
+
+        try:
+            status = await self.client.cancel_prediction(prediction_id)
+        except Exception as exc:
+            logger.warning("Could not cancel prediction %s (%s): %s", prediction_id, reason, exc)
+            return False
+
+        if status.status != "canceled":
+            # Finished before the cancel arrived; nothing was reclaimed
+            return False
+
+        self.canceled += 1
+        reclaimed = 0.0
+        if tracked.expected_duration is not None:
+            reclaimed = max(0.0, tracked.expected_duration - (time.monotonic() - tracked.started))
+            self.reclaimed_seconds += reclaimed
+        get_lifecycle_registry().record_cancel(reclaimed)
+        logger.info("Canceled prediction %s (%s)", prediction_id, reason)
+        return True
+
+    async def cancel_all(self, reason: str) -> int:
+        """Cancel every tracked prediction; returns how many were stopped"""
+        if not self._active:
+            return 0
+
+        canceled_before = self.canceled
+        reclaimed_before = self.reclaimed_seconds
+        results = await asyncio.gather(
+            *(self.cancel(prediction_id, reason) for prediction_id in list(self._active)),
+            return_exceptions=True,
+        )
+        stopped = sum(1 for result in results if result is True)
+        if stopped:
+            logger.info(
+                "Canceled %d prediction(s) for %s (%s); reclaimed ~%.1fs of compute",
+                self.canceled - canceled_before,
+                self.label or "node execution",
+                reason,
+                self.reclaimed_seconds - reclaimed_before,
+            )
+        return stopped
+
+    async def abort(self, cause: BaseException) -> None:
+        """Stop the whole execution after a fatal failure of one of its predictions"""
+        if self.abort_cause is None:
+            self.abort_cause = cause
+        await self.cancel_all("sibling prediction failed")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "canceled": self.canceled,
+            "reclaimed_seconds": round(self.reclaimed_seconds, 2),
+        }
+
+    async def __aenter__(self) -> "PredictionLifecycle":
+        get_lifecycle_registry().register(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        try:
+            if exc_type is not None and self._active:
+                if issubclass(exc_type, asyncio.CancelledError):
+                    reason = "interrupted"
+                elif issubclass(exc_type, (TimeoutError, asyncio.TimeoutError)):
+                    reason = "timeout"
+                else:
+                    reason = "execution failed"
+                await self.cancel_all(reason)
+        finally:
+            get_lifecycle_registry().unregister(self)
+
+
+class LifecycleRegistry:
+    """Every live PredictionLifecycle, so shutdown can cancel what is left"""
+
+    def __init__(self):
+        self._lifecycles: Set[PredictionLifecycle] = set()
+        self._lock = threading.Lock()
+        self.canceled = 0
+        self.reclaimed_seconds = 0.0
+
+    def register(self, lifecycle: PredictionLifecycle) -> None:
+        with self._lock:
+            self._lifecycles.add(lifecycle)
+
+    def unregister(self, lifecycle: PredictionLifecycle) -> None:
+        with self._lock:
+            self._lifecycles.discard(lifecycle)
+
+    def record_cancel(self, reclaimed_seconds: float) -> None:
+        with self._lock:
+            self.canceled += 1
+            self.reclaimed_seconds += reclaimed_seconds
+
+    async def cancel_all(self, reason: str = "shutdown") -> int:
+        """Cancel the in-flight predictions of every live execution"""
+        with self._lock:
+            lifecycles = list(self._lifecycles)
+        results = await asyncio.gather(
+            *(lifecycle.cancel_all(reason) for lifecycle in lifecycles),
+            return_exceptions=True,
+        )
+        return sum(result for result in results if isinstance(result, int))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active_executions": len(self._lifecycles),
+                "in_flight": sum(lifecycle.active_count for lifecycle in self._lifecycles),
+                "canceled": self.canceled,
+                "reclaimed_seconds": round(self.reclaimed_seconds, 2),
+            }
+
+
+_default_registry: Optional[LifecycleRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_lifecycle_registry() -> LifecycleRegistry:
+    """Return the process-wide lifecycle registry"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = LifecycleRegistry()
+        return _default_registry
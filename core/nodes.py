@@ -4,15 +4,45 @@ Model-specific nodes for Replicate integration
 """
 
 import asyncio
+import dataclasses
 import json
 import logging
+import time
 from typing import Any, Dict, List, Optional, Tuple
 
-from .replicate_client import ReplicateClient
+import numpy as np
+
+from .client_pool import get_client_pool
+from .batch import BatchCheckpoint, ImageBatchBuffer
+from .codec import get_codec_pool
+from .image_cache import get_image_cache
+from .hedging import get_hedge_budget
+from .lifecycle import PredictionLifecycle, PredictionsCanceledError
+from .concurrency import (
+    OUTCOME_CONGESTED,
+    OUTCOME_FAILED,
+    OUTCOME_SUCCESS,
+    get_concurrency_limiter,
+)
+from .polling import PollingPolicy, get_completion_history, prediction_duration
+from .replicate_client import (
+    TERMINAL_STATUSES,
+    PredictionFailedError,
+    PredictionStatus,
+    ReplicateAPIError,
+    ReplicateClient,
+)
+from .retry import ERROR_FATAL, AmbiguousCreateError, classify_error
+from .runtime import get_background_runner
+from .webhooks import WEBHOOK_EVENTS, get_webhook_receiver, install_webhook_route
 from .utils import (
-    convert_image_batch_to_base64_list,
+    EncodedImage,
+    UploadEncoding,
+    encode_image_batch,
     format_error_message,
+    image_batch_array,
     load_api_token,
+    output_urls,
     parse_replicate_outputs,
     save_api_token,
     stack_image_arrays,
@@ -20,17 +50,38 @@ from .utils import (
 
 logger = logging.getLogger(__name__)
 
-try:
-    import nest_asyncio
+install_webhook_route()
+
+
+def _comfy_model_management():
+    try:
+        import comfy.model_management as model_management  # type: ignore
+    except ImportError:
+        return None
+    return model_management
+
+
+def _comfy_interrupt_requested() -> bool:
+    """Whether the user interrupted the ComfyUI queue"""
+    model_management = _comfy_model_management()
+    if model_management is None:
+        return False
+    return bool(model_management.processing_interrupted())
 
-    nest_asyncio.apply()
-except ImportError:
-    logger.warning(
-        "未检测到 nest_asyncio，某些环境下可能出现事件循环冲突。"
-        "若遇到 'event loop is already running'，请安装 nest_asyncio。"
+
+def _is_comfy_interrupt(exc: BaseException) -> bool:
+    model_management = _comfy_model_management()
+    return model_management is not None and isinstance(
+        exc, model_management.InterruptProcessingException
     )
 
 
+def _is_sensitive_content_error(message: str) -> bool:
+    """Whether Replicate rejected the request or output as sensitive content (E005)"""
+    lower_msg = message.lower()
+    return "flagged as sensitive" in lower_msg or "e005" in lower_msg
+
+
 class ReplicateModelNodeBase:
     """Base implementation for model-specific Replicate nodes."""
 
@@ -39,11 +90,49 @@ class ReplicateModelNodeBase:
     SUPPORTS_NATIVE_BATCH: bool = False
     REQUIRE_IMAGE: bool = False
     MAX_REFERENCE_IMAGES: Optional[int] = None
-    MAX_IMAGES: int = 5
+    MAX_IMAGES: int = 500
+    # Counts above this run as waves of at most this many images, streamed
+    # into a preallocated batch and checkpointed to disk between waves
+    BATCH_WAVE_SIZE: int = 16
+    BATCH_CHECKPOINT: bool = True
     REQUEST_TIMEOUT: int = 300
-    POLL_INTERVAL: int = 2
+    POLLING_POLICY: PollingPolicy = PollingPolicy()
+    # Slow safety-net polling used while a webhook is expected to push the result
+    WEBHOOK_POLLING_POLICY: PollingPolicy = PollingPolicy(
+        initial_interval=10.0, multiplier=2.0, max_interval=60.0
+    )
+    # Inputs that drive runtime; used to group observed durations per workload
+    HISTORY_KEY_PARAMS: Tuple[str, ...] = ()
+    # Percentile of past durations at which the first status poll is sent
+    FIRST_POLL_PERCENTILE: float = 0.3
+    # Seconds to hold the create request open (Prefer: wait); 0 disables
+    SYNC_WAIT_SECONDS: int = 0
     IMAGE_INPUT_KEYS: Tuple[str, ...] = ("输入图片",)
     ENABLE_CONCURRENCY: bool = False
+    # Adaptive in-flight limit for concurrent fan-out, learned per model
+    CONCURRENCY_INITIAL: int = 4
+    CONCURRENCY_MAX: int = 16
+    # Native-batch models: per-request image cap, and preferred images per
+    # request when a batch is split into parallel requests (None: use the cap)
+    NATIVE_BATCH_MAX: int = 1
+    NATIVE_BATCH_CHUNK: Optional[int] = None
+    # Sequential mode decodes each output while the next prediction runs
+    PIPELINE_SEQUENTIAL: bool = True
+    # Resubmissions shared by all failed slots of one concurrent batch
+    SLOT_RETRY_BUDGET: int = 2
+    # Opt-in hedging: duplicate a prediction still "starting" after the
+    # HEDGE_PERCENTILE of past start latencies, keep the first to finish
+    HEDGE_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 0.9
+    HEDGE_MIN_DELAY: float = 2.0
+    # Long-run cap on hedges as a fraction of predictions (cost overhead)
+    HEDGE_BUDGET: float = 0.1
+    # Format of uploaded reference images: lossless PNG by default; a lossy
+    # format with a byte budget trades some fidelity for faster uploads
+    UPLOAD_ENCODING: UploadEncoding = UploadEncoding()
+    # Send reference images once through the Files API and pass their URLs
+    # (shared by every prediction of the execution) instead of inline data URIs
+    UPLOAD_VIA_FILES_API: bool = True
 
     _version_cache: Dict[str, str] = {}
 
@@ -89,8 +178,8 @@ class ReplicateModelNodeBase:
         candidate = min(candidate, self.MAX_IMAGES)
         return candidate
 
-    def _prepare_images(self, image_batches: List[Any]) -> List[str]:
-        images: List[str] = []
+    def _encode_images(self, image_batches: List[Any]) -> List[EncodedImage]:
+        images: List[EncodedImage] = []
 
         for batch in image_batches:
             if batch is None:
@@ -103,7 +192,7 @@ class ReplicateModelNodeBase:
                     break
                 limit = remaining
 
-            images.extend(convert_image_batch_to_base64_list(batch, limit))
+            images.extend(self._encode_batch_cached(batch, limit))
 
         if self.REQUIRE_IMAGE and not images:
             raise ValueError("请提供至少一张输入图片")
@@ -113,33 +202,305 @@ class ReplicateModelNodeBase:
 
         return images
 
+    def _encode_batch_cached(self, batch: Any, limit: Optional[int]) -> List[EncodedImage]:
+        """Encode an image batch, reusing cached encodings of unchanged images"""
+        cache = get_image_cache()
+        is_batch = hasattr(batch, "detach") or (isinstance(batch, np.ndarray) and batch.ndim == 4)
+        if not cache.enabled or not is_batch:
+            return encode_image_batch(
+                batch, limit, pool=get_codec_pool(), encoding=self.UPLOAD_ENCODING
+            )
+
+        arrays = image_batch_array(batch, limit)
+        keys: List[str] = []
+        encoded: List[Optional[EncodedImage]] = []
+        for image in arrays:
+            started = time.perf_counter()
+            key = cache.image_key(image, self.UPLOAD_ENCODING)
+            hit = cache.get(key)
+            keys.append(key)
+            # A hit costs the hash and lookup, not the original encode
+            encoded.append(None if hit is None else dataclasses.replace(
+                hit, cached=True, seconds=time.perf_counter() - started
+            ))
+
+        missing = [index for index, item in enumerate(encoded) if item is None]
+        if missing:
+            fresh = encode_image_batch(
+                arrays[missing], pool=get_codec_pool(), encoding=self.UPLOAD_ENCODING
+            )
+            for index, item in zip(missing, fresh):
+                item.key = keys[index]
+                cache.put(keys[index], item)
+                encoded[index] = item
+        return encoded
+
+    def _history_key(self, inputs: Dict[str, Any]) -> str:
+        parts = [self._model_key()]
+        for name in self.HISTORY_KEY_PARAMS:
+            if name in inputs:
+                parts.append(f"{name}={inputs[name]}")
+        return "|".join(parts)
+
     async def _create_and_wait(
         self,
         client: ReplicateClient,
         version_id: str,
         inputs: Dict[str, Any],
+        lifecycle: Optional[PredictionLifecycle] = None,
     ):
+        if lifecycle is None:
+            lifecycle = PredictionLifecycle(client, self._model_key())
+
+        history = get_completion_history()
+        history_key = self._history_key(inputs)
+        start_key = f"{history_key}|start"
+        expected = history.expected_duration(history_key, self.FIRST_POLL_PERCENTILE)
+        expected_total = history.expected_duration(history_key, 0.5)
+
+        webhook_url = None
+        receiver = get_webhook_receiver()
+        if receiver.enabled:
+            try:
+                await receiver.ensure_started(client)
+                webhook_url = receiver.webhook_url
+            except Exception as exc:
+                logger.warning("Webhook receiver unavailable, polling instead: %s", exc)
+
+        hedge_delay = None
+        if self.HEDGE_ENABLED:
+            hedge_delay = history.expected_duration(start_key, self.HEDGE_PERCENTILE)
+            if hedge_delay is not None:
+                hedge_delay = max(self.HEDGE_MIN_DELAY, hedge_delay)
+
+        started = time.monotonic()
         prediction = await client.create_prediction(
             version_id=version_id,
             inputs=inputs,
+            wait=self.SYNC_WAIT_SECONDS or None,
+            webhook=webhook_url,
+            webhook_events_filter=WEBHOOK_EVENTS if webhook_url else None,
         )
-        result = await client.wait_for_prediction(
-            prediction_id=prediction.id,
-            timeout=self.REQUEST_TIMEOUT,
-            poll_interval=self.POLL_INTERVAL,
-        )
+
+        wait_args = (client, webhook_url, expected, expected_total, lifecycle)
+        if hedge_delay is not None and prediction.status not in TERMINAL_STATUSES:
+            prediction, result = await self._await_with_hedge(
+                prediction, version_id, inputs, hedge_delay, started, *wait_args
+            )
+        else:
+            result = await self._await_tracked(prediction, started, *wait_args)
+
+        if result.status == "succeeded":
+            duration = prediction_duration(result.created_at, result.completed_at)
+            if duration is None:
+                duration = time.monotonic() - started
+            history.record(history_key, duration)
+            start_latency = prediction_duration(result.created_at, result.started_at)
+            if start_latency is not None:
+                history.record(start_key, start_latency)
+
         if result.status != "succeeded":
             error_message = result.error or f"预测状态: {result.status}"
-            raise RuntimeError(error_message)
+            raise PredictionFailedError(error_message, prediction.id, result.status)
         return prediction, result
 
+    async def _await_tracked(
+        self,
+        prediction: PredictionStatus,
+        started: float,
+        client: ReplicateClient,
+        webhook_url: Optional[str],
+        expected: Optional[float],
+        expected_total: Optional[float],
+        lifecycle: PredictionLifecycle,
+    ) -> PredictionStatus:
+        """Wait for a created prediction, canceling it if the wait is abandoned"""
+        if prediction.status in TERMINAL_STATUSES:
+            return prediction
+
+        lifecycle.track(prediction.id, expected_total)
+        try:
+            lifecycle.raise_if_aborted()
+            if webhook_url:
+                # Completion is pushed to the receiver; polling is only a safety net
+                receiver = get_webhook_receiver()
+                receiver.subscribe(prediction.id, client.poller.notify)
+                try:
+                    return await client.wait_for_prediction(
+                        prediction_id=prediction.id,
+                        timeout=self.REQUEST_TIMEOUT,
+                        poll_interval=self.WEBHOOK_POLLING_POLICY,
+                        first_poll_delay=self.WEBHOOK_POLLING_POLICY.initial_interval,
+                    )
+                finally:
+                    receiver.unsubscribe(prediction.id)
+
+            # Not finished within the server-side wait window: follow the event
+            # stream when the model offers one, otherwise poll
+            first_poll_delay = 0.0
+            if expected is not None:
+                first_poll_delay = max(0.0, expected - (time.monotonic() - started))
+            return await client.wait_for_prediction(
+                prediction_id=prediction.id,
+                timeout=self.REQUEST_TIMEOUT,
+                poll_interval=self.POLLING_POLICY,
+                first_poll_delay=first_poll_delay,
+                stream_url=(prediction.urls or {}).get("stream"),
+            )
+        except BaseException as exc:
+            # Stop paying for a prediction whose result is no longer awaited
+            if isinstance(exc, asyncio.CancelledError):
+                reason = "interrupted"
+            elif isinstance(exc, TimeoutError):
+                reason = "timeout"
+            else:
+                reason = "wait failed"
+            await lifecycle.cancel(prediction.id, reason)
+            raise
+        finally:
+            lifecycle.finish(prediction.id)
+
+    async def _await_with_hedge(
+        self,
+        primary: PredictionStatus,
+        version_id: str,
+        inputs: Dict[str, Any],
+        hedge_delay: float,
+        started: float,
+        client: ReplicateClient,
+        webhook_url: Optional[str],
+        expected: Optional[float],
+        expected_total: Optional[float],
+        lifecycle: PredictionLifecycle,
+    ):
+        """Wait for ``primary``, duplicating it if it is still starting after ``hedge_delay``
+
+        The first duplicate to succeed wins and the other is canceled.
+        """
+        budget = get_hedge_budget(self._model_key(), self.HEDGE_BUDGET)
+        budget.record_primary()
+        wait_args = (client, webhook_url, expected, expected_total, lifecycle)
+        tasks = {
+            asyncio.ensure_future(self._await_tracked(primary, started, *wait_args)): primary
+        }
+
+        try:
+            remaining = hedge_delay - (time.monotonic() - started)
+            done, _ = await asyncio.wait(set(tasks), timeout=max(0.0, remaining))
+            if not done:
+                try:
+                    status = await client.get_prediction(primary.id)
+                except Exception as exc:
+                    logger.debug("Hedge check for %s failed: %s", primary.id, exc)
+                    status = None
+
+                if status is not None and status.status == "starting" and budget.try_spend():
+                    logger.info(
+                        "Prediction %s still starting after %.1fs; launching a hedge",
+                        primary.id, time.monotonic() - started,
+                    )
+                    hedge_started = time.monotonic()
+                    try:
+                        hedge = await client.create_prediction(
+                            version_id=version_id,
+                            inputs=inputs,
+                            webhook=webhook_url,
+                            webhook_events_filter=WEBHOOK_EVENTS if webhook_url else None,
+                        )
+                    except Exception as exc:
+                        logger.warning("Could not launch hedge for %s: %s", primary.id, exc)
+                    else:
+                        tasks[asyncio.ensure_future(
+                            self._await_tracked(hedge, hedge_started, *wait_args)
+                        )] = hedge
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is None \
+                            and task.result().status == "succeeded":
+                        if tasks[task] is not primary:
+                            budget.record_win()
+                        return tasks[task], task.result()
+
+            # Nothing succeeded: report the primary's outcome
+            primary_task = next(task for task, value in tasks.items() if value is primary)
+            return primary, primary_task.result()
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            if losers:
+                await asyncio.gather(
+                    *(lifecycle.cancel(tasks[task].id, "hedge resolved") for task in losers),
+                    return_exceptions=True,
+                )
+                for task in losers:
+                    task.cancel()
+                await asyncio.gather(*losers, return_exceptions=True)
+
+    @classmethod
+    def _concurrency_limiter(cls):
+        return get_concurrency_limiter(
+            cls._model_key(),
+            initial=cls.CONCURRENCY_INITIAL,
+            maximum=cls.CONCURRENCY_MAX,
+        )
+
+    async def _create_and_wait_limited(
+        self,
+        client: ReplicateClient,
+        version_id: str,
+        inputs: Dict[str, Any],
+        lifecycle: Optional[PredictionLifecycle] = None,
+    ):
+        limiter = self._concurrency_limiter()
+        await limiter.acquire()
+        throttle_events = client.rate_limiter.throttle_events
+        outcome = OUTCOME_FAILED
+        queue_time = None
+        try:
+            prediction, result = await self._create_and_wait(
+                client, version_id, inputs, lifecycle
+            )
+            outcome = OUTCOME_SUCCESS
+            queue_time = prediction_duration(result.created_at, result.started_at)
+            return prediction, result
+        except ReplicateAPIError as exc:
+            if exc.status == 429 or (exc.status or 0) >= 500:
+                outcome = OUTCOME_CONGESTED
+            raise
+        finally:
+            if client.rate_limiter.throttle_events > throttle_events:
+                outcome = OUTCOME_CONGESTED
+            limiter.release(outcome, queue_time)
+
     async def _run_prediction_batch(
         self,
         client: ReplicateClient,
         payload: Dict[str, Any],
         desired_count: int,
         concurrent: bool = False,
+        lifecycle: Optional[PredictionLifecycle] = None,
+        image_keys: Optional[Dict[str, str]] = None,
     ):
+        """Generate ``desired_count`` images for ``payload``
+
+        ``image_keys`` maps the image values in the payload (file URLs or data
+        URIs) to content keys, so checkpoints of large batches are found
+        again even when the same images were uploaded under new URLs.
+        """
+        if lifecycle is None:
+            # Remote predictions left running when this execution ends abnormally are canceled
+            async with PredictionLifecycle(client, self._model_key()) as lifecycle:
+                return await self._run_prediction_batch(
+                    client, payload, desired_count, concurrent, lifecycle, image_keys
+                )
+
+        if desired_count > self.BATCH_WAVE_SIZE:
+            return await self._run_large_batch(
+                client, payload, desired_count, concurrent, lifecycle, image_keys
+            )
+
         version_id = await self._get_latest_version_id(client)
 
         images: List[Any] = []
@@ -147,33 +508,36 @@ class ReplicateModelNodeBase:
         raw_records: List[Dict[str, Any]] = []
         iteration = 0
 
-        if not self.SUPPORTS_NATIVE_BATCH and concurrent and desired_count > 1:
-            tasks = []
-            for idx in range(desired_count):
-                request_inputs = self._prepare_request_payload(payload, 1, idx + 1)
-                tasks.append(
-                    self._create_and_wait(
-                        client,
-                        version_id,
-                        request_inputs,
-                    )
-                )
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            for result in results:
-                if isinstance(result, Exception):
-                    raise result
-                prediction, prediction_result = result
-                raw_records.append(
-                    {
-                        "prediction_id": prediction.id,
-                        "inputs": payload,
-                        "output": prediction_result.output,
-                        "logs": prediction_result.logs,
-                        "status": prediction_result.status,
-                    }
-                )
-                image_arrays, texts = parse_replicate_outputs(prediction_result.output)
+        slot_counts: List[int] = []
+        if self.SUPPORTS_NATIVE_BATCH:
+            # Several parallel native-batch requests instead of one plus serial top-ups
+            plan = self._plan_native_batches(payload, desired_count)
+            if len(plan) > 1:
+                slot_counts = plan
+        elif concurrent and desired_count > 1:
+            slot_counts = [1] * desired_count
+
+        if slot_counts:
+            slot_results, slot_records, failures = await self._run_concurrent_slots(
+                client,
+                version_id,
+                payload,
+                slot_counts,
+                lifecycle,
+            )
+            if lifecycle.abort_cause is not None:
+                raise lifecycle.abort_cause
+            if not any(slot_results):
+                raise failures[0]
+
+            for records in slot_records:
+                raw_records.extend(records)
+
+            # Slots decoded their outputs as they finished; collect them in slot order
+            for slot_result in slot_results:
+                if slot_result is None:
+                    continue
+                _, prediction_result, (image_arrays, texts) = slot_result
                 if image_arrays:
                     images.extend(image_arrays)
                 if texts:
@@ -181,6 +545,19 @@ class ReplicateModelNodeBase:
                 if prediction_result.logs:
                     text_parts.append(prediction_result.logs)
 
+            if failures:
+                failed_slots = [
+                    str(slot + 1) for slot, result in enumerate(slot_results) if result is None
+                ]
+                text_parts.append(
+                    f"部分预测失败（第 {', '.join(failed_slots)} 个请求），已保留其余 "
+                    f"{len(slot_counts) - len(failed_slots)} 个请求的结果：{format_error_message(failures[0])}"
+                )
+                if not images:
+                    raise RuntimeError("模型未返回可用图像")
+                return images[:desired_count], text_parts, raw_records
+
+        if slot_counts and not self.SUPPORTS_NATIVE_BATCH:
             if len(images) < desired_count:
                 missing = desired_count - len(images)
                 (
@@ -192,6 +569,7 @@ class ReplicateModelNodeBase:
                     payload,
                     missing,
                     concurrent=False,
+                    lifecycle=lifecycle,
                 )
                 images.extend(extra_images)
                 text_parts.extend(extra_texts)
@@ -202,15 +580,17 @@ class ReplicateModelNodeBase:
 
             return images[:desired_count], text_parts, raw_records
 
+        if not self.SUPPORTS_NATIVE_BATCH and self.PIPELINE_SEQUENTIAL:
+            return await self._run_sequential_pipelined(
+                client, version_id, payload, desired_count, lifecycle
+            )
+
         while len(images) < desired_count:
             iteration += 1
 
             remaining = desired_count - len(images)
             if self.SUPPORTS_NATIVE_BATCH:
-                if iteration == 1:
-                    request_count = desired_count
-                else:
-                    request_count = remaining
+                request_count = remaining
             else:
                 request_count = 1
 
@@ -222,6 +602,7 @@ class ReplicateModelNodeBase:
                 client,
                 version_id,
                 request_inputs,
+                lifecycle,
             )
 
             raw_records.append(
@@ -231,10 +612,12 @@ class ReplicateModelNodeBase:
                     "output": result.output,
                     "logs": result.logs,
                     "status": result.status,
+                    "poll_count": result.poll_count,
+                    "queue_wait": round(prediction.queue_wait, 3),
                 }
             )
 
-            image_arrays, texts = parse_replicate_outputs(result.output)
+            image_arrays, texts = await self._decode_outputs(client, result.output)
             if image_arrays:
                 images.extend(image_arrays)
             if texts:
@@ -260,6 +643,311 @@ class ReplicateModelNodeBase:
 
         return images[:desired_count], text_parts, raw_records
 
+    @staticmethod
+    def _is_retryable_failure(exc: BaseException) -> bool:
+        """Whether resubmitting a failed slot could succeed"""
+        if isinstance(exc, PredictionFailedError):
+            # Sensitive-content rejections are deterministic; resubmitting is billed again
+            return exc.status != "canceled" and not _is_sensitive_content_error(str(exc))
+        if isinstance(exc, TimeoutError):
+            # Waiting timed out; the prediction was canceled and would likely time out again
+            return False
+        if isinstance(exc, AmbiguousCreateError):
+            # The create may have gone through; resubmitting could duplicate it
+            return False
+        return classify_error(exc) != ERROR_FATAL
+
+    @staticmethod
+    def _is_fatal_failure(exc: BaseException) -> bool:
+        """Whether a failure means every other slot of the batch will fail too"""
+        if isinstance(exc, (PredictionFailedError, PredictionsCanceledError, TimeoutError,
+                            AmbiguousCreateError)):
+            return False
+        return classify_error(exc) == ERROR_FATAL
+
+    async def _run_concurrent_slots(
+        self,
+        client: ReplicateClient,
+        version_id: str,
+        payload: Dict[str, Any],
+        slot_counts: List[int],
+        lifecycle: PredictionLifecycle,
+    ):
+        """Run one prediction per slot concurrently, resubmitting failed slots under a shared budget
+
+        ``slot_counts`` holds the number of images each slot requests (1
+        unless the model batches natively).
+
+        A fatal failure in one slot (e.g. a rejected input) aborts the batch:
+        the other slots' predictions are canceled and no new ones are created.
+
+        Each slot downloads and decodes its output as soon as its prediction
+        succeeds, so local work overlaps with the slots still running and the
+        last image is ready about one decode after the slowest prediction.
+
+        Returns the (prediction, result, (image_arrays, texts)) triple for
+        each slot in slot order (None for slots that failed for good), the
+        raw records of every attempt per slot, and the final exception of
+        each failed slot.
+        """
+        budget = {"remaining": max(0, self.SLOT_RETRY_BUDGET)}
+        slot_records: List[List[Dict[str, Any]]] = [[] for _ in slot_counts]
+
+        async def run_slot(slot: int):
+            attempt = 0
+            while True:
+                attempt += 1
+                request_inputs = self._prepare_request_payload(
+                    payload, slot_counts[slot], slot + 1
+                )
+                try:
+                    lifecycle.raise_if_aborted()
+                    prediction, result = await self._create_and_wait_limited(
+                        client,
+                        version_id,
+                        request_inputs,
+                        lifecycle,
+                    )
+                except Exception as exc:
+                    record = {
+                        "slot": slot + 1,
+                        "attempt": attempt,
+                        "prediction_id": None,
+                        "status": "error",
+                        "error": str(exc),
+                    }
+                    if isinstance(exc, PredictionFailedError):
+                        record["prediction_id"] = exc.prediction_id
+                        record["status"] = exc.status
+                    elif isinstance(exc, ReplicateAPIError):
+                        record["http_status"] = exc.status
+                    slot_records[slot].append(record)
+                    if budget["remaining"] > 0 and self._is_retryable_failure(exc):
+                        budget["remaining"] -= 1
+                        logger.warning(
+                            "Prediction slot %d failed (attempt %d), resubmitting: %s",
+                            slot + 1, attempt, exc,
+                        )
+                        continue
+                    if self._is_fatal_failure(exc):
+                        await lifecycle.abort(exc)
+                    raise
+
+                slot_records[slot].append(
+                    {
+                        "slot": slot + 1,
+                        "attempt": attempt,
+                        "prediction_id": prediction.id,
+                        "inputs": request_inputs,
+                        "output": result.output,
+                        "logs": result.logs,
+                        "status": result.status,
+                        "poll_count": result.poll_count,
+                        "queue_wait": round(prediction.queue_wait, 3),
+                    }
+                )
+                # Not retried: the prediction itself succeeded
+                decoded = await self._decode_outputs(client, result.output)
+                return prediction, result, decoded
+
+        results = await asyncio.gather(
+            *(run_slot(slot) for slot in range(len(slot_counts))),
+            return_exceptions=True,
+        )
+
+        slot_results: List[Optional[Tuple[Any, Any, Tuple[List[Any], List[str]]]]] = []
+        failures: List[BaseException] = []
+        for result in results:
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                failures.append(result)
+                slot_results.append(None)
+            else:
+                slot_results.append(result)
+        return slot_results, slot_records, failures
+
+    async def _decode_outputs(self, client: ReplicateClient, output: Any):
+        """Download output files on the shared session, then decode them on the codec pool"""
+        urls = output_urls(output)
+        downloads = await client.download_all(urls) if urls else None
+        return await get_codec_pool().run(parse_replicate_outputs, output, downloads, name="decode")
+
+    async def _run_sequential_pipelined(
+        self,
+        client: ReplicateClient,
+        version_id: str,
+        payload: Dict[str, Any],
+        desired_count: int,
+        lifecycle: PredictionLifecycle,
+    ):
+        """One prediction at a time, decoding each output while the next one runs
+
+        Exactly one prediction is in flight on Replicate, as in the plain
+        sequential loop, but downloading and decoding the previous output
+        happens in a worker thread instead of delaying the next submission.
+        """
+        images: List[Any] = []
+        text_parts: List[str] = []
+        raw_records: List[Dict[str, Any]] = []
+        # Decode task and logs of the previous prediction
+        pending: Optional[Tuple[asyncio.Future, Optional[str]]] = None
+        prediction_task: Optional[asyncio.Future] = None
+
+        def collect(decoded: Tuple[List[Any], List[str]], logs: Optional[str]) -> int:
+            image_arrays, texts = decoded
+            images.extend(image_arrays)
+            text_parts.extend(texts)
+            if logs:
+                text_parts.append(logs)
+            return len(image_arrays)
+
+        try:
+            for iteration in range(1, desired_count + 1):
+                request_inputs = self._prepare_request_payload(payload, 1, iteration)
+                prediction_task = asyncio.ensure_future(
+                    self._create_and_wait(client, version_id, request_inputs, lifecycle)
+                )
+
+                if pending is not None:
+                    if not collect(await pending[0], pending[1]):
+                        raise RuntimeError("模型未返回图像输出，请检查输入参数")
+                    pending = None
+
+                prediction, result = await prediction_task
+                prediction_task = None
+                raw_records.append(
+                    {
+                        "prediction_id": prediction.id,
+                        "inputs": request_inputs,
+                        "output": result.output,
+                        "logs": result.logs,
+                        "status": result.status,
+                        "poll_count": result.poll_count,
+                        "queue_wait": round(prediction.queue_wait, 3),
+                    }
+                )
+                pending = (
+                    asyncio.ensure_future(self._decode_outputs(client, result.output)),
+                    result.logs,
+                )
+
+            collect(await pending[0], pending[1])
+            pending = None
+        finally:
+            # On failure, stop the prediction submitted ahead (this cancels it remotely)
+            leftovers = []
+            if prediction_task is not None and not prediction_task.done():
+                prediction_task.cancel()
+                leftovers.append(prediction_task)
+            if pending is not None:
+                leftovers.append(pending[0])
+            if leftovers:
+                await asyncio.gather(*leftovers, return_exceptions=True)
+
+        if not images:
+            raise RuntimeError("模型未返回可用图像")
+
+        return images[:desired_count], text_parts, raw_records
+
+    async def _run_large_batch(
+        self,
+        client: ReplicateClient,
+        payload: Dict[str, Any],
+        desired_count: int,
+        concurrent: bool,
+        lifecycle: PredictionLifecycle,
+        image_keys: Optional[Dict[str, str]] = None,
+    ):
+        """Generate a large batch in waves of at most BATCH_WAVE_SIZE images
+
+        Each wave runs through the regular concurrent or native-batch path.
+        Its images are copied into a preallocated buffer and checkpointed, so
+        besides the output only one wave of decoded images is held, and a
+        rerun after a failure or interrupt resumes where this one stopped.
+        """
+        buffer = ImageBatchBuffer(desired_count)
+        checkpoint = None
+        if self.BATCH_CHECKPOINT:
+            checkpoint = BatchCheckpoint.for_run(
+                self._model_key(), payload, desired_count, image_keys=image_keys
+            )
+
+            def restore() -> None:
+                for image in checkpoint.load(desired_count):
+                    buffer.put(image)
+
+            await asyncio.to_thread(restore)
+            if buffer.count:
+                logger.info(
+                    "Resuming batch from checkpoint: %d/%d images", buffer.count, desired_count
+                )
+
+        text_parts: List[str] = []
+        raw_records: List[Dict[str, Any]] = []
+        save_task: Optional[asyncio.Future] = None
+        wave = 0
+        max_waves = 2 * -(-desired_count // self.BATCH_WAVE_SIZE)
+
+        try:
+            while buffer.count < desired_count:
+                wave += 1
+                if wave > max_waves:
+                    raise RuntimeError(
+                        f"模型未返回足够的图像（已生成 {buffer.count}/{desired_count} 张）"
+                    )
+
+                wave_size = min(self.BATCH_WAVE_SIZE, desired_count - buffer.count)
+                images, texts, records = await self._run_prediction_batch(
+                    client, payload, wave_size, concurrent, lifecycle
+                )
+
+                start = buffer.count
+                for image in images[:wave_size]:
+                    buffer.put(image)
+                del images
+                text_parts.extend(texts)
+                for record in records:
+                    # The shared inputs (with encoded reference images) are not repeated per record
+                    record.pop("inputs", None)
+                    record["wave"] = wave
+                raw_records.extend(records)
+
+                if checkpoint is not None:
+                    # Saved rows are never written again, so the next wave can run meanwhile
+                    if save_task is not None:
+                        await save_task
+                    save_task = asyncio.ensure_future(
+                        asyncio.to_thread(checkpoint.save, buffer.result(), start)
+                    )
+        except Exception:
+            if checkpoint is not None and buffer.count:
+                logger.warning(
+                    "Batch stopped at %d/%d images; completed images are kept in %s",
+                    buffer.count, desired_count, checkpoint.directory,
+                )
+            raise
+        finally:
+            if save_task is not None:
+                await asyncio.gather(save_task, return_exceptions=True)
+
+        if checkpoint is not None:
+            await asyncio.to_thread(checkpoint.clear)
+
+        return buffer.result(), text_parts, raw_records
+
+    def _native_batch_capacity(self, payload: Dict[str, Any]) -> int:
+        """Most images a single native-batch request may ask for"""
+        return self.NATIVE_BATCH_MAX
+
+    def _plan_native_batches(self, payload: Dict[str, Any], desired_count: int) -> List[int]:
+        """Split ``desired_count`` into evenly sized native-batch requests"""
+        capacity = max(1, self._native_batch_capacity(payload))
+        chunk = min(capacity, self.NATIVE_BATCH_CHUNK or capacity)
+        requests = -(-desired_count // chunk)
+        base, extra = divmod(desired_count, requests)
+        return [base + 1 if index < extra else base for index in range(requests)]
+
     def _prepare_request_payload(
         self,
         payload: Dict[str, Any],
@@ -274,14 +962,95 @@ class ReplicateModelNodeBase:
         payload: Dict[str, Any],
         desired_count: int,
         concurrent: bool = False,
+        image_keys: Optional[Dict[str, str]] = None,
     ):
-        async with ReplicateClient(token) as client:
-            return await self._run_prediction_batch(
-                client,
-                payload,
-                desired_count,
-                concurrent=concurrent,
+        client = get_client_pool().get_client(token)
+        return await self._run_prediction_batch(
+            client,
+            payload,
+            desired_count,
+            concurrent=concurrent,
+            image_keys=image_keys,
+        )
+
+    async def _upload_images(
+        self, client: ReplicateClient, encoded_images: List[EncodedImage]
+    ) -> List[str]:
+        """Upload encoded reference images through the Files API; returns their URLs
+
+        Images uploaded recently under the same token are not sent again, and
+        identical images in one call are uploaded once.
+        """
+        cache = get_image_cache()
+        scope = cache.token_scope(client.api_token)
+        urls: List[Optional[str]] = [
+            cache.get_url(encoded.key, scope) if encoded.key else None
+            for encoded in encoded_images
+        ]
+
+        # One upload per distinct image still missing a URL
+        pending: Dict[Any, List[int]] = {}
+        for index, encoded in enumerate(encoded_images):
+            if urls[index] is None:
+                pending.setdefault(encoded.key or id(encoded), []).append(index)
+        if len(pending) < len(encoded_images):
+            logger.info(
+                "Reusing %d of %d reference image upload(s)",
+                len(encoded_images) - len(pending), len(encoded_images),
+            )
+
+        groups = list(pending.values())
+        uploaded = await asyncio.gather(
+            *(
+                client.upload_file(
+                    encoded_images[group[0]].data,
+                    encoded_images[group[0]].filename,
+                    encoded_images[group[0]].content_type,
+                )
+                for group in groups
             )
+        )
+        for group, file in zip(groups, uploaded):
+            key = encoded_images[group[0]].key
+            if key:
+                cache.put_url(key, scope, file.url, file.expires_at)
+            for index in group:
+                urls[index] = file.url
+        return urls
+
+    async def _async_upload(self, token: str, encoded_images: List[EncodedImage]) -> List[str]:
+        client = get_client_pool().get_client(token)
+        return await self._upload_images(client, encoded_images)
+
+    def _resolve_image_inputs(
+        self, token: str, encoded_images: List[EncodedImage]
+    ) -> Tuple[List[str], bool]:
+        """Image values for the payload, and whether they are uploaded file URLs
+
+        Falls back to inline data URIs when the upload fails.
+        """
+        if self.UPLOAD_VIA_FILES_API and encoded_images:
+            try:
+                return self._run_on_background_loop(
+                    self._async_upload(token, encoded_images)
+                ), True
+            except Exception as exc:
+                if _is_comfy_interrupt(exc) or isinstance(exc, InterruptedError):
+                    raise
+                logger.warning("Files API upload failed, sending images inline: %s", exc)
+        return [encoded.data_uri for encoded in encoded_images], False
+
+    def _run_on_background_loop(self, coro):
+        """Run ``coro`` on the shared loop, turning a ComfyUI interrupt into its exception"""
+        try:
+            return get_background_runner().run(coro, cancel_check=_comfy_interrupt_requested)
+        except InterruptedError:
+            # The task was cancelled, which cancels any remote predictions;
+            # report the interruption to ComfyUI the way it expects
+            model_management = _comfy_model_management()
+            if model_management is not None:
+                model_management.throw_exception_if_processing_interrupted()
+            raise
 
     def _execute_predictions(
         self,
@@ -289,27 +1058,17 @@ class ReplicateModelNodeBase:
         payload: Dict[str, Any],
         desired_count: int,
         concurrent: bool = False,
+        image_keys: Optional[Dict[str, str]] = None,
     ):
-        created_loop = False
-        try:
-            loop = asyncio.get_running_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            created_loop = True
-
-        try:
-            return loop.run_until_complete(
-                self._async_predict(
-                    token,
-                    payload,
-                    desired_count,
-                    concurrent=concurrent,
-                )
+        return self._run_on_background_loop(
+            self._async_predict(
+                token,
+                payload,
+                desired_count,
+                concurrent=concurrent,
+                image_keys=image_keys,
             )
-        finally:
-            if created_loop:
-                loop.close()
+        )
 
     def _build_payload(
         self,
@@ -342,20 +1101,36 @@ class ReplicateModelNodeBase:
                 for key in self.IMAGE_INPUT_KEYS
                 if kwargs.get(key) is not None
             ]
-            image_inputs = self._prepare_images(raw_batches)
+            encoded_images = self._encode_images(raw_batches)
+            image_inputs, uploaded = self._resolve_image_inputs(token, encoded_images)
             payload = self._build_payload(prompt, image_inputs, kwargs)
 
             concurrent = False
             if self.ENABLE_CONCURRENCY:
                 concurrent = bool(kwargs.get("并发生成", False))
 
+            # Upload URLs change between runs; checkpoints are keyed by image content
+            image_keys = {
+                value: encoded.content_key
+                for value, encoded in zip(image_inputs, encoded_images)
+            }
             image_arrays, text_parts, raw_records = self._execute_predictions(
                 token,
                 payload,
                 desired_count,
                 concurrent=concurrent,
+                image_keys=image_keys,
             )
 
+            if encoded_images:
+                # Reference image upload cost, ahead of the prediction records
+                raw_records = [
+                    {
+                        "uploads": [encoded.report() for encoded in encoded_images],
+                        "transport": "files" if uploaded else "inline",
+                    }
+                ] + list(raw_records)
+
             image_tensor = stack_image_arrays(image_arrays)
             text_output = "\n".join(part for part in text_parts if part).strip()
             raw_output = json.dumps(raw_records, ensure_ascii=False, indent=2)
@@ -363,9 +1138,10 @@ class ReplicateModelNodeBase:
             return (image_tensor, text_output, raw_output)
 
         except Exception as exc:
+            if _is_comfy_interrupt(exc):
+                raise
             formatted = format_error_message(exc)
-            lower_msg = formatted.lower()
-            if "flagged as sensitive" in lower_msg or "e005" in lower_msg:
+            if _is_sensitive_content_error(formatted):
                 fallback = json.dumps(
                     {"error": formatted, "model": self._model_key()}, ensure_ascii=False, indent=2
                 )
@@ -381,6 +1157,7 @@ class ReplicateQwenImageEditPlus(ReplicateModelNodeBase):
     MAX_REFERENCE_IMAGES = 4
     IMAGE_INPUT_KEYS = ("输入图片", "输入图片2", "输入图片3")
     ENABLE_CONCURRENCY = True
+    HISTORY_KEY_PARAMS = ("go_fast", "aspect_ratio")
     DESCRIPTION = "图像编辑：根据中文提示修改输入图片，支持多图批量生成。"
     CATEGORY = "Replicate/图像"
 
@@ -406,8 +1183,8 @@ class ReplicateQwenImageEditPlus(ReplicateModelNodeBase):
                 "生成数量": ("INT", {
                     "default": 1,
                     "min": 1,
-                    "max": 5,
-                    "tooltip": "本轮生成目标图像的数量。"
+                    "max": cls.MAX_IMAGES,
+                    "tooltip": "本轮生成目标图像的数量，超过 16 张时分批生成并保存进度，中断后重新运行可继续。"
                 }),
             },
             "optional": {
@@ -432,7 +1209,7 @@ class ReplicateQwenImageEditPlus(ReplicateModelNodeBase):
                 "数量输入": ("INT", {
                     "default": 0,
                     "min": 0,
-                    "max": 5,
+                    "max": cls.MAX_IMAGES,
                     "tooltip": "通过连线设置的生成数量，大于 0 时覆盖面板数值。"
                 }),
                 "极速模式": ("BOOLEAN", {
@@ -514,6 +1291,13 @@ class ReplicateSeedream4(ReplicateModelNodeBase):
     MODEL_NAME = "seedream-4"
     MAX_REFERENCE_IMAGES = 10
     SUPPORTS_NATIVE_BATCH = True
+    # High-resolution batches run for tens of seconds; start slower and back off further
+    POLLING_POLICY = PollingPolicy(initial_interval=1.0, multiplier=1.5, max_interval=8.0)
+    HISTORY_KEY_PARAMS = ("size", "width", "height", "max_images")
+    # max_images accepts up to 15, counting reference images; smaller parallel
+    # requests finish sooner than one long sequential generation
+    NATIVE_BATCH_MAX = 15
+    NATIVE_BATCH_CHUNK = 4
     IMAGE_INPUT_KEYS = ("输入图片", "输入图片2", "输入图片3")
     DESCRIPTION = "Seedream 4：文本或参考图生成多张高清图像。"
     CATEGORY = "Replicate/图像"
@@ -537,8 +1321,8 @@ class ReplicateSeedream4(ReplicateModelNodeBase):
                 "生成数量": ("INT", {
                     "default": 1,
                     "min": 1,
-                    "max": 5,
-                    "tooltip": "本轮生成目标图片数量，支持最多 5 张。"
+                    "max": cls.MAX_IMAGES,
+                    "tooltip": "本轮生成目标图片数量，超过 16 张时分批生成并保存进度，中断后重新运行可继续。"
                 }),
             },
             "optional": {
@@ -562,7 +1346,7 @@ class ReplicateSeedream4(ReplicateModelNodeBase):
                 "数量输入": ("INT", {
                     "default": 0,
                     "min": 0,
-                    "max": 5,
+                    "max": cls.MAX_IMAGES,
                     "tooltip": "通过连线设置的生成数量，大于 0 时覆盖面板数值。"
                 }),
                 "分辨率": (["1K", "2K", "4K", "custom"], {
@@ -640,6 +1424,10 @@ class ReplicateSeedream4(ReplicateModelNodeBase):
 
         return payload
 
+    def _native_batch_capacity(self, payload: Dict[str, Any]) -> int:
+        total_refs = len(payload.get("image_input", []))
+        return min(self.NATIVE_BATCH_MAX, 15 - total_refs)
+
     def _prepare_request_payload(
         self,
         payload: Dict[str, Any],
@@ -653,8 +1441,7 @@ class ReplicateSeedream4(ReplicateModelNodeBase):
             "disabled",
         )
         if auto_mode:
-            total_refs = len(payload.get("image_input", []))
-            capacity = max(1, 15 - total_refs)
+            capacity = max(1, self._native_batch_capacity(payload))
             data["max_images"] = min(requested_count, capacity)
         else:
             data.pop("max_images", None)
@@ -668,6 +1455,7 @@ class ReplicateNanoBanana(ReplicateModelNodeBase):
     MAX_REFERENCE_IMAGES = 4
     IMAGE_INPUT_KEYS = ("输入图片", "输入图片2", "输入图片3")
     ENABLE_CONCURRENCY = True
+    SYNC_WAIT_SECONDS = 60
     DESCRIPTION = "Nano Banana：轻量快速的多模态图像生成。"
     CATEGORY = "Replicate/图像"
 
@@ -690,8 +1478,8 @@ class ReplicateNanoBanana(ReplicateModelNodeBase):
                 "生成数量": ("INT", {
                     "default": 1,
                     "min": 1,
-                    "max": 5,
-                    "tooltip": "本轮生成目标图片数量，支持最多 5 张。"
+                    "max": cls.MAX_IMAGES,
+                    "tooltip": "本轮生成目标图片数量，超过 16 张时分批生成并保存进度，中断后重新运行可继续。"
                 }),
             },
             "optional": {
@@ -720,7 +1508,7 @@ class ReplicateNanoBanana(ReplicateModelNodeBase):
                 "数量输入": ("INT", {
                     "default": 0,
                     "min": 0,
-                    "max": 5,
+                    "max": cls.MAX_IMAGES,
                     "tooltip": "通过连线设置的生成数量，大于 0 时覆盖面板数值。"
                 }),
                 "长宽比": ([
@@ -0,0 +1,423 @@
+"""
+Prediction polling policies
+Controls how often prediction status is re-fetched while waiting for a result,
+using observed per-model runtimes to time the first poll
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from .utils import read_env_setting
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('succeeded', 'failed', 'canceled')
+
+
+@dataclass(frozen=True)
+class PollingPolicy:
+    """Jittered exponential backoff schedule for status polls (float seconds)
+
+    The first poll waits ``initial_interval``; each following wait grows by
+    ``multiplier`` up to ``max_interval``. ``jitter`` spreads each wait by
+    +/- that fraction so concurrent waiters do not poll in lockstep.
+    """
+    initial_interval: float = 0.5
+    multiplier: float = 1.5
+    max_interval: float = 5.0
+    jitter: float = 0.1
+
+    @classmethod
+    def fixed(cls, interval: float) -> "PollingPolicy":
+        """Constant-interval policy, matching the old integer poll_interval"""
+        return cls(initial_interval=float(interval), multiplier=1.0,
+                   max_interval=float(interval), jitter=0.0)
+
+    def interval(self, attempt: int) -> float:
+        """Delay in seconds before poll number ``attempt + 1`` (0-based attempt)"""
+        base = self.initial_interval * (self.multiplier ** max(0, attempt))
+        if self.jitter:
+            base *= 1.0 + random.uniform(-self.jitter, self.jitter)
+        return max(0.0, min(base, self.max_interval))
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds for an ISO-8601 timestamp from the Replicate API"""
+    if not isinstance(value, str):
+        return None
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def prediction_duration(created_at: Optional[str], completed_at: Optional[str]) -> Optional[float]:
+    """Seconds between two Replicate timestamps (e.g. created_at and completed_at)"""
+    start = parse_timestamp(created_at)
+    end = parse_timestamp(completed_at)
+    if start is None or end is None:
+        return None
+    duration = end - start
+    return duration if duration >= 0 else None
+
+
+class CompletionHistory:
+    """Rolling record of observed prediction durations per model workload
+
+    Durations are grouped by a caller-supplied key (model plus the inputs
+    that drive runtime, such as size or resolution) and kept in a bounded
+    window. Percentile estimates let callers schedule the first status poll
+    near the expected finish. Stats persist to a local JSON file so a fresh
+    start is already tuned.
+    """
+
+    def __init__(self, path: Optional[str] = None, window: int = 50,
+                 min_samples: int = 3, save_interval: float = 30.0):
+        self.path = path
+        self.window = window
+        self.min_samples = min_samples
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._dirty = False
+        self._last_save = 0.0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            for key, values in data.items():
+                samples = [float(v) for v in values if isinstance(v, (int, float))]
+                self._samples[key] = deque(samples[-self.window:], maxlen=self.window)
+        except Exception as e:
+            logger.warning(f"Failed to load prediction history: {str(e)}")
+
+    def save(self) -> None:
+        """Write the current stats to disk if anything changed"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {key: list(values) for key, values in self._samples.items()}
+            self._dirty = False
+            self._last_save = time.monotonic()
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Failed to save prediction history: {str(e)}")
+
+    def record(self, key: str, duration: float) -> None:
+        """Add an observed duration (seconds) for a workload key"""
+        if duration is None or duration < 0:
+            return
+        with self._lock:
+            samples = self._samples.setdefault(key, deque(maxlen=self.window))
+            samples.append(round(float(duration), 3))
+            self._dirty = True
+            due = time.monotonic() - self._last_save >= self.save_interval
+        if due:
+            self.save()
+
+    def expected_duration(self, key: str, percentile: float = 0.5) -> Optional[float]:
+        """Percentile (0-1) of recent durations, or None with too few samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        percentile = max(0.0, min(1.0, percentile))
+        position = percentile * (len(samples) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(samples) - 1)
+        return samples[lower] + (samples[upper] - samples[lower]) * (position - lower)
+
+    def sample_count(self, key: str) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+
+_default_history: Optional[CompletionHistory] = None
+_default_history_lock = threading.Lock()
+
+
+def get_completion_history() -> CompletionHistory:
+    """Return the process-wide history, persisted in the plugin root
+
+    REPLICATE_HISTORY_PATH overrides the file location.
+    """
+    global _default_history
+    with _default_history_lock:
+        if _default_history is None:
+            plugin_root = os.path.dirname(os.path.dirname(__file__))
+            _default_history = CompletionHistory(
+                path=read_env_setting(
+                    'REPLICATE_HISTORY_PATH', os.path.join(plugin_root, 'prediction_history.json')
+                )
+            )
+            atexit.register(_default_history.save)
+        return _default_history
+
+
+@dataclass
+class _PollEntry:
+    """Book-keeping for one prediction tracked by the poller"""
+    prediction_id: str
+    future: asyncio.Future
+    policy: PollingPolicy
+    timeout: float
+    deadline: float
+    next_poll_at: float
+    attempt: int = 0
+    polls: int = 0
+    waiters: int = 0
+    in_flight: bool = False
+
+
+class PredictionPoller:
+    """Single status poller shared by every prediction waited on by a client
+
+    Instead of one polling loop per waiter, all outstanding prediction IDs
+    are polled from one task under a shared request budget
+    (``max_requests_per_second``). When at least ``bulk_threshold`` polls
+    are due together (polls due within ``coalesce_window`` are pulled
+    forward), one ``GET /predictions`` list request is used to find which of
+    them changed; only finished predictions are then fetched individually.
+    Due polls run as separate tasks, so one slow request only delays the
+    prediction it is for; the budget still spaces out when they are sent.
+    """
+
+    def __init__(self, client: Any, max_requests_per_second: float = 10.0,
+                 bulk_threshold: int = 4, coalesce_window: float = 0.5):
+        self.client = client
+        self.max_requests_per_second = max_requests_per_second
+        self.bulk_threshold = bulk_threshold
+        self.coalesce_window = coalesce_window
+        self.requests_sent = 0
+        self._entries: Dict[str, _PollEntry] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._poll_tasks: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._next_request_at = 0.0
+
+    @property
+    def outstanding(self) -> int:
+        return len(self._entries)
+
+    async def wait(self, prediction_id: str, timeout: float,
+                   policy: PollingPolicy, first_poll_delay: float = 0.0):
+        """Wait until the prediction reaches a terminal status"""
+        loop = asyncio.get_running_loop()
+        entry = self._entries.get(prediction_id)
+        if entry is None:
+            now = loop.time()
+            entry = _PollEntry(
+                prediction_id=prediction_id,
+                future=loop.create_future(),
+                policy=policy,
+                timeout=timeout,
+                deadline=now + timeout,
+                next_poll_at=now + max(0.0, min(first_poll_delay, timeout)),
+            )
+            self._entries[prediction_id] = entry
+            self._ensure_running()
+
+        entry.waiters += 1
+        try:
+            return await asyncio.shield(entry.future)
+        finally:
+            entry.waiters -= 1
+            if entry.waiters <= 0 and not entry.future.done():
+                # Last waiter went away (cancelled); stop tracking it
+                entry.future.cancel()
+                self._entries.pop(prediction_id, None)
+
+    def notify(self, status: Any) -> bool:
+        """Resolve a tracked prediction from a pushed status update
+
+        Used by push channels such as webhooks; polling for the prediction
+        stops as soon as a terminal status arrives. Returns True if a waiter
+        was resolved.
+        """
+        entry = self._entries.get(status.id)
+        if entry is None or entry.future.done() or status.status not in TERMINAL_STATUSES:
+            return False
+        self._finish(entry, result=status)
+        return True
+
+    def _ensure_running(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def close(self) -> None:
+        """Stop polling and fail any remaining waiters"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        poll_tasks, self._poll_tasks = list(self._poll_tasks), set()
+        for task in poll_tasks:
+            task.cancel()
+        await asyncio.gather(*poll_tasks, return_exceptions=True)
+        self._fail_all(RuntimeError("Prediction poller closed"))
+
+    def _fail_all(self, error: BaseException) -> None:
+        for entry in list(self._entries.values()):
+            if not entry.future.done():
+                entry.future.set_exception(error)
+        self._entries.clear()
+
+    def _finish(self, entry: _PollEntry, result: Any = None,
+                error: Optional[BaseException] = None) -> None:
+        self._entries.pop(entry.prediction_id, None)
+        if entry.future.done():
+            return
+        if error is not None:
+            entry.future.set_exception(error)
+        else:
+            result.poll_count = entry.polls
+            entry.future.set_result(result)
+
+    def _reschedule(self, entry: _PollEntry, now: float) -> None:
+        entry.attempt += 1
+        entry.next_poll_at = now + entry.policy.interval(entry.attempt - 1)
+
+    async def _throttle(self) -> None:
+        """Reserve the next send slot under the budget and wait for it"""
+        loop = asyncio.get_running_loop()
+        spacing = 1.0 / self.max_requests_per_second if self.max_requests_per_second > 0 else 0.0
+        slot = max(loop.time(), self._next_request_at)
+        self._next_request_at = slot + spacing
+        self.requests_sent += 1
+        delay = slot - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _spawn(self, entries: List[_PollEntry], coro: Any) -> None:
+        """Run a poll of ``entries`` as its own task; the loop skips them meanwhile"""
+        for entry in entries:
+            entry.in_flight = True
+        task = asyncio.ensure_future(coro)
+        self._poll_tasks.add(task)
+
+        def done(task: asyncio.Task) -> None:
+            self._poll_tasks.discard(task)
+            for entry in entries:
+                entry.in_flight = False
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"Prediction poll failed unexpectedly: {str(task.exception())}")
+                for entry in entries:
+                    self._finish(entry, error=task.exception())
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+        task.add_done_callback(done)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while self._entries:
+                now = loop.time()
+                for entry in list(self._entries.values()):
+                    if entry.future.done():
+                        self._entries.pop(entry.prediction_id, None)
+                    elif now >= entry.deadline:
+                        self._finish(entry, error=TimeoutError(
+                            f"Prediction {entry.prediction_id} timed out after {entry.timeout} seconds"
+                        ))
+
+                idle = [entry for entry in self._entries.values() if not entry.in_flight]
+                due = [entry for entry in idle if entry.next_poll_at <= now]
+                if due and len(self._entries) >= self.bulk_threshold:
+                    # A list request is about to be spent anyway: let it cover
+                    # every prediction whose poll would fall due shortly after
+                    horizon = now + self.coalesce_window
+                    due = [entry for entry in idle if entry.next_poll_at <= horizon]
+                if not due:
+                    if not self._entries:
+                        break
+                    # In-flight polls wake the loop when they finish
+                    next_at = min(
+                        [entry.deadline for entry in self._entries.values()]
+                        + [entry.next_poll_at for entry in idle]
+                    )
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_at - now))
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                if len(due) >= self.bulk_threshold:
+                    self._spawn(due, self._poll_bulk(due))
+                else:
+                    for entry in due:
+                        self._spawn([entry], self._poll_one(entry))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Prediction poller stopped unexpectedly: {str(e)}")
+            self._fail_all(e)
+
+    async def _poll_one(self, entry: _PollEntry) -> None:
+        if entry.future.done() or entry.prediction_id not in self._entries:
+            return
+        await self._throttle()
+        if entry.future.done():
+            return
+        try:
+            status = await self.client.get_prediction(entry.prediction_id)
+        except Exception as e:
+            self._finish(entry, error=e)
+            return
+
+        entry.polls += 1
+        if status.status in TERMINAL_STATUSES:
+            self._finish(entry, result=status)
+        else:
+            self._reschedule(entry, asyncio.get_running_loop().time())
+
+    async def _poll_bulk(self, due: List[_PollEntry]) -> None:
+        await self._throttle()
+        try:
+            listed, _ = await self.client.list_predictions()
+        except Exception as e:
+            logger.warning(f"Bulk prediction listing failed, polling individually: {str(e)}")
+            listed = []
+
+        by_id = {status.id: status for status in listed}
+        now = asyncio.get_running_loop().time()
+        fetch = []
+        for entry in due:
+            status = by_id.get(entry.prediction_id)
+            if status is None or status.status in TERMINAL_STATUSES:
+                # Not on the first page, or finished: fetch the full record
+                fetch.append(entry)
+            else:
+                entry.polls += 1
+                self._reschedule(entry, now)
+        await asyncio.gather(*(self._poll_one(entry) for entry in fetch))
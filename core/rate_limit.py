@@ -0,0 +1,160 @@
+"""
+Client-side rate limiting
+Token buckets shared by every coroutine using the same API token, so requests
+wait before sending instead of tripping Replicate's rate limits
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from .utils import read_env_setting
+
+
+@dataclass
+class RateLimitConfig:
+    """Sustained rates (requests/second) and burst sizes per request class
+
+    Defaults follow Replicate's published limits: 600 prediction creates and
+    3000 other requests per minute.
+    """
+    create_rate: float = 10.0
+    create_burst: int = 10
+    read_rate: float = 50.0
+    read_burst: int = 50
+
+    @classmethod
+    def from_env(cls) -> "RateLimitConfig":
+        """Build config from REPLICATE_*_RATE / REPLICATE_*_BURST environment variables"""
+        defaults = cls()
+        return cls(
+            create_rate=read_env_setting('REPLICATE_CREATE_RATE', defaults.create_rate),
+            create_burst=read_env_setting('REPLICATE_CREATE_BURST', defaults.create_burst),
+            read_rate=read_env_setting('REPLICATE_READ_RATE', defaults.read_rate),
+            read_burst=read_env_setting('REPLICATE_READ_BURST', defaults.read_burst),
+        )
+
+
+class TokenBucket:
+    """Reservation-based token bucket
+
+    Each caller reserves a token immediately (the balance may go negative)
+    and sleeps until its reservation is covered, which keeps waiters in FIFO
+    order without holding a lock across the sleep.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(rate, 1e-6)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        # Tokens accrue from this moment; it lies in the future while paused
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            delay = max(0.0, self._updated - now)
+            if self._tokens < 0:
+                delay += -self._tokens / self.rate
+            return delay
+
+    def _refund(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    async def acquire(self) -> float:
+        """Wait for a token; returns the seconds spent queued"""
+        delay = self._reserve()
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._refund()
+                raise
+
+        with self._lock:
+            self.acquired += 1
+            if delay > 0:
+                self.waited += 1
+                self.total_wait += delay
+                self.max_wait = max(self.max_wait, delay)
+        return delay
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back for ``seconds`` (e.g. after a 429)
+
+        No tokens accrue during the pause, so callers that queue up meanwhile
+        leave one by one at the sustained rate instead of all at once.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._updated = max(self._updated, now + seconds)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'acquired': self.acquired,
+                'waited': self.waited,
+                'total_wait': round(self.total_wait, 3),
+                'max_wait': round(self.max_wait, 3),
+                'avg_wait': round(self.total_wait / self.acquired, 4) if self.acquired else 0.0,
+            }
+
+
+class RateLimiter:
+    """Separate create and read buckets for one API token"""
+
+    def __init__(self, config: Optional[RateLimitConfig] = None):
+        self.config = config or RateLimitConfig.from_env()
+        self.create = TokenBucket(self.config.create_rate, self.config.create_burst)
+        self.read = TokenBucket(self.config.read_rate, self.config.read_burst)
+        # Number of server-side rate-limit responses seen for this token
+        self.throttle_events = 0
+
+    def bucket_for(self, method: str, endpoint: str) -> TokenBucket:
+        if method.upper() == 'POST' and endpoint.rstrip('/') == '/predictions':
+            return self.create
+        return self.read
+
+    async def acquire(self, method: str, endpoint: str) -> float:
+        """Wait for capacity for a request; returns the seconds spent queued"""
+        return await self.bucket_for(method, endpoint).acquire()
+
+    def pause(self, seconds: float) -> None:
+        """Back off every request class after the server signalled a rate limit"""
+        self.throttle_events += 1
+        self.create.pause(seconds)
+        self.read.pause(seconds)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Queue-wait metrics per request class"""
+        return {'create': self.create.stats(), 'read': self.read.stats()}
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_token: str) -> RateLimiter:
+    """Return the limiter shared by every client using ``api_token``"""
+    with _limiters_lock:
+        limiter = _limiters.get(api_token)
+        if limiter is None:
+            limiter = RateLimiter()
+            _limiters[api_token] = limiter
+        return limiter
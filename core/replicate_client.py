@@ -5,14 +5,49 @@ Handles communication with Replicate API
 
 import aiohttp
 import asyncio
+import hashlib
 import json
 import time
-from typing import Dict, List, Optional, Any, Union
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
 import logging
 
+from .polling import TERMINAL_STATUSES, PollingPolicy, PredictionPoller, parse_timestamp
+from .rate_limit import RateLimiter, get_rate_limiter
+from .retry import (
+    AmbiguousCreateError,
+    CircuitBreakerRegistry,
+    ReplicateNetworkError,
+    RetryPolicy,
+    call_with_retry,
+)
+
 logger = logging.getLogger(__name__)
 
+# Upper bound Replicate accepts for the "Prefer: wait=N" header
+MAX_PREFER_WAIT = 60
+# Created prediction IDs remembered per client for create recovery
+MAX_CLAIMED_PREDICTIONS = 1024
+
+class ReplicateAPIError(Exception):
+    """Non-success HTTP response from the Replicate API"""
+
+    def __init__(self, message: str, status: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class PredictionFailedError(RuntimeError):
+    """A prediction reached a terminal status other than succeeded"""
+
+    def __init__(self, message: str, prediction_id: Optional[str] = None,
+                 status: Optional[str] = None):
+        super().__init__(message)
+        self.prediction_id = prediction_id
+        self.status = status
+
 @dataclass
 class ModelInfo:
     """Replicate model information"""
@@ -35,14 +70,95 @@ class PredictionStatus:
     created_at: Optional[str] = None
     completed_at: Optional[str] = None
     urls: Optional[Dict[str, str]] = None
+    started_at: Optional[str] = None
+    poll_count: int = 0  # status requests spent waiting on this prediction
+    queue_wait: float = 0.0  # seconds the create request waited in the rate limiter
+
+@dataclass
+class UploadedFile:
+    """An input file stored through the Files API"""
+    id: str
+    url: str  # pass this as the prediction input
+    size: int = 0
+    expires_at: Optional[float] = None  # epoch seconds, when Replicate deletes it
+
+@dataclass
+class StreamEvent:
+    """One server-sent event from a prediction stream
+
+    ``event`` is ``output``, ``logs``, ``error`` or ``done``; ``done`` marks
+    the prediction's terminal status change.
+    """
+    event: str
+    data: str
+    id: Optional[str] = None
+
+class _CreateGroup:
+    """Concurrent creates of one (version, input) payload on one client
+
+    Recovering an ambiguous create claims the unclaimed recent prediction
+    that matches the payload, so it must not look while a sibling create is
+    still open (e.g. held by ``Prefer: wait``): the sibling's prediction
+    already exists but is not claimed yet. Sends wait while a recovery runs,
+    and a recovery waits until no sibling is sending.
+    """
+
+    def __init__(self):
+        self.members = 0
+        self.sending = 0
+        self.recovering = False
+        self.condition = asyncio.Condition()
+
+    async def begin_send(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: not self.recovering)
+            self.sending += 1
+
+    async def end_send(self) -> None:
+        async with self.condition:
+            self.sending -= 1
+            self.condition.notify_all()
+
+    async def begin_recovery(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.sending == 0 and not self.recovering)
+            self.recovering = True
+
+    async def end_recovery(self) -> None:
+        async with self.condition:
+            self.recovering = False
+            self.condition.notify_all()
+
 
 class ReplicateClient:
     """Asynchronous Replicate API client"""
 
-    def __init__(self, api_token: str, base_url: str = "https://api.replicate.com/v1"):
+    def __init__(self, api_token: str, base_url: str = "https://api.replicate.com/v1",
+                 session: Optional[aiohttp.ClientSession] = None,
+                 max_polls_per_second: float = 10.0,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 download_concurrency: int = 8,
+                 download_timeout: float = 120.0):
         self.api_token = api_token
         self.base_url = base_url
-        self.session: Optional[aiohttp.ClientSession] = None
+        # Shared by every client using the same token unless one is supplied
+        self.rate_limiter = rate_limiter or get_rate_limiter(api_token)
+        self.retry_policy = retry_policy or RetryPolicy.from_env()
+        self.circuit_breakers = CircuitBreakerRegistry()
+        # One poller tracks every prediction this client is waiting on
+        self.poller = PredictionPoller(self, max_requests_per_second=max_polls_per_second)
+        self.session: Optional[aiohttp.ClientSession] = session
+        self.download_concurrency = max(1, download_concurrency)
+        self.download_timeout = download_timeout
+        self._download_slots: Optional[asyncio.Semaphore] = None
+        # IDs of predictions this client created or recovered, most recent last;
+        # recovery of an ambiguous create never claims one of them again
+        self._claimed_predictions: "OrderedDict[str, None]" = OrderedDict()
+        # Creates in progress, grouped by payload, so recovery can tell siblings apart
+        self._create_groups: Dict[str, _CreateGroup] = {}
+        # Sessions handed in by a pool are shared and must outlive this client
+        self._owns_session = session is None
         self._cache = {
             'models': {},
             'model_details': {},
@@ -50,28 +166,80 @@ class ReplicateClient:
             'ttl': 3600  # 1 hour cache TTL
         }
 
+    @staticmethod
+    def default_headers(api_token: str) -> Dict[str, str]:
+        """Headers sent with every Replicate API request
+
+        They are added per request rather than set on the session, so the
+        shared session can also fetch output files without leaking the token.
+        """
+        return {
+            "Authorization": f"Bearer {api_token}",
+            "Content-Type": "application/json"
+        }
+
     async def __aenter__(self):
         """Async context manager entry"""
-        self.session = aiohttp.ClientSession(
-            headers={
-                "Authorization": f"Bearer {self.api_token}",
-                "Content-Type": "application/json"
-            },
-            timeout=aiohttp.ClientTimeout(total=300)
-        )
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=300)
+            )
+            self._owns_session = True
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
+        await self.poller.close()
+        if self.session and self._owns_session:
             await self.session.close()
-
-    async def _request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
-        """Make HTTP request to Replicate API"""
+            self.session = None
+
+    async def _request(self, method: str, endpoint: str, rate_limited: bool = True,
+                       idempotent: Optional[bool] = None,
+                       recover: Optional[Callable[[], Awaitable[Any]]] = None,
+                       **kwargs) -> Dict[str, Any]:
+        """Make HTTP request to Replicate API
+
+        Requests wait for capacity in the token's shared rate limiter (pass
+        ``rate_limited=False`` when the caller already acquired it) and are
+        retried on transient failures under ``retry_policy``, behind a
+        per-endpoint circuit breaker. GETs and cancels are idempotent; other
+        POSTs are only retried when ``recover`` can rule out a duplicate.
+        """
         if not self.session:
             raise RuntimeError("Client not initialized. Use 'async with' statement.")
 
+        if idempotent is None:
+            idempotent = method.upper() in ('GET', 'HEAD') or endpoint.endswith('/cancel')
+
+        attempts = 0
+
+        async def attempt() -> Dict[str, Any]:
+            nonlocal attempts
+            attempts += 1
+            if rate_limited or attempts > 1:
+                await self.rate_limiter.acquire(method, endpoint)
+            return await self._send(method, endpoint, **kwargs)
+
+        def on_rate_limited(exc: BaseException) -> float:
+            retry_after = getattr(exc, 'retry_after', None) or 5.0
+            # Hold back every coroutine sharing this token, not just this one
+            self.rate_limiter.pause(retry_after)
+            return retry_after
+
+        return await call_with_retry(
+            attempt,
+            self.retry_policy,
+            breaker=self.circuit_breakers.get(method, endpoint),
+            idempotent=idempotent,
+            recover=recover,
+            on_rate_limited=on_rate_limited,
+        )
+
+    async def _send(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+        """Send one HTTP request and map failures to typed errors"""
         url = f"{self.base_url}{endpoint}"
+        kwargs['headers'] = {**self.default_headers(self.api_token), **(kwargs.get('headers') or {})}
 
         try:
             async with self.session.request(method, url, **kwargs) as response:
@@ -80,14 +248,43 @@ class ReplicateClient:
                 elif response.status == 401:
                     raise Exception("Invalid API token")
                 elif response.status == 429:
-                    retry_after = int(response.headers.get('Retry-After', 5))
-                    await asyncio.sleep(retry_after)
-                    return await self._request(method, endpoint, **kwargs)
+                    try:
+                        retry_after = float(response.headers.get('Retry-After', 5))
+                    except ValueError:
+                        retry_after = 5.0
+                    raise ReplicateAPIError(
+                        "API rate limit exceeded",
+                        status=429,
+                        retry_after=retry_after,
+                    )
                 else:
                     error_text = await response.text()
-                    raise Exception(f"API request failed: {response.status} - {error_text}")
+                    raise ReplicateAPIError(
+                        f"API request failed: {response.status} - {error_text}",
+                        status=response.status,
+                    )
+        except aiohttp.ClientConnectorError as e:
+            raise ReplicateNetworkError(f"Network error: {str(e)}", connect_failed=True)
         except aiohttp.ClientError as e:
-            raise Exception(f"Network error: {str(e)}")
+            raise ReplicateNetworkError(f"Network error: {str(e)}")
+        except asyncio.TimeoutError:
+            raise ReplicateNetworkError(f"Network error: {method} {endpoint} timed out")
+
+    @staticmethod
+    def _to_prediction_status(response: Dict[str, Any]) -> PredictionStatus:
+        """Build a PredictionStatus from a prediction API response"""
+        return PredictionStatus(
+            id=response['id'],
+            status=response['status'],
+            input=response.get('input', {}),
+            output=response.get('output'),
+            error=response.get('error'),
+            logs=response.get('logs'),
+            created_at=response.get('created_at'),
+            completed_at=response.get('completed_at'),
+            urls=response.get('urls'),
+            started_at=response.get('started_at')
+        )
 
     def _is_cache_valid(self, cache_key: str) -> bool:
         """Check if cache entry is still valid"""
@@ -161,8 +358,15 @@ class ReplicateClient:
             raise
 
     async def create_prediction(self, version_id: str, inputs: Dict[str, Any],
-                              webhook: Optional[str] = None) -> PredictionStatus:
-        """Create a new prediction"""
+                              webhook: Optional[str] = None,
+                              wait: Optional[int] = None,
+                              webhook_events_filter: Optional[List[str]] = None) -> PredictionStatus:
+        """Create a new prediction
+
+        With ``wait`` set, the request is sent with ``Prefer: wait=N`` and
+        Replicate holds the connection open for up to N seconds, returning the
+        finished prediction directly when it completes within that window.
+        """
         data = {
             "version": version_id,
             "input": inputs
@@ -170,77 +374,327 @@ class ReplicateClient:
 
         if webhook:
             data["webhook"] = webhook
+            if webhook_events_filter:
+                data["webhook_events_filter"] = webhook_events_filter
+
+        headers = {}
+        if wait:
+            wait = max(1, min(int(wait), MAX_PREFER_WAIT))
+            headers["Prefer"] = f"wait={wait}"
+
+        # Allow for clock skew when matching predictions an ambiguous attempt may have created
+        submitted_since = time.time() - 30
+
+        group_key = self._payload_key(version_id, inputs)
+        group = self._create_groups.setdefault(group_key, _CreateGroup())
+        group.members += 1
+        sending = False
+
+        async def recover() -> Optional[Dict[str, Any]]:
+            nonlocal sending
+            await group.end_send()
+            sending = False
+            await group.begin_recovery()
+            try:
+                return await self._find_submitted_prediction(version_id, inputs, submitted_since)
+            finally:
+                await group.end_recovery()
+                await group.begin_send()
+                sending = True
 
         try:
-            response = await self._request('POST', '/predictions', json=data)
-            return PredictionStatus(
-                id=response['id'],
-                status=response['status'],
-                input=response['input'],
-                output=response.get('output'),
-                error=response.get('error'),
-                logs=response.get('logs'),
-                created_at=response.get('created_at'),
-                completed_at=response.get('completed_at'),
-                urls=response.get('urls')
-            )
+            queue_wait = await self.rate_limiter.acquire('POST', '/predictions')
+            await group.begin_send()
+            sending = True
+            response = await self._request('POST', '/predictions', rate_limited=False,
+                                           idempotent=False, recover=recover,
+                                           json=data, headers=headers)
+            self._claim_prediction(response['id'])
+            prediction = self._to_prediction_status(response)
+            prediction.queue_wait = queue_wait
+            return prediction
         except Exception as e:
             logger.error(f"Failed to create prediction: {str(e)}")
             raise
+        finally:
+            if sending:
+                await group.end_send()
+            group.members -= 1
+            if group.members == 0:
+                self._create_groups.pop(group_key, None)
+
+    @staticmethod
+    def _payload_key(version_id: str, inputs: Dict[str, Any]) -> str:
+        encoded = json.dumps([version_id, inputs], sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def _claim_prediction(self, prediction_id: str) -> None:
+        self._claimed_predictions[prediction_id] = None
+        self._claimed_predictions.move_to_end(prediction_id)
+        while len(self._claimed_predictions) > MAX_CLAIMED_PREDICTIONS:
+            self._claimed_predictions.popitem(last=False)
+
+    async def _find_submitted_prediction(self, version_id: str, inputs: Dict[str, Any],
+                                         since: float) -> Optional[Dict[str, Any]]:
+        """Find a prediction that an ambiguous create attempt already submitted
+
+        Returns the matching prediction, or None when the recent predictions
+        show it was not created and resending is safe. Raises
+        AmbiguousCreateError when that cannot be determined, so the create is
+        not sent twice: when a result lacks its input, or when several
+        unclaimed predictions match. Callers hold the payload's create group
+        in recovery, so sibling creates have claimed their predictions.
+        """
+        response = await self._request('GET', '/predictions')
+        candidates = []
+        for item in response.get('results', []):
+            created = parse_timestamp(item.get('created_at'))
+            if created is None or created < since:
+                continue
+            if item.get('id') in self._claimed_predictions:
+                continue
+            if 'input' not in item or 'version' not in item:
+                raise AmbiguousCreateError("Cannot verify whether the prediction was created; not resubmitting")
+            if item.get('version') == version_id and item['input'] == inputs:
+                candidates.append(item)
+
+        if len(candidates) > 1:
+            raise AmbiguousCreateError(
+                f"Cannot tell which of {len(candidates)} matching predictions was created; "
+                "not resubmitting"
+            )
+        if candidates:
+            self._claim_prediction(candidates[0]['id'])
+            return candidates[0]
+        return None
 
     async def get_prediction(self, prediction_id: str) -> PredictionStatus:
         """Get prediction status and results"""
         try:
             response = await self._request('GET', f'/predictions/{prediction_id}')
-            return PredictionStatus(
-                id=response['id'],
-                status=response['status'],
-                input=response['input'],
-                output=response.get('output'),
-                error=response.get('error'),
-                logs=response.get('logs'),
-                created_at=response.get('created_at'),
-                completed_at=response.get('completed_at'),
-                urls=response.get('urls')
-            )
+            return self._to_prediction_status(response)
         except Exception as e:
             logger.error(f"Failed to get prediction {prediction_id}: {str(e)}")
             raise
 
+    async def get_webhook_secret(self) -> str:
+        """Get the signing secret used for this account's webhooks"""
+        try:
+            response = await self._request('GET', '/webhooks/default/secret')
+            return response['key']
+        except Exception as e:
+            logger.error(f"Failed to get webhook secret: {str(e)}")
+            raise
+
+    async def list_predictions(self, cursor: Optional[str] = None) -> Tuple[List[PredictionStatus], Optional[str]]:
+        """List recent predictions (newest first), one page at a time
+
+        Returns the page and the cursor URL of the next page, if any.
+        """
+        try:
+            if cursor:
+                endpoint = cursor[len(self.base_url):] if cursor.startswith(self.base_url) else cursor
+            else:
+                endpoint = '/predictions'
+            response = await self._request('GET', endpoint)
+            predictions = [self._to_prediction_status(item) for item in response.get('results', [])]
+            return predictions, response.get('next')
+        except Exception as e:
+            logger.error(f"Failed to list predictions: {str(e)}")
+            raise
+
     async def cancel_prediction(self, prediction_id: str) -> PredictionStatus:
         """Cancel a running prediction"""
         try:
             response = await self._request('POST', f'/predictions/{prediction_id}/cancel')
-            return PredictionStatus(
-                id=response['id'],
-                status=response['status'],
-                input=response['input'],
-                output=response.get('output'),
-                error=response.get('error'),
-                logs=response.get('logs'),
-                created_at=response.get('created_at'),
-                completed_at=response.get('completed_at'),
-                urls=response.get('urls')
-            )
+            return self._to_prediction_status(response)
         except Exception as e:
             logger.error(f"Failed to cancel prediction {prediction_id}: {str(e)}")
             raise
 
-    async def wait_for_prediction(self, prediction_id: str,
-                                 timeout: int = 300, poll_interval: int = 2) -> PredictionStatus:
-        """Wait for prediction to complete with polling"""
-        start_time = time.time()
+    async def upload_file(self, data: bytes, filename: str,
+                          content_type: str = "application/octet-stream") -> UploadedFile:
+        """Upload an input file through the Files API
+
+        The returned URL can be used in prediction inputs in place of an
+        inline data URI, by any number of predictions.
+        """
+        writer = aiohttp.MultipartWriter("form-data")
+        part = writer.append(data, {"Content-Type": content_type})
+        part.set_content_disposition("form-data", name="content", filename=filename)
 
-        while True:
-            prediction = await self.get_prediction(prediction_id)
+        try:
+            # A repeated upload only stores a duplicate file, so retrying is safe
+            response = await self._request(
+                'POST', '/files', idempotent=True, data=writer,
+                headers={"Content-Type": writer.headers["Content-Type"]},
+            )
+        except Exception as e:
+            logger.error(f"Failed to upload file {filename}: {str(e)}")
+            raise
 
-            if prediction.status in ['succeeded', 'failed', 'canceled']:
-                return prediction
+        return UploadedFile(
+            id=response['id'],
+            url=(response.get('urls') or {})['get'],
+            size=response.get('size', len(data)),
+            expires_at=parse_timestamp(response.get('expires_at')),
+        )
+
+    async def download(self, url: str) -> bytes:
+        """Fetch an output file on the client's session
 
-            if time.time() - start_time > timeout:
+        At most ``download_concurrency`` downloads run at once per client.
+        The API token is only sent to URLs under ``base_url``, never to
+        delivery hosts. Transient failures are retried like API requests.
+        """
+        if not self.session:
+            raise RuntimeError("Client not initialized. Use 'async with' statement.")
+        if self._download_slots is None:
+            self._download_slots = asyncio.Semaphore(self.download_concurrency)
+
+        headers = self.default_headers(self.api_token) if url.startswith(self.base_url) else None
+        timeout = aiohttp.ClientTimeout(total=self.download_timeout)
+
+        async def attempt() -> bytes:
+            try:
+                async with self.session.get(url, headers=headers, timeout=timeout) as response:
+                    if response.status != 200:
+                        raise ReplicateAPIError(
+                            f"Download failed: {response.status} - {url}",
+                            status=response.status,
+                        )
+                    return await response.read()
+            except aiohttp.ClientConnectorError as e:
+                raise ReplicateNetworkError(f"Network error: {str(e)}", connect_failed=True)
+            except aiohttp.ClientError as e:
+                raise ReplicateNetworkError(f"Network error: {str(e)}")
+            except asyncio.TimeoutError:
+                raise ReplicateNetworkError(f"Network error: download of {url} timed out")
+
+        async with self._download_slots:
+            return await call_with_retry(attempt, self.retry_policy)
+
+    async def download_all(self, urls: List[str]) -> Dict[str, Optional[bytes]]:
+        """Fetch several output files in parallel; failed downloads map to None"""
+        unique = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(self.download(url) for url in unique), return_exceptions=True)
+
+        downloads: Dict[str, Optional[bytes]] = {}
+        for url, result in zip(unique, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                logger.warning(f"Failed to download output {url}: {str(result)}")
+                downloads[url] = None
+            else:
+                downloads[url] = result
+        return downloads
+
+    async def wait_for_prediction(self, prediction_id: str, timeout: float = 300,
+                                  poll_interval: Union[float, PollingPolicy] = 2,
+                                  first_poll_delay: float = 0.0,
+                                  stream_url: Optional[str] = None) -> PredictionStatus:
+        """Wait for prediction to complete via the client's shared poller
+
+        ``poll_interval`` may be a fixed number of seconds or a PollingPolicy
+        describing an adaptive schedule. ``first_poll_delay`` postpones the
+        first status request, e.g. to the expected finish time of the model.
+        The returned status carries the number of polls used in ``poll_count``.
+
+        When ``stream_url`` is given, the prediction's event stream is consumed
+        instead and polling is only used if the stream fails.
+        """
+        if isinstance(poll_interval, PollingPolicy):
+            policy = poll_interval
+        else:
+            policy = PollingPolicy.fixed(poll_interval)
+
+        if stream_url:
+            start_time = time.monotonic()
+            try:
+                prediction = await asyncio.wait_for(
+                    self._wait_via_stream(prediction_id, stream_url), timeout
+                )
+                if prediction.status in TERMINAL_STATUSES:
+                    return prediction
+            except asyncio.TimeoutError:
                 raise TimeoutError(f"Prediction {prediction_id} timed out after {timeout} seconds")
+            except Exception as e:
+                logger.warning(f"Prediction stream failed for {prediction_id}, polling instead: {str(e)}")
+            timeout = max(0.0, timeout - (time.monotonic() - start_time))
+            first_poll_delay = 0.0
+
+        return await self.poller.wait(
+            prediction_id,
+            timeout=timeout,
+            policy=policy,
+            first_poll_delay=first_poll_delay,
+        )
+
+    async def stream_prediction(self, prediction: Union[PredictionStatus, str]) -> AsyncIterator[StreamEvent]:
+        """Iterate over the server-sent events of a prediction as they arrive
+
+        Accepts a PredictionStatus carrying ``urls['stream']`` or the stream
+        URL itself. Iteration ends after the ``done`` event.
+        """
+        if not self.session:
+            raise RuntimeError("Client not initialized. Use 'async with' statement.")
+
+        if isinstance(prediction, PredictionStatus):
+            stream_url = (prediction.urls or {}).get('stream')
+            if not stream_url:
+                raise ValueError(f"Prediction {prediction.id} has no stream URL")
+        else:
+            stream_url = prediction
+
+        headers = {
+            **self.default_headers(self.api_token),
+            "Accept": "text/event-stream",
+            "Cache-Control": "no-store",
+        }
+        await self.rate_limiter.acquire('GET', stream_url)
+        try:
+            async with self.session.get(stream_url, headers=headers,
+                                        timeout=aiohttp.ClientTimeout(total=None)) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise Exception(f"Stream request failed: {response.status} - {error_text}")
+
+                event_type, event_id, data_lines = "message", None, []
+                async for raw_line in response.content:
+                    line = raw_line.decode('utf-8').rstrip('\r\n')
+                    if not line:
+                        if data_lines or event_type != "message":
+                            event = StreamEvent(event=event_type, data="\n".join(data_lines), id=event_id)
+                            yield event
+                            if event.event == 'done':
+                                return
+                        event_type, event_id, data_lines = "message", None, []
+                        continue
+                    if line.startswith(':'):
+                        continue
+
+                    field, _, value = line.partition(':')
+                    if value.startswith(' '):
+                        value = value[1:]
+                    if field == 'event':
+                        event_type = value
+                    elif field == 'data':
+                        data_lines.append(value)
+                    elif field == 'id':
+                        event_id = value
+        except aiohttp.ClientError as e:
+            raise Exception(f"Network error: {str(e)}")
+
+    async def _wait_via_stream(self, prediction_id: str, stream_url: str) -> PredictionStatus:
+        """Consume the stream until ``done``, then fetch the final prediction"""
+        async for event in self.stream_prediction(stream_url):
+            if event.event == 'logs':
+                logger.debug(f"[{prediction_id}] {event.data}")
 
-            await asyncio.sleep(poll_interval)
+        prediction = await self.get_prediction(prediction_id)
+        prediction.poll_count = 1
+        return prediction
 
     def clear_cache(self):
         """Clear all cached data"""
@@ -0,0 +1,251 @@
+"""
+Retry engine and circuit breakers
+Bounded, jittered retries for transient Replicate API failures, with
+per-endpoint circuit breakers so callers fail fast during an outage
+"""
+
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+
+from .utils import read_env_setting
+
+logger = logging.getLogger(__name__)
+
+# Error classes, from the retry engine's point of view
+ERROR_RATE_LIMITED = "rate_limited"   # 429: rejected before processing, always safe to retry
+ERROR_CONNECT = "connect"             # request never reached the server, always safe
+ERROR_TRANSIENT = "transient"         # 5xx / timeout / dropped connection: outcome unknown
+ERROR_FATAL = "fatal"                 # 4xx and everything else: do not retry
+
+TRANSIENT_STATUSES = (408, 500, 502, 503, 504)
+
+
+class ReplicateNetworkError(Exception):
+    """Transport-level failure talking to the Replicate API"""
+
+    def __init__(self, message: str, connect_failed: bool = False):
+        super().__init__(message)
+        self.connect_failed = connect_failed
+
+
+class AmbiguousCreateError(Exception):
+    """An ambiguous create may have taken effect, but its prediction cannot be identified
+
+    Neither resending nor retrying can be done without risking a duplicate,
+    so the request is given up; other requests are unaffected.
+    """
+
+
+class CircuitOpenError(Exception):
+    """Raised without sending a request while an endpoint's circuit is open"""
+
+
+def classify_error(exc: BaseException) -> str:
+    """Map an exception from a request to one of the ERROR_* classes"""
+    status = getattr(exc, 'status', None)
+    if isinstance(status, int):
+        if status == 429:
+            return ERROR_RATE_LIMITED
+        if status in TRANSIENT_STATUSES:
+            return ERROR_TRANSIENT
+        return ERROR_FATAL
+    if isinstance(exc, ReplicateNetworkError):
+        return ERROR_CONNECT if exc.connect_failed else ERROR_TRANSIENT
+    if isinstance(exc, aiohttp.ClientConnectorError):
+        return ERROR_CONNECT
+    if isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError)):
+        return ERROR_TRANSIENT
+    return ERROR_FATAL
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Attempt limit, per-call deadline and full-jitter exponential backoff"""
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    deadline: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        """Build policy from REPLICATE_RETRY_* environment variables"""
+        defaults = cls()
+        return cls(
+            max_attempts=read_env_setting('REPLICATE_RETRY_ATTEMPTS', defaults.max_attempts),
+            base_delay=defaults.base_delay,
+            max_delay=defaults.max_delay,
+            deadline=read_env_setting('REPLICATE_RETRY_DEADLINE', defaults.deadline),
+        )
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number ``attempt`` (1-based)"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one endpoint
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail immediately for ``reset_timeout`` seconds; then a single trial
+    call is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the endpoint should not be called now"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"Circuit open for {self.name}; failing fast")
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError(f"Circuit half-open for {self.name}; trial in progress")
+                self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Opening circuit for {self.name} after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def record_neutral(self) -> None:
+        """Release a half-open trial without judging the endpoint (e.g. a 4xx)"""
+        with self._lock:
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self.failures = 0
+
+
+class CircuitBreakerRegistry:
+    """Circuit breakers keyed by method and endpoint template"""
+
+    _ID_SEGMENT = re.compile(r'/(predictions|files|trainings)/[^/]+')
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def endpoint_key(cls, method: str, endpoint: str) -> str:
+        path = cls._ID_SEGMENT.sub(r'/\1/{id}', endpoint.split('?', 1)[0])
+        return f"{method.upper()} {path}"
+
+    def get(self, method: str, endpoint: str) -> CircuitBreaker:
+        key = self.endpoint_key(method, endpoint)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(key, self.failure_threshold, self.reset_timeout)
+                self._breakers[key] = breaker
+            return breaker
+
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            return {key: breaker.state for key, breaker in self._breakers.items()}
+
+
+async def call_with_retry(
+    operation: Callable[[], Awaitable[Any]],
+    policy: RetryPolicy,
+    breaker: Optional[CircuitBreaker] = None,
+    idempotent: bool = True,
+    recover: Optional[Callable[[], Awaitable[Any]]] = None,
+    on_rate_limited: Optional[Callable[[BaseException], Optional[float]]] = None,
+) -> Any:
+    """Run ``operation`` with bounded retries
+
+    Rate-limited and connect failures are always retried. Other transient
+    failures are retried directly only for idempotent operations; for the
+    rest the request may already have taken effect, so ``recover`` is
+    awaited first. It returns the result of the earlier attempt if one took
+    effect, None if it verifiably did not (retrying is then safe), or raises
+    if that cannot be determined. Without ``recover`` such failures are not
+    retried.
+    """
+    start = time.monotonic()
+    attempt = 0
+
+    while True:
+        attempt += 1
+        if breaker is not None:
+            breaker.before_call()
+
+        try:
+            result = await operation()
+        except asyncio.CancelledError:
+            if breaker is not None:
+                breaker.record_neutral()
+            raise
+        except Exception as exc:
+            kind = classify_error(exc)
+            if breaker is not None:
+                if kind in (ERROR_TRANSIENT, ERROR_CONNECT):
+                    breaker.record_failure()
+                else:
+                    breaker.record_neutral()
+
+            retry_after = None
+            if kind == ERROR_RATE_LIMITED and on_rate_limited is not None:
+                retry_after = on_rate_limited(exc)
+
+            if kind == ERROR_FATAL:
+                raise
+            if kind == ERROR_TRANSIENT and not idempotent:
+                if recover is None:
+                    raise
+                recovered = await recover()
+                if recovered is not None:
+                    logger.info("Recovered result of an ambiguous request instead of resending it")
+                    return recovered
+
+            delay = policy.backoff(attempt, retry_after)
+            elapsed = time.monotonic() - start
+            if attempt >= policy.max_attempts or elapsed + delay > policy.deadline:
+                raise
+
+            logger.info(f"Retrying after {kind} error (attempt {attempt}/{policy.max_attempts}): {exc}")
+            await asyncio.sleep(delay)
+            continue
+
+        if breaker is not None:
+            breaker.record_success()
+        return result
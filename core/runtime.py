@@ -0,0 +1,164 @@
+"""
+Background event loop runtime
+Runs a single persistent asyncio loop on a daemon thread so that pooled
+sessions, caches and background tasks survive across node executions
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Coroutine, List, Optional
+
+from .client_pool import get_client_pool
+from .lifecycle import get_lifecycle_registry
+from .webhooks import get_webhook_receiver
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoopRunner:
+    """Owns one asyncio event loop running forever on a daemon thread.
+
+    Synchronous callers (ComfyUI node executions) submit coroutines with
+    :meth:`submit` or :meth:`run`; the loop itself is never patched or
+    re-entered, so it is safe to use alongside a host application loop.
+    """
+
+    def __init__(self, name: str = "replicate-event-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._shutdown_hooks: List[Callable[[], Awaitable[None]]] = []
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running background loop, started on first access"""
+        self.start()
+        return self._loop
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def in_loop_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def start(self) -> None:
+        """Start the loop thread if it is not already running"""
+        with self._lock:
+            if self.is_running():
+                return
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            thread = threading.Thread(
+                target=self._run_loop,
+                args=(loop, ready),
+                name=self.name,
+                daemon=True,
+            )
+            thread.start()
+            ready.wait()
+            self._loop = loop
+            self._thread = thread
+
+    def _run_loop(self, loop: asyncio.AbstractEventLoop, ready: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            try:
+                pending = [task for task in asyncio.all_tasks(loop) if not task.done()]
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                loop.close()
+
+    def add_shutdown_hook(self, hook: Callable[[], Awaitable[None]]) -> None:
+        """Register a coroutine function awaited on the loop before it stops"""
+        self._shutdown_hooks.append(hook)
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """Schedule a coroutine on the background loop from any other thread"""
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("Cannot block on the background loop from its own thread")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None,
+            cancel_check: Optional[Callable[[], bool]] = None,
+            check_interval: float = 0.2) -> Any:
+        """Run a coroutine on the background loop and block for its result
+
+        ``cancel_check`` is called every ``check_interval`` seconds while
+        waiting; when it returns True the task is cancelled and
+        InterruptedError is raised.
+        """
+        future = self.submit(coro)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                wait = None if cancel_check is None else check_interval
+                if deadline is not None:
+                    remaining = max(0.0, deadline - time.monotonic())
+                    wait = remaining if wait is None else min(wait, remaining)
+                try:
+                    return future.result(timeout=wait)
+                except concurrent.futures.TimeoutError:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        future.cancel()
+                        raise TimeoutError(f"Background task did not finish within {timeout} seconds")
+                if cancel_check is not None and cancel_check():
+                    future.cancel()
+                    raise InterruptedError("Background task was interrupted")
+        except BaseException:
+            # Interrupted callers must not leave work running on the loop
+            future.cancel()
+            raise
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Run shutdown hooks, stop the loop and join its thread"""
+        with self._lock:
+            if not self.is_running():
+                return
+            loop, thread = self._loop, self._thread
+
+        if not self.in_loop_thread():
+            for hook in self._shutdown_hooks:
+                try:
+                    asyncio.run_coroutine_threadsafe(hook(), loop).result(timeout=timeout)
+                except Exception as e:
+                    logger.warning(f"Background loop shutdown hook failed: {str(e)}")
+
+        loop.call_soon_threadsafe(loop.stop)
+        if not self.in_loop_thread():
+            thread.join(timeout)
+
+        with self._lock:
+            self._loop = None
+            self._thread = None
+
+
+_default_runner: Optional[BackgroundLoopRunner] = None
+_default_runner_lock = threading.Lock()
+
+
+def get_background_runner() -> BackgroundLoopRunner:
+    """Return the process-wide background loop runner"""
+    global _default_runner
+    with _default_runner_lock:
+        if _default_runner is None:
+            _default_runner = BackgroundLoopRunner()
+            # Cancel remote predictions first, while their clients are still open
+            _default_runner.add_shutdown_hook(get_lifecycle_registry().cancel_all)
+            _default_runner.add_shutdown_hook(get_client_pool().release_loop)
+            _default_runner.add_shutdown_hook(get_webhook_receiver().stop)
+            atexit.register(_default_runner.stop)
+        return _default_runner
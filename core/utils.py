@@ -5,9 +5,13 @@ Utility functions for ComfyUI Replicate nodes
 import os
 import json
 import base64
+import functools
+import hashlib
 import io
+import time
+from dataclasses import dataclass
 from typing import Dict, Any, Union, Optional, List
-from PIL import Image
+from PIL import Image, features
 import numpy as np
 import logging
 
@@ -45,44 +49,115 @@ def _load_image_from_string(data: str) -> Optional[Image.Image]:
         return None
 
 
-def convert_image_batch_to_base64_list(
+def _open_image_bytes(data: Optional[bytes]) -> Optional[Image.Image]:
+    if not data:
+        return None
+    try:
+        return Image.open(io.BytesIO(data))
+    except Exception as exc:
+        logger.warning("Failed to decode downloaded image: %s", exc)
+        return None
+
+
+def encode_image_batch(
     images: Any,
     limit: Optional[int] = None,
-) -> List[str]:
-    """Convert batched images to base64 data URI strings."""
+    pool: Optional[Any] = None,
+    encoding: Optional["UploadEncoding"] = None,
+) -> List["EncodedImage"]:
+    """Encode batched images for upload, in order.
+
+    With a codec ``pool`` (see ``core.codec.CodecPool``) the images are
+    encoded in parallel on its workers; PIL releases the GIL while
+    compressing, so a thread pool already scales across cores.
+    """
     if images is None:
         return []
 
-    encoded: List[str] = []
+    encode = functools.partial(encode_image, encoding=encoding or UploadEncoding())
 
     try:
         import torch  # type: ignore
     except ImportError:
         torch = None  # type: ignore
 
-    if torch is not None and isinstance(images, torch.Tensor):
-        tensor = images.detach().cpu()
-        if tensor.ndim == 3:
-            tensor = tensor.unsqueeze(0)
-        max_count = tensor.shape[0]
-        if limit is not None:
-            max_count = min(max_count, limit)
-        for idx in range(max_count):
-            encoded.append(convert_image_to_base64(tensor[idx : idx + 1]))
-        return encoded
-
-    if isinstance(images, list):
+    is_tensor = torch is not None and isinstance(images, torch.Tensor)
+    if is_tensor or (isinstance(images, np.ndarray) and images.ndim == 4):
+        # One vectorized uint8 conversion for the whole batch; images are views into it
+        pixels = image_batch_to_uint8(images, limit)
+        if pool is not None and len(pixels) > 1:
+            return pool.map_batch(encode, pixels, name="encode")
+        items: List[Any] = list(pixels)
+    elif isinstance(images, list):
         items = images if limit is None else images[:limit]
-        for item in items:
-            encoded.append(convert_image_to_base64(item))
-        return encoded
+    else:
+        items = [images]
 
-    encoded.append(convert_image_to_base64(images))
-    return encoded
+    if pool is not None and len(items) > 1:
+        return pool.map(encode, items, name="encode")
+    return [encode(item) for item in items]
 
 
-def parse_replicate_outputs(output: Any) -> tuple[List[np.ndarray], List[str]]:
-    """Parse Replicate outputs into image arrays (float32 0-1) and text fragments."""
+def convert_image_batch_to_base64_list(
+    images: Any,
+    limit: Optional[int] = None,
+    pool: Optional[Any] = None,
+    encoding: Optional["UploadEncoding"] = None,
+) -> List[str]:
+    """Convert batched images to base64 data URI strings (see ``encode_image_batch``)."""
+    return [encoded.data_uri for encoded in encode_image_batch(images, limit, pool, encoding)]
+
+
+def image_batch_array(images: Any, limit: Optional[int] = None) -> np.ndarray:
+    """``[B,H,W,C]`` array of the first ``limit`` images; CPU tensors are not copied."""
+    if hasattr(images, "detach"):
+        # Shares memory with CPU tensors
+        images = images.detach().cpu().numpy()
+
+    batch = np.asarray(images)
+    if batch.ndim == 3:
+        batch = batch[np.newaxis]
+    if limit is not None:
+        batch = batch[:limit]
+    return batch
+
+
+def image_batch_to_uint8(images: Any, limit: Optional[int] = None) -> np.ndarray:
+    """Quantize a ``[B,H,W,C]`` (or ``[H,W,C]``) image batch to uint8 in one pass.
+
+    Accepts a torch tensor or numpy array with floats in 0-1; values are
+    clamped, scaled and truncated exactly as ``convert_image_to_base64`` does
+    per image. Only the first ``limit`` images are converted.
+    """
+    batch = image_batch_array(images, limit)
+    if batch.dtype == np.uint8:
+        return batch
+    if batch.dtype in (np.float32, np.float64):
+        # Single float scratch buffer, then the uint8 result
+        scratch = np.clip(batch, 0.0, 1.0)
+        np.multiply(scratch, 255.0, out=scratch)
+        return scratch.astype(np.uint8)
+    return (batch * 255).astype(np.uint8)
+
+
+def output_urls(output: Any) -> List[str]:
+    """HTTP(S) URLs among Replicate outputs, i.e. the files to download."""
+    entries = output if isinstance(output, list) else [output]
+    return [
+        entry for entry in entries
+        if isinstance(entry, str) and entry.startswith(("http://", "https://"))
+    ]
+
+
+def parse_replicate_outputs(
+    output: Any,
+    downloads: Optional[Dict[str, Optional[bytes]]] = None,
+) -> tuple[List[np.ndarray], List[str]]:
+    """Parse Replicate outputs into image arrays (float32 0-1) and text fragments.
+
+    ``downloads`` maps output URLs to their already fetched bytes (None for a
+    failed download); other URLs are fetched synchronously.
+    """
     image_arrays: List[np.ndarray] = []
     text_parts: List[str] = []
 
@@ -90,7 +165,10 @@ def parse_replicate_outputs(output: Any) -> tuple[List[np.ndarray], List[str]]:
 
     for entry in entries:
         if isinstance(entry, str):
-            image = _load_image_from_string(entry)
+            if downloads is not None and entry in downloads:
+                image = _open_image_bytes(downloads[entry])
+            else:
+                image = _load_image_from_string(entry)
             if image:
                 image = image.convert("RGB")
                 arr = np.array(image).astype(np.float32) / 255.0
@@ -106,9 +184,12 @@ def parse_replicate_outputs(output: Any) -> tuple[List[np.ndarray], List[str]]:
     return image_arrays, text_parts
 
 
-def stack_image_arrays(arrays: List[np.ndarray]):
-    """Stack image arrays into a torch tensor."""
-    if not arrays:
+def stack_image_arrays(arrays: Union[List[np.ndarray], np.ndarray]):
+    """Stack image arrays into a torch tensor.
+
+    An already batched array (N x H x W x C) is wrapped without copying.
+    """
+    if arrays is None or len(arrays) == 0:
         return None
 
     try:
@@ -116,10 +197,28 @@ def stack_image_arrays(arrays: List[np.ndarray]):
     except ImportError as exc:
         raise RuntimeError("torch is required to process images") from exc
 
-    stacked = np.stack(arrays, axis=0).astype(np.float32)
+    if isinstance(arrays, np.ndarray):
+        stacked = np.ascontiguousarray(arrays, dtype=np.float32)
+    else:
+        stacked = np.stack(arrays, axis=0).astype(np.float32)
     return torch.from_numpy(stacked)
 
 
+def read_env_setting(name: str, default: Any) -> Any:
+    """Read a tuning setting from the environment, cast to the default's type"""
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+
+    try:
+        if isinstance(default, bool):
+            return raw.strip().lower() in ('1', 'true', 'yes', 'on')
+        return type(default)(raw.strip())
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring invalid value for {name}: {raw!r}")
+        return default
+
+
 def load_api_token() -> Optional[str]:
     """Load Replicate API token from environment variables or config file"""
     # Try environment variable first
@@ -152,8 +251,73 @@ def save_api_token(token: str):
     except Exception as e:
         logger.error(f"Failed to save API token: {str(e)}")
 
-def convert_image_to_base64(image: Union[Image.Image, np.ndarray]) -> str:
-    """Convert PIL Image or numpy array to base64 string"""
+UPLOAD_FORMATS = ("png", "webp_lossless", "jpeg", "webp")
+
+_MIME_TYPES = {"png": "image/png", "webp_lossless": "image/webp", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+@dataclass(frozen=True)
+class UploadEncoding:
+    """How reference images are encoded before they are sent to Replicate
+
+    ``png`` and ``webp_lossless`` are exact. ``jpeg`` and ``webp`` use
+    ``quality``, or with ``max_bytes`` the highest quality between
+    ``min_quality`` and ``quality`` whose output fits that budget.
+    """
+    format: str = "png"
+    png_compress_level: int = 6     # PIL default; 1 is several times faster
+    quality: int = 90
+    max_bytes: Optional[int] = None
+    min_quality: int = 40
+    max_size: int = 1024            # longest side, larger images are downscaled
+
+
+@dataclass
+class EncodedImage:
+    """One encoded upload and what producing it cost"""
+    data: bytes
+    format: str
+    seconds: float
+    quality: Optional[int] = None
+    # Content key of the source image (see ImageCache), and whether this
+    # result came from the cache instead of being encoded again
+    key: Optional[str] = None
+    cached: bool = False
+
+    @property
+    def bytes(self) -> int:
+        return len(self.data)
+
+    @property
+    def content_type(self) -> str:
+        return _MIME_TYPES[self.format]
+
+    @property
+    def filename(self) -> str:
+        extension = "jpg" if self.format == "jpeg" else self.format.split("_", 1)[0]
+        return f"reference.{extension}"
+
+    @property
+    def content_key(self) -> str:
+        """Stable identity of the image: its cache key, else a hash of the encoded bytes"""
+        return self.key or hashlib.blake2b(self.data, digest_size=16).hexdigest()
+
+    @property
+    def data_uri(self) -> str:
+        """Inline form for request bodies, built on demand"""
+        return f"data:{self.content_type};base64,{base64.b64encode(self.data).decode()}"
+
+    def report(self) -> Dict[str, Any]:
+        report = {"format": self.format, "bytes": self.bytes, "encode_seconds": round(self.seconds, 4)}
+        if self.quality is not None:
+            report["quality"] = self.quality
+        if self.cached:
+            report["cached"] = True
+        return report
+
+
+def _to_upload_image(image: Union[Image.Image, np.ndarray], max_size: int) -> Image.Image:
+    """RGB PIL image from a tensor, array or PIL image, downscaled to ``max_size``"""
     # 延迟导入以避免 ComfyUI 启动阶段强依赖 torch
     try:
         import torch
@@ -201,16 +365,81 @@ def convert_image_to_base64(image: Union[Image.Image, np.ndarray]) -> str:
         pil_image = pil_image.convert('RGB')
 
     # Resize if too large (Replicate limit is 10MB)
-    max_size = 1024
     if max(pil_image.size) > max_size:
         pil_image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
 
-    # Convert to base64
+    return pil_image
+
+
+def _save_image(pil_image: Image.Image, fmt: str, encoding: UploadEncoding, quality: int) -> bytes:
     buffer = io.BytesIO()
-    pil_image.save(buffer, format='PNG')
-    img_str = base64.b64encode(buffer.getvalue()).decode()
+    if fmt == "png":
+        pil_image.save(buffer, format="PNG", compress_level=encoding.png_compress_level)
+    elif fmt == "webp_lossless":
+        pil_image.save(buffer, format="WEBP", lossless=True)
+    elif fmt == "jpeg":
+        pil_image.save(buffer, format="JPEG", quality=quality)
+    else:
+        pil_image.save(buffer, format="WEBP", quality=quality)
+    return buffer.getvalue()
+
+
+def _search_quality(pil_image: Image.Image, fmt: str, encoding: UploadEncoding) -> tuple[bytes, int]:
+    """Highest quality whose output fits ``encoding.max_bytes`` (binary search)"""
+    budget = encoding.max_bytes
+    data = _save_image(pil_image, fmt, encoding, encoding.quality)
+    if len(data) <= budget:
+        return data, encoding.quality
+
+    best: Optional[tuple[bytes, int]] = None
+    low, high = encoding.min_quality, encoding.quality - 1
+    while low <= high:
+        quality = (low + high) // 2
+        candidate = _save_image(pil_image, fmt, encoding, quality)
+        if len(candidate) <= budget:
+            best = (candidate, quality)
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    if best is None:
+        logger.warning(
+            f"Image exceeds the {budget} byte upload budget even at quality {encoding.min_quality}"
+        )
+        return _save_image(pil_image, fmt, encoding, encoding.min_quality), encoding.min_quality
+    return best
+
+
+def encode_image(
+    image: Union[Image.Image, np.ndarray],
+    encoding: Optional[UploadEncoding] = None,
+) -> EncodedImage:
+    """Encode one image as a data URI according to ``encoding``"""
+    encoding = encoding or UploadEncoding()
+    start = time.perf_counter()
+    pil_image = _to_upload_image(image, encoding.max_size)
+
+    fmt = encoding.format if encoding.format in UPLOAD_FORMATS else "png"
+    if fmt.startswith("webp") and not features.check("webp"):
+        logger.warning("Pillow was built without WebP support; encoding PNG instead")
+        fmt = "png"
+
+    quality: Optional[int] = None
+    if fmt in ("jpeg", "webp"):
+        if encoding.max_bytes:
+            data, quality = _search_quality(pil_image, fmt, encoding)
+        else:
+            quality = encoding.quality
+            data = _save_image(pil_image, fmt, encoding, quality)
+    else:
+        data = _save_image(pil_image, fmt, encoding, encoding.quality)
 
-    return f"data:image/png;base64,{img_str}"
+    return EncodedImage(data, fmt, time.perf_counter() - start, quality)
+
+
+def convert_image_to_base64(image: Union[Image.Image, np.ndarray]) -> str:
+    """Convert PIL Image or numpy array to base64 string"""
+    return encode_image(image).data_uri
 
 def convert_tensor_to_image(tensor: np.ndarray) -> Image.Image:
     """Convert tensor to PIL Image"""
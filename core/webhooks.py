@@ -0,0 +1,287 @@
+"""
+Replicate webhook receiver
+Receives signed prediction completion events so waiting coroutines are woken
+by a push from Replicate instead of by polling
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+from .polling import TERMINAL_STATUSES
+from .replicate_client import PredictionStatus, ReplicateClient
+from .utils import read_env_setting
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_EVENTS = ["completed"]
+
+
+@dataclass
+class WebhookConfig:
+    """Where completion events are received and how they are verified"""
+    enabled: bool = False
+    public_url: str = ""            # URL Replicate posts to; defaults to the local endpoint
+    mode: str = "auto"              # auto | embedded | comfyui
+    host: str = "127.0.0.1"         # embedded endpoint; put a tunnel or proxy in front of it
+    port: int = 8190
+    path: str = "/replicate/webhook"
+    secret: str = ""                # "whsec_..." signing key; fetched from the API when empty
+    tolerance: float = 300.0        # max accepted age of a signed event, seconds
+    allow_local_url: bool = False   # accept a loopback/empty public_url (local test servers only)
+
+    @classmethod
+    def from_env(cls) -> "WebhookConfig":
+        """Build config from REPLICATE_WEBHOOK_* environment variables"""
+        defaults = cls()
+        public_url = read_env_setting('REPLICATE_WEBHOOK_URL', defaults.public_url)
+        return cls(
+            enabled=read_env_setting('REPLICATE_WEBHOOK_ENABLED', bool(public_url)),
+            public_url=public_url,
+            mode=read_env_setting('REPLICATE_WEBHOOK_MODE', defaults.mode),
+            host=read_env_setting('REPLICATE_WEBHOOK_HOST', defaults.host),
+            port=read_env_setting('REPLICATE_WEBHOOK_PORT', defaults.port),
+            path=read_env_setting('REPLICATE_WEBHOOK_PATH', defaults.path),
+            secret=read_env_setting('REPLICATE_WEBHOOK_SECRET', defaults.secret),
+            allow_local_url=read_env_setting('REPLICATE_WEBHOOK_ALLOW_LOCAL', defaults.allow_local_url),
+        )
+
+    def url_problem(self) -> Optional[str]:
+        """Why Replicate could not reach ``public_url``, or None if it looks usable"""
+        if self.allow_local_url:
+            return None
+        if not self.public_url:
+            return "REPLICATE_WEBHOOK_URL is not set"
+        host = urlsplit(self.public_url).hostname or ""
+        if host == "localhost" or host.endswith(".localhost"):
+            return f"{self.public_url} is a loopback address"
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return None if host else f"{self.public_url} has no host"
+        if address.is_loopback or address.is_unspecified:
+            return f"{self.public_url} is a loopback address"
+        return None
+
+
+def verify_webhook_signature(secret: str, headers: Mapping[str, str], body: bytes,
+                             tolerance: float = 300.0, now: Optional[float] = None) -> bool:
+    """Check a Replicate (Standard Webhooks) signature
+
+    The signed content is ``"{webhook-id}.{webhook-timestamp}.{body}"``,
+    signed with HMAC-SHA256 using the base64 key after the ``whsec_`` prefix.
+    """
+    webhook_id = headers.get('webhook-id')
+    timestamp = headers.get('webhook-timestamp')
+    signatures = headers.get('webhook-signature')
+    if not secret or not webhook_id or not timestamp or not signatures:
+        return False
+
+    try:
+        sent_at = int(timestamp)
+    except ValueError:
+        return False
+    now = time.time() if now is None else now
+    if abs(now - sent_at) > tolerance:
+        return False
+
+    try:
+        key = base64.b64decode(secret.split('_', 1)[1] if secret.startswith('whsec_') else secret)
+    except (ValueError, TypeError):
+        return False
+
+    signed_content = f"{webhook_id}.{timestamp}.".encode() + body
+    expected = base64.b64encode(hmac.new(key, signed_content, hashlib.sha256).digest()).decode()
+
+    for candidate in signatures.split():
+        version, _, signature = candidate.partition(',')
+        if version == 'v1' and hmac.compare_digest(signature, expected):
+            return True
+    return False
+
+
+class WebhookReceiver:
+    """Routes verified completion events to the coroutines waiting on them
+
+    The endpoint is served either by an embedded aiohttp site running on the
+    caller's event loop or as a route on ComfyUI's own server. Subscribers
+    are invoked on the loop they subscribed from, so events received on the
+    ComfyUI loop safely wake waiters on the background loop.
+    """
+
+    def __init__(self, config: Optional[WebhookConfig] = None, recent_limit: int = 256,
+                 recent_ttl: float = 120.0):
+        self.config = config or WebhookConfig.from_env()
+        self.recent_limit = recent_limit
+        self.recent_ttl = recent_ttl
+        self.events_received = 0
+        self.events_rejected = 0
+        self._secret = self.config.secret
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Tuple[asyncio.AbstractEventLoop, Callable[[PredictionStatus], Any]]] = {}
+        self._recent: "OrderedDict[str, Tuple[float, PredictionStatus]]" = OrderedDict()
+        self._runner: Optional[web.AppRunner] = None
+        self._local_url = ""
+        self._mounted = False
+        self._start_lock: Optional[asyncio.Lock] = None
+        self.disabled_reason = self.config.url_problem() if self.config.enabled else None
+        if self.disabled_reason:
+            logger.warning(
+                f"Replicate webhooks disabled, polling instead: {self.disabled_reason}; "
+                f"set REPLICATE_WEBHOOK_URL to an address Replicate can reach"
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled and not self.disabled_reason
+
+    @property
+    def webhook_url(self) -> str:
+        """URL to pass as the prediction ``webhook``"""
+        return self.config.public_url or self._local_url
+
+    def mount_on_comfyui(self) -> bool:
+        """Register the endpoint as a route on ComfyUI's PromptServer"""
+        if self._mounted:
+            return True
+        try:
+            from server import PromptServer  # type: ignore
+        except ImportError:
+            return False
+
+        instance = getattr(PromptServer, 'instance', None)
+        if instance is None:
+            return False
+
+        instance.routes.post(self.config.path)(self.handle)
+        self._mounted = True
+        logger.info(f"Replicate webhook route mounted on ComfyUI at {self.config.path}")
+        return True
+
+    async def ensure_started(self, client: Optional[ReplicateClient] = None) -> None:
+        """Start the embedded endpoint if needed and load the signing secret"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+
+        async with self._start_lock:
+            problem = self.config.url_problem()
+            if problem:
+                raise RuntimeError(f"Webhook URL is not reachable by Replicate: {problem}")
+            if not self._mounted and self._runner is None:
+                if self.config.mode == "comfyui":
+                    raise RuntimeError("ComfyUI server is not available for the webhook route")
+                await self._start_embedded()
+
+            if not self._secret and client is not None:
+                self._secret = await client.get_webhook_secret()
+
+    async def _start_embedded(self) -> None:
+        app = web.Application()
+        app.router.add_post(self.config.path, self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, self.config.host, self.config.port)
+        await site.start()
+
+        port = self.config.port
+        server = getattr(site, '_server', None)
+        if server is not None and server.sockets:
+            port = server.sockets[0].getsockname()[1]
+        host = "127.0.0.1" if self.config.host in ("0.0.0.0", "::", "") else self.config.host
+        self._local_url = f"http://{host}:{port}{self.config.path}"
+        self._runner = runner
+        logger.info(f"Replicate webhook endpoint listening on {self._local_url}")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+            self._local_url = ""
+
+    def subscribe(self, prediction_id: str, callback: Callable[[PredictionStatus], Any]) -> None:
+        """Call ``callback`` with the terminal status once its event arrives"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers[prediction_id] = (loop, callback)
+            early = self._recent.pop(prediction_id, None)
+
+        # The event may have beaten the subscription (fast predictions)
+        if early is not None and time.monotonic() - early[0] <= self.recent_ttl:
+            loop.call_soon(callback, early[1])
+
+    def unsubscribe(self, prediction_id: str) -> None:
+        with self._lock:
+            self._subscribers.pop(prediction_id, None)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """aiohttp handler for incoming webhook POSTs"""
+        body = await request.read()
+        if not verify_webhook_signature(self._secret, request.headers, body, self.config.tolerance):
+            self.events_rejected += 1
+            logger.warning("Rejected Replicate webhook with invalid or missing signature")
+            return web.json_response({"detail": "invalid signature"}, status=401)
+
+        try:
+            payload = json.loads(body)
+            status = ReplicateClient._to_prediction_status(payload)
+        except (ValueError, KeyError, TypeError):
+            self.events_rejected += 1
+            return web.json_response({"detail": "invalid payload"}, status=400)
+
+        self.events_received += 1
+        self.dispatch(status)
+        return web.json_response({"ok": True})
+
+    def dispatch(self, status: PredictionStatus) -> None:
+        """Deliver a verified status to its subscriber, or buffer it briefly"""
+        if status.status not in TERMINAL_STATUSES:
+            return
+
+        with self._lock:
+            subscriber = self._subscribers.pop(status.id, None)
+            if subscriber is None:
+                self._recent[status.id] = (time.monotonic(), status)
+                while len(self._recent) > self.recent_limit:
+                    self._recent.popitem(last=False)
+                return
+
+        loop, callback = subscriber
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(callback, status)
+
+
+_default_receiver: Optional[WebhookReceiver] = None
+_default_receiver_lock = threading.Lock()
+
+
+def get_webhook_receiver() -> WebhookReceiver:
+    """Return the process-wide webhook receiver"""
+    global _default_receiver
+    with _default_receiver_lock:
+        if _default_receiver is None:
+            _default_receiver = WebhookReceiver()
+        return _default_receiver
+
+
+def install_webhook_route() -> bool:
+    """Mount the receiver on ComfyUI's server when webhooks are configured
+
+    ComfyUI only applies custom routes registered while plugins load, so
+    this is called at import time.
+    """
+    receiver = get_webhook_receiver()
+    if not receiver.enabled or receiver.config.mode not in ("auto", "comfyui"):
+        return False
+    return receiver.mount_on_comfyui()
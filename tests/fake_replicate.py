@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+本地 Replicate 替身服务
+在本机端口上模拟 Replicate 预测接口，用于离线测试客户端行为
+"""
+
+import asyncio
+import atexit
+import base64
+import hashlib
+import hmac
+import io
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+FAKE_VERSION_ID = "fake-version-0001"
+
+# 测试产生的预测耗时记录写入临时目录，不进入插件目录下的历史文件
+_HISTORY_DIR = tempfile.mkdtemp(prefix="replicate-test-history-")
+atexit.register(shutil.rmtree, _HISTORY_DIR, True)
+os.environ.setdefault("REPLICATE_HISTORY_PATH", os.path.join(_HISTORY_DIR, "prediction_history.json"))
+
+
+def use_fresh_completion_history():
+    """换用一份空的、仅在内存中的耗时历史，避免测试之间互相影响"""
+    from core import polling
+    from core.polling import CompletionHistory
+
+    history = CompletionHistory()
+    polling._default_history = history
+    return history
+
+
+def _timestamp(moment: Optional[datetime] = None) -> str:
+    moment = moment or datetime.now(timezone.utc)
+    return moment.isoformat().replace("+00:00", "Z")
+
+
+def make_png_data_uri(width: int = 8, height: int = 8, color=(255, 0, 0)) -> str:
+    """生成一张纯色 PNG 的 data URI，作为模拟输出"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="PNG")
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f"data:image/png;base64,{encoded}"
+
+
+class FakeReplicate:
+    """模拟 Replicate API 的最小实现
+
+    预测耗时由输入中的 ``_duration`` 字段控制（秒），未提供时使用 ``default_duration``；
+    创建请求携带 ``Prefer: wait=N`` 时会阻塞到预测完成或 N 秒后返回；
+    提供 ``webhook`` 时在预测完成后以签名请求回调该地址；
+    ``stream=True`` 时返回 ``urls.stream`` 并以 SSE 推送日志、输出与结束事件，
+    ``stream_drop_after`` 指定推送 N 条日志后直接断开连接（不发送结束事件）；
+    ``create_faults`` 依次注入创建请求故障：``"before"`` 不创建直接返回 503，
+    ``"after"`` 创建预测后仍返回 503（模拟响应丢失），``"throttle"`` 返回 429，``"reject"`` 返回 422；
+    ``fail_predictions`` 指定前 N 个预测以 failed 状态结束，错误信息为 ``failure_error``；
+    ``cold_starts`` 依次为新建预测附加冷启动时长（秒），期间保持 starting 状态；
+    ``output_urls=True`` 时输出为本服务上的文件地址，下载延迟 ``download_delay`` 秒；
+    ``POST /v1/files`` 模拟 Files API 上传，内容保存在 ``uploads`` 中，
+    ``upload_faults`` 依次让上传请求返回对应状态码（如 503）。
+    """
+
+    def __init__(self, default_duration: float = 0.2, starting_delay: float = 0.0,
+                 output: Optional[Any] = None, stream: bool = False,
+                 create_faults: Optional[List[str]] = None, fail_predictions: int = 0,
+                 cold_starts: Optional[List[float]] = None, output_urls: bool = False,
+                 download_delay: float = 0.0, upload_faults: Optional[List[int]] = None,
+                 stream_drop_after: Optional[int] = None, failure_error: str = "模拟预测失败"):
+        self.default_duration = default_duration
+        self.uploads: Dict[str, Dict[str, Any]] = {}
+        self.upload_faults = list(upload_faults or [])
+        self.output_urls = output_urls
+        self.download_delay = download_delay
+        self.downloads = 0
+        self.authorized_downloads = 0
+        self.cold_starts = list(cold_starts or [])
+        self.fail_predictions = fail_predictions
+        self.failure_error = failure_error
+        self.create_faults = list(create_faults or [])
+        self.stream = stream
+        self.stream_drop_after = stream_drop_after
+        self.starting_delay = starting_delay
+        self.output = output
+        self.predictions: Dict[str, Dict[str, Any]] = {}
+        self.request_log: List[Tuple[str, str]] = []
+        self._ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+        self._tasks: List[asyncio.Task] = []
+        self.webhook_secret = "whsec_" + base64.b64encode(os.urandom(24)).decode()
+        self.webhook_deliveries: List[Tuple[str, int]] = []
+        self.base_url = ""
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+    async def start(self) -> str:
+        app = web.Application(middlewares=[self._log_middleware])
+        app.router.add_get("/v1/models/{owner}/{name}", self._get_model)
+        app.router.add_post("/v1/predictions", self._create_prediction)
+        app.router.add_get("/v1/predictions", self._list_predictions)
+        app.router.add_get("/v1/predictions/{id}", self._get_prediction)
+        app.router.add_post("/v1/predictions/{id}/cancel", self._cancel_prediction)
+        app.router.add_get("/v1/predictions/{id}/stream", self._stream_prediction)
+        app.router.add_get("/v1/webhooks/default/secret", self._get_webhook_secret)
+        app.router.add_get("/files/{name}", self._get_file)
+        app.router.add_post("/v1/files", self._upload_file)
+        app.router.add_get("/v1/files/{id}", self._get_uploaded_file)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+        return self.base_url
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    def count_requests(self, method: str, prefix: str = "/v1/predictions/") -> int:
+        """统计某类请求次数（默认统计预测状态查询）"""
+        return sum(1 for m, path in self.request_log if m == method and path.startswith(prefix))
+
+    # ------------------------------------------------------------------
+    # 预测状态模拟
+    # ------------------------------------------------------------------
+    def _snapshot(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        elapsed = time.monotonic() - record["started"]
+        if record["status"] != "canceled":
+            if elapsed >= record["duration"] and record["fail"]:
+                record["status"] = "failed"
+                record["error"] = self.failure_error
+                record["completed_at"] = record.get("completed_at") or _timestamp(
+                    record["created_dt"] + timedelta(seconds=record["duration"])
+                )
+            elif elapsed >= record["duration"]:
+                record["status"] = "succeeded"
+                record["output"] = record["output_value"]
+                record["completed_at"] = record.get("completed_at") or _timestamp(
+                    record["created_dt"] + timedelta(seconds=record["duration"])
+                )
+            elif elapsed >= self.starting_delay + record["cold_start"]:
+                record["status"] = "processing"
+            else:
+                record["status"] = "starting"
+
+        started_at = None
+        if record["status"] != "starting":
+            started_at = _timestamp(
+                record["created_dt"] + timedelta(
+                    seconds=min(self.starting_delay + record["cold_start"], record["duration"])
+                )
+            )
+
+        urls = {
+            "get": f"{self.base_url}/predictions/{record['id']}",
+            "cancel": f"{self.base_url}/predictions/{record['id']}/cancel",
+        }
+        if self.stream:
+            urls["stream"] = f"{self.base_url}/predictions/{record['id']}/stream"
+
+        return {
+            "id": record["id"],
+            "status": record["status"],
+            "version": record["version"],
+            "input": record["input"],
+            "output": record.get("output"),
+            "error": record.get("error"),
+            "logs": "",
+            "created_at": _timestamp(record["created_dt"]),
+            "started_at": started_at,
+            "completed_at": record.get("completed_at"),
+            "urls": urls,
+        }
+
+    def _remaining(self, record: Dict[str, Any]) -> float:
+        return max(0.0, record["duration"] - (time.monotonic() - record["started"]))
+
+    # ------------------------------------------------------------------
+    # 路由
+    # ------------------------------------------------------------------
+    @web.middleware
+    async def _log_middleware(self, request: web.Request, handler):
+        self.request_log.append((request.method, request.path))
+        return await handler(request)
+
+    async def _get_model(self, request: web.Request) -> web.Response:
+        owner = request.match_info["owner"]
+        name = request.match_info["name"]
+        return web.json_response({
+            "owner": owner,
+            "name": name,
+            "url": f"https://replicate.com/{owner}/{name}",
+            "latest_version": {"id": FAKE_VERSION_ID},
+        })
+
+    async def _create_prediction(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        fault = self.create_faults.pop(0) if self.create_faults else None
+        if fault == "before":
+            return web.json_response({"detail": "Service unavailable"}, status=503)
+        if fault == "reject":
+            return web.json_response({"detail": "Invalid input"}, status=422)
+        if fault == "throttle":
+            return web.json_response({"detail": "Throttled"}, status=429, headers={"Retry-After": "0.2"})
+        inputs = body.get("input", {})
+        prediction_id = f"pred-{next(self._ids)}"
+        # 原生批量模型按 max_images 返回多张图像
+        count = int(inputs.get("max_images", 1))
+        if self.output is not None:
+            output = self.output
+        elif self.output_urls:
+            root = self.base_url.rsplit("/v1", 1)[0]
+            output = [f"{root}/files/{prediction_id}-{index}.png" for index in range(count)]
+        else:
+            output = [make_png_data_uri()] * count
+        cold_start = self.cold_starts.pop(0) if self.cold_starts else 0.0
+        record = {
+            "id": prediction_id,
+            "status": "starting",
+            "version": body.get("version"),
+            "input": inputs,
+            "duration": float(inputs.get("_duration", self.default_duration)) + cold_start,
+            "cold_start": cold_start,
+            "started": time.monotonic(),
+            "created_dt": datetime.now(timezone.utc),
+            "output_value": output,
+            "webhook": body.get("webhook"),
+            "fail": self.fail_predictions > 0,
+        }
+        self.fail_predictions = max(0, self.fail_predictions - 1)
+        self.predictions[prediction_id] = record
+
+        if record["webhook"]:
+            self._tasks.append(asyncio.ensure_future(self._deliver_webhook(record)))
+
+        prefer = request.headers.get("Prefer", "")
+        if prefer.startswith("wait"):
+            _, _, value = prefer.partition("=")
+            wait_cap = float(value) if value else 60.0
+            await asyncio.sleep(min(wait_cap, self._remaining(record)))
+
+        if fault == "after":
+            return web.json_response({"detail": "Service unavailable"}, status=503)
+        return web.json_response(self._snapshot(record), status=201)
+
+    def sign_webhook(self, webhook_id: str, timestamp: str, body: bytes) -> str:
+        key = base64.b64decode(self.webhook_secret.split("_", 1)[1])
+        content = f"{webhook_id}.{timestamp}.".encode() + body
+        return "v1," + base64.b64encode(hmac.new(key, content, hashlib.sha256).digest()).decode()
+
+    async def _deliver_webhook(self, record: Dict[str, Any]):
+        await asyncio.sleep(self._remaining(record))
+        body = json.dumps(self._snapshot(record)).encode()
+        webhook_id = f"msg_{record['id']}"
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "webhook-id": webhook_id,
+            "webhook-timestamp": timestamp,
+            "webhook-signature": self.sign_webhook(webhook_id, timestamp, body),
+        }
+        async with aiohttp.ClientSession() as session:
+            async with session.post(record["webhook"], data=body, headers=headers) as response:
+                self.webhook_deliveries.append((record["id"], response.status))
+
+    async def _stream_prediction(self, request: web.Request) -> web.StreamResponse:
+        record = self.predictions.get(request.match_info["id"])
+        if record is None:
+            return web.json_response({"detail": "Not found"}, status=404)
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        step = 0
+        try:
+            while self._snapshot(record)["status"] not in ("succeeded", "failed", "canceled"):
+                step += 1
+                await response.write(f"event: logs\nid: {step}\ndata: step {step}\n\n".encode())
+                if self.stream_drop_after is not None and step >= self.stream_drop_after:
+                    request.transport.close()
+                    return response
+                await asyncio.sleep(min(0.1, max(0.01, self._remaining(record))))
+
+            for item in record.get("output") or []:
+                await response.write(f"event: output\ndata: {item}\n\n".encode())
+            await response.write(b"event: done\ndata: {}\n\n")
+        except ConnectionResetError:
+            # 客户端提前断开（例如等待超时）
+            return response
+        await response.write_eof()
+        return response
+
+    async def _get_file(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.download_delay)
+        self.downloads += 1
+        if "Authorization" in request.headers:
+            self.authorized_downloads += 1
+        header, _, encoded = make_png_data_uri().partition(",")
+        return web.Response(body=base64.b64decode(encoded), content_type="image/png")
+
+    async def _upload_file(self, request: web.Request) -> web.Response:
+        if self.upload_faults:
+            status = self.upload_faults.pop(0)
+            return web.json_response({"detail": "Upload failed"}, status=status)
+
+        form = await request.post()
+        content = form.get("content")
+        if content is None or not hasattr(content, "file"):
+            return web.json_response({"detail": "Missing content"}, status=400)
+
+        data = content.file.read()
+        file_id = f"file-{len(self.uploads) + 1}"
+        self.uploads[file_id] = {
+            "data": data,
+            "filename": content.filename,
+            "content_type": content.content_type,
+        }
+        return web.json_response({
+            "id": file_id,
+            "name": content.filename,
+            "content_type": content.content_type,
+            "size": len(data),
+            "checksums": {"sha256": hashlib.sha256(data).hexdigest()},
+            "created_at": _timestamp(),
+            "expires_at": _timestamp(datetime.now(timezone.utc) + timedelta(days=1)),
+            "urls": {"get": f"{self.base_url}/files/{file_id}"},
+        }, status=201)
+
+    async def _get_uploaded_file(self, request: web.Request) -> web.Response:
+        upload = self.uploads.get(request.match_info["id"])
+        if upload is None:
+            return web.json_response({"detail": "Not found"}, status=404)
+        return web.Response(body=upload["data"], content_type=upload["content_type"])
+
+    async def _get_webhook_secret(self, request: web.Request) -> web.Response:
+        return web.json_response({"key": self.webhook_secret})
+
+    async def _list_predictions(self, request: web.Request) -> web.Response:
+        records = sorted(self.predictions.values(), key=lambda r: r["created_dt"], reverse=True)
+        return web.json_response({
+            "results": [self._snapshot(record) for record in records[:100]],
+            "next": None,
+        })
+
+    async def _get_prediction(self, request: web.Request) -> web.Response:
+        record = self.predictions.get(request.match_info["id"])
+        if record is None:
+            return web.json_response({"detail": "Not found"}, status=404)
+        return web.json_response(self._snapshot(record))
+
+    async def _cancel_prediction(self, request: web.Request) -> web.Response:
+        record = self.predictions.get(request.match_info["id"])
+        if record is None:
+            return web.json_response({"detail": "Not found"}, status=404)
+        snapshot = self._snapshot(record)
+        if snapshot["status"] not in ("succeeded", "failed", "canceled"):
+            record["status"] = "canceled"
+            record["completed_at"] = _timestamp()
+        return web.json_response(self._snapshot(record))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+客户端池测试
+验证同一事件循环上按令牌复用客户端、不同令牌或事件循环各自独立、已关闭的会话被替换，
+以及 release_loop / shutdown 关闭会话与轮询器
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.client_pool import ClientPoolConfig, ReplicateClientPool, get_client_pool
+from core.polling import PollingPolicy
+from fake_replicate import FAKE_VERSION_ID, FakeReplicate
+
+
+def _pool(fake):
+    return ReplicateClientPool(ClientPoolConfig(), base_url=fake.base_url)
+
+
+async def _clients_reused_per_token_and_loop():
+    async with FakeReplicate() as fake:
+        pool = _pool(fake)
+        client = pool.get_client("token-a")
+        assert pool.get_client("token-a") is client, "同一循环同一令牌应复用客户端"
+        other = pool.get_client("token-b")
+        assert other is not client and other.session is not client.session
+
+        await client.create_prediction(FAKE_VERSION_ID, {"prompt": "pooled"})
+        assert pool.get_client("token-a") is client, "请求后仍复用同一会话"
+
+        async def from_other_loop():
+            elsewhere = pool.get_client("token-a")
+            await pool.release_loop()
+            return elsewhere
+
+        elsewhere = await asyncio.to_thread(asyncio.run, from_other_loop())
+        assert elsewhere is not client, "其他事件循环不能复用本循环的会话"
+        assert elsewhere.session.closed
+        assert pool.get_client("token-a") is client, "释放其他循环不影响本循环的客户端"
+
+        await pool.release_loop()
+    print("✅ 按 (事件循环, 令牌) 复用客户端")
+
+
+def test_clients_reused_per_token_and_loop():
+    asyncio.run(_clients_reused_per_token_and_loop())
+
+
+async def _closed_session_replaced():
+    async with FakeReplicate() as fake:
+        pool = _pool(fake)
+        client = pool.get_client("token-a")
+        await client.session.close()
+
+        replacement = pool.get_client("token-a")
+        assert replacement is not client and not replacement.session.closed, "已关闭的会话应被替换"
+        await replacement.create_prediction(FAKE_VERSION_ID, {"prompt": "replaced"})
+        await pool.release_loop()
+    print("✅ 已关闭的会话被新客户端替换")
+
+
+def test_closed_session_replaced():
+    asyncio.run(_closed_session_replaced())
+
+
+async def _release_loop_closes_sessions_and_poller():
+    async with FakeReplicate(default_duration=30) as fake:
+        pool = _pool(fake)
+        client = pool.get_client("token-a")
+        prediction = await client.create_prediction(FAKE_VERSION_ID, {"prompt": "slow"})
+        waiter = asyncio.ensure_future(client.wait_for_prediction(
+            prediction.id, timeout=60, poll_interval=PollingPolicy.fixed(30.0)
+        ))
+        await asyncio.sleep(0.05)
+
+        await pool.release_loop()
+        try:
+            await asyncio.wait_for(waiter, timeout=1)
+        except RuntimeError as exc:
+            assert "poller closed" in str(exc)
+        else:
+            raise AssertionError("释放后等待中的预测应失败")
+        assert client.session.closed and client.poller.outstanding == 0
+        assert pool.get_client("token-a") is not client
+        await pool.release_loop()
+    print("✅ release_loop 关闭会话与轮询器")
+
+
+def test_release_loop_closes_sessions_and_poller():
+    asyncio.run(_release_loop_closes_sessions_and_poller())
+
+
+async def _shutdown_from_another_thread():
+    async with FakeReplicate() as fake:
+        pool = _pool(fake)
+        clients = [pool.get_client("token-a"), pool.get_client("token-b")]
+        await asyncio.to_thread(pool.shutdown)
+        assert all(client.session.closed for client in clients), "shutdown 应关闭所有会话"
+        assert pool.get_client("token-a") not in clients
+        await pool.release_loop()
+    print("✅ 其他线程调用 shutdown 关闭全部会话")
+
+
+def test_shutdown_from_another_thread():
+    asyncio.run(_shutdown_from_another_thread())
+
+
+def test_default_pool_is_shared():
+    assert get_client_pool() is get_client_pool()
+    print("✅ 进程内共享同一个客户端池")
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("客户端池测试")
+    print("=" * 60)
+    test_clients_reused_per_token_and_loop()
+    test_closed_session_replaced()
+    test_release_loop_closes_sessions_and_poller()
+    test_shutdown_from_another_thread()
+    test_default_pool_is_shared()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+编解码工作池测试
+验证图像编解码在线程/进程池上并行执行、不阻塞事件循环，并记录队列深度与任务耗时
+"""
+
+import asyncio
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.codec import CodecConfig, CodecPool
+from core.utils import (
+    convert_image_batch_to_base64_list,
+    convert_image_to_base64,
+    image_batch_to_uint8,
+    parse_replicate_outputs,
+)
+
+
+def _png_bytes(seed):
+    pixels = np.random.default_rng(seed).integers(0, 256, (512, 512, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def _decode_does_not_block_loop():
+    pool = CodecPool(CodecConfig(mode="thread", workers=2))
+    payloads = {f"https://example.invalid/{index}.png": _png_bytes(index) for index in range(6)}
+    urls = list(payloads)
+
+    ticks = 0
+    stop = asyncio.Event()
+
+    async def heartbeat():
+        nonlocal ticks
+        while not stop.is_set():
+            ticks += 1
+            await asyncio.sleep(0.001)
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        results = await asyncio.gather(
+            *(pool.run(parse_replicate_outputs, [url], payloads, name="decode") for url in urls)
+        )
+    finally:
+        stop.set()
+        await beat
+        pool.shutdown()
+
+    assert all(len(images) == 1 and not texts for images, texts in results)
+    stats = pool.stats()
+    assert stats["tasks"]["decode"]["count"] == 6
+    assert stats["tasks"]["decode"]["errors"] == 0
+    assert 1 <= stats["max_queue_depth"] <= 4, "6 个任务、2 个工作线程时应有任务排队"
+    assert stats["queue_depth"] == 0 and stats["in_flight"] == 0
+    assert ticks > 1, "解码期间事件循环应保持响应"
+    print(f"✅ 解码期间心跳 {ticks} 次，统计: {stats['tasks']['decode']}")
+
+
+def test_decode_does_not_block_loop():
+    asyncio.run(_decode_does_not_block_loop())
+
+
+def test_encode_matches_in_both_modes():
+    images = [
+        np.random.default_rng(seed).random((64, 64, 3), dtype=np.float32) for seed in range(4)
+    ]
+    expected = [convert_image_to_base64(image) for image in images]
+
+    for mode in ("thread", "process"):
+        pool = CodecPool(CodecConfig(mode=mode, workers=2))
+        try:
+            start = time.perf_counter()
+            encoded = convert_image_batch_to_base64_list(images, pool=pool)
+            elapsed = time.perf_counter() - start
+        finally:
+            pool.shutdown()
+
+        assert encoded == expected, f"{mode} 模式编码结果或顺序不一致"
+        assert pool.stats()["tasks"]["encode"]["count"] == 4
+        print(f"✅ {mode} 模式编码 4 张图片 {elapsed:.2f}s")
+
+
+def test_batch_quantized_in_one_pass():
+    # Out-of-range values check the clamping
+    batch = np.random.default_rng(0).random((3, 32, 32, 3), dtype=np.float32) * 1.2 - 0.1
+    pixels = image_batch_to_uint8(batch, limit=2)
+
+    assert pixels.shape == (2, 32, 32, 3) and pixels.dtype == np.uint8
+    expected = (np.clip(batch[:2], 0, 1) * 255).astype(np.uint8)
+    assert np.array_equal(pixels, expected)
+    assert convert_image_batch_to_base64_list(batch, limit=2) == [
+        convert_image_to_base64(image) for image in batch[:2]
+    ], "整批转换应与逐张转换结果一致"
+    print("✅ 整批一次量化为 uint8，结果与逐张转换一致")
+
+
+def test_process_pool_reads_batch_from_shared_memory():
+    batch = np.random.default_rng(1).random((3, 64, 64, 3), dtype=np.float32)
+    expected = [convert_image_to_base64(image) for image in batch]
+
+    pool = CodecPool(CodecConfig(mode="process", workers=2, shared_memory_min_mb=0))
+    try:
+        encoded = convert_image_batch_to_base64_list(batch, pool=pool)
+    finally:
+        pool.shutdown()
+
+    assert encoded == expected, "共享内存编码结果或顺序不一致"
+    assert pool.stats()["tasks"]["encode"]["count"] == 3
+    print("✅ 进程池通过共享内存读取整批图像")
+
+
+def test_task_errors_are_counted():
+    pool = CodecPool(CodecConfig(mode="thread", workers=1))
+    try:
+        try:
+            pool.map(int, ["not a number"], name="parse")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("任务异常应传递给调用方")
+    finally:
+        pool.shutdown()
+
+    assert pool.stats()["tasks"]["parse"] == {
+        "count": 1, "errors": 1, "avg_run": 0.0, "max_run": 0.0, "avg_wait": 0.0, "max_wait": 0.0,
+    }
+    print("✅ 任务异常被记录并传递")
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("图像编解码工作池测试")
+    print("=" * 60)
+    test_decode_does_not_block_loop()
+    test_encode_matches_in_both_modes()
+    test_batch_quantized_in_one_pass()
+    test_process_pool_reads_batch_from_shared_memory()
+    test_task_errors_are_counted()
+
+
+if __name__ == "__main__":
+    main()
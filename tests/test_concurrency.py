@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+自适应并发限制测试
+验证成功时加性增长、429/5xx 或排队时间突增时减半、冷却期内只减一次、取消排队时唤醒后续等待者，
+以及并发批量遇到限流时收缩并发
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import core.concurrency as concurrency
+from core.concurrency import (
+    OUTCOME_CONGESTED,
+    OUTCOME_FAILED,
+    OUTCOME_SUCCESS,
+    AdaptiveConcurrencyLimiter,
+)
+from core.nodes import ReplicateNanoBanana
+from core.rate_limit import RateLimiter
+from core.replicate_client import ReplicateClient
+from fake_replicate import FakeReplicate
+
+
+async def _complete(limiter, outcome, queue_time=None):
+    await limiter.acquire()
+    limiter.release(outcome, queue_time)
+
+
+async def _success_grows_additively():
+    limiter = AdaptiveConcurrencyLimiter(initial=2, maximum=4)
+    await _complete(limiter, OUTCOME_SUCCESS)
+    assert limiter.limit == 2.5, "每次成功增加 increase / limit"
+    await _complete(limiter, OUTCOME_SUCCESS)
+    assert limiter.limit == 2.9
+
+    await _complete(limiter, OUTCOME_FAILED)
+    assert limiter.limit == 2.9 and limiter.decreases == 0, "与容量无关的失败不调整限制"
+
+    for _ in range(20):
+        await _complete(limiter, OUTCOME_SUCCESS)
+    assert limiter.limit == 4.0, "不超过上限"
+    print(f"✅ 成功时加性增长至上限: {limiter.stats()}")
+
+
+def test_success_grows_additively():
+    asyncio.run(_success_grows_additively())
+
+
+async def _congestion_halves_once_per_cooldown():
+    limiter = AdaptiveConcurrencyLimiter(initial=8, minimum=2, cooldown=60)
+    await _complete(limiter, OUTCOME_CONGESTED)
+    await _complete(limiter, OUTCOME_CONGESTED)
+    assert limiter.limit == 4.0 and limiter.decreases == 1, "冷却期内的连续拥塞只算一次"
+
+    limiter.cooldown = 0
+    for _ in range(3):
+        await _complete(limiter, OUTCOME_CONGESTED)
+    assert limiter.limit == 2.0 and limiter.decreases == 4, "不低于下限"
+    print(f"✅ 拥塞时减半且冷却期内只减一次: {limiter.stats()}")
+
+
+def test_congestion_halves_once_per_cooldown():
+    asyncio.run(_congestion_halves_once_per_cooldown())
+
+
+async def _queue_time_spike_counts_as_congestion():
+    limiter = AdaptiveConcurrencyLimiter(initial=8, maximum=8, cooldown=0)
+    for queue_time in (1.0, 1.2, 0.9):
+        await _complete(limiter, OUTCOME_SUCCESS, queue_time)
+    assert limiter.decreases == 0
+
+    await _complete(limiter, OUTCOME_SUCCESS, queue_time=10.0)
+    assert limiter.decreases == 1 and limiter.limit == 4.0, "排队时间远超基线时应减半"
+    print(f"✅ 排队时间突增视为拥塞: {limiter.stats()}")
+
+
+def test_queue_time_spike_counts_as_congestion():
+    asyncio.run(_queue_time_spike_counts_as_congestion())
+
+
+async def _cancelled_waiter_wakes_next():
+    limiter = AdaptiveConcurrencyLimiter(initial=1, maximum=1)
+    await limiter.acquire()
+
+    # 仍在排队时取消：移出队列
+    dropped = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    dropped.cancel()
+    await asyncio.gather(dropped, return_exceptions=True)
+    assert limiter.stats()["queued"] == 0
+
+    # 已被唤醒但尚未运行时取消：名额转交给下一个等待者
+    first = asyncio.ensure_future(limiter.acquire())
+    second = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    limiter.release(OUTCOME_FAILED)
+    first.cancel()
+    await asyncio.wait_for(second, timeout=1)
+    assert first.cancelled() and limiter.in_flight == 1
+    print("✅ 取消的等待者将唤醒转交给后续等待者")
+
+
+def test_cancelled_waiter_wakes_next():
+    asyncio.run(_cancelled_waiter_wakes_next())
+
+
+class _LimitedNanoBanana(ReplicateNanoBanana):
+    MODEL_NAME = "nano-banana-concurrency-test"
+    SYNC_WAIT_SECONDS = 5
+    CONCURRENCY_INITIAL = 4
+    CONCURRENCY_MAX = 4
+
+
+async def _fan_out_backs_off_on_throttle():
+    node = _LimitedNanoBanana()
+    concurrency._limiters.pop(node._model_key(), None)
+    async with FakeReplicate(default_duration=0.2, create_faults=["throttle"]) as fake:
+        async with ReplicateClient(
+            "test-token", base_url=fake.base_url, rate_limiter=RateLimiter()
+        ) as client:
+            images, _, records = await node._run_prediction_batch(
+                client, {"prompt": "fan out"}, 8, concurrent=True
+            )
+
+    limiter = node._concurrency_limiter()
+    stats = limiter.stats()
+    assert len(images) == 8 and len(fake.predictions) == 8
+    assert stats["decreases"] == 1, "一次 429 应让并发减半一次"
+    assert stats["peak_in_flight"] <= 4 and stats["in_flight"] == 0
+    assert stats["limit"] < 4, f"减半后按成功次数缓慢回升: {stats}"
+    print(f"✅ 限流后并发收缩: {stats}")
+
+
+def test_fan_out_backs_off_on_throttle():
+    asyncio.run(_fan_out_backs_off_on_throttle())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("自适应并发限制测试")
+    print("=" * 60)
+    test_success_grows_additively()
+    test_congestion_halves_once_per_cooldown()
+    test_queue_time_spike_counts_as_congestion()
+    test_cancelled_waiter_wakes_next()
+    test_fan_out_backs_off_on_throttle()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+输出下载测试
+验证输出文件在共享会话上异步并行下载、受并发上限约束，且不向文件地址发送 API 密钥
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.replicate_client import ReplicateClient
+from core.utils import output_urls, parse_replicate_outputs
+from fake_replicate import FakeReplicate
+
+
+def _file_urls(fake, count):
+    root = fake.base_url.rsplit("/v1", 1)[0]
+    return [f"{root}/files/out-{index}.png" for index in range(count)]
+
+
+async def _downloads_run_in_parallel():
+    async with FakeReplicate(download_delay=0.5) as fake:
+        urls = _file_urls(fake, 4)
+        async with ReplicateClient("test-token", base_url=fake.base_url, download_concurrency=8) as client:
+            start = time.monotonic()
+            downloads = await client.download_all(urls)
+            parallel = time.monotonic() - start
+
+        async with ReplicateClient("test-token", base_url=fake.base_url, download_concurrency=2) as client:
+            start = time.monotonic()
+            await client.download_all(urls)
+            bounded = time.monotonic() - start
+
+        assert all(downloads[url] for url in urls)
+        assert parallel < 0.9, f"4 个文件应并行下载，实际 {parallel:.2f}s"
+        assert bounded >= 1.0, f"并发上限 2 时应分两轮下载，实际 {bounded:.2f}s"
+        assert fake.authorized_downloads == 0, "文件下载不应携带 API 密钥"
+
+        images, texts = parse_replicate_outputs(urls, downloads)
+        assert len(images) == 4 and not texts
+        print(f"✅ 并行下载 {parallel:.2f}s，并发上限 2 时 {bounded:.2f}s")
+
+
+async def _failed_download_becomes_text():
+    async with FakeReplicate() as fake:
+        missing = fake.base_url.rsplit("/v1", 1)[0] + "/missing.png"
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            downloads = await client.download_all(output_urls([missing, "done"]))
+
+        assert downloads == {missing: None}
+        images, texts = parse_replicate_outputs([missing], downloads)
+        assert not images and texts == [missing]
+        print("✅ 下载失败的输出按文本返回")
+
+
+def test_downloads_run_in_parallel():
+    asyncio.run(_downloads_run_in_parallel())
+
+
+def test_failed_download_becomes_text():
+    asyncio.run(_failed_download_becomes_text())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("Replicate 输出下载测试")
+    print("=" * 60)
+    test_downloads_run_in_parallel()
+    test_failed_download_becomes_text()
+
+
+if __name__ == "__main__":
+    main()
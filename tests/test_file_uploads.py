@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Files API 上传测试
+验证参考图通过本地替身 Files API 上传一次、并发扇出的所有预测复用同一地址，上传失败时可重试
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.nodes import ReplicateNanoBanana
+from core.replicate_client import ReplicateClient
+from core.utils import encode_image
+from fake_replicate import FakeReplicate
+
+
+class _UploadingNanoBanana(ReplicateNanoBanana):
+    MODEL_NAME = "nano-banana-upload-test"
+    SYNC_WAIT_SECONDS = 5
+
+
+def _reference():
+    pixels = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    return encode_image(pixels)
+
+
+async def _fan_out_reuses_single_upload():
+    node = _UploadingNanoBanana()
+    encoded = _reference()
+    async with FakeReplicate(default_duration=0.1) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            urls = await node._upload_images(client, [encoded])
+            payload = node._build_payload("hi", urls, {})
+            images, _, _ = await node._run_prediction_batch(client, payload, 3, concurrent=True)
+
+            # 上传的地址可以取回原始字节
+            assert await client.download(urls[0]) == encoded.data
+
+        assert len(images) == 3
+        assert len(fake.uploads) == 1, "参考图只应上传一次"
+        upload = next(iter(fake.uploads.values()))
+        assert upload["content_type"] == "image/png" and upload["data"] == encoded.data
+        inputs = [record["input"] for record in fake.predictions.values()]
+        assert len(inputs) == 3
+        assert all(urls[0] in str(prediction_input) for prediction_input in inputs)
+        assert not any("data:image" in str(prediction_input) for prediction_input in inputs)
+        print(f"✅ 3 个预测复用同一上传地址 {urls[0]}")
+
+
+async def _upload_retried_after_server_error():
+    encoded = _reference()
+    async with FakeReplicate(upload_faults=[503]) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            uploaded = await client.upload_file(encoded.data, encoded.filename, encoded.content_type)
+
+        assert len(fake.uploads) == 1
+        assert uploaded.size == encoded.bytes
+        assert uploaded.expires_at is not None and uploaded.expires_at > time.time()
+        print(f"✅ 上传失败后重试成功: {uploaded.id}")
+
+
+def test_fan_out_reuses_single_upload():
+    asyncio.run(_fan_out_reuses_single_upload())
+
+
+def test_upload_retried_after_server_error():
+    asyncio.run(_upload_retried_after_server_error())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("Files API 上传测试")
+    print("=" * 60)
+    test_fan_out_reuses_single_upload()
+    test_upload_retried_after_server_error()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+对冲预测测试
+冷启动的预测超过启动耗时分位数后发起副本，验证先完成者胜出、落后者被取消以及预算上限
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.hedging import HedgeBudget, get_hedge_budget
+from core.nodes import ReplicateNanoBanana
+from core.replicate_client import ReplicateClient
+from fake_replicate import FakeReplicate, use_fresh_completion_history
+
+
+class _HedgedNode(ReplicateNanoBanana):
+    MODEL_NAME = "nano-banana-hedging-test"
+    SYNC_WAIT_SECONDS = 0
+    HEDGE_ENABLED = True
+    HEDGE_MIN_DELAY = 0.3
+
+
+async def _hedge_beats_cold_start():
+    # 启动耗时历史只来自本测试的预热预测
+    use_fresh_completion_history()
+    node = _HedgedNode()
+    budget = get_hedge_budget(node._model_key(), node.HEDGE_BUDGET)
+    async with FakeReplicate(default_duration=0.2, cold_starts=[0, 0, 0, 30]) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            version_id = await node._get_latest_version_id(client)
+            # 先积累启动耗时历史
+            for _ in range(3):
+                await node._create_and_wait(client, version_id, {"prompt": "warm"})
+
+            hedges_before = budget.hedges
+            start = time.monotonic()
+            prediction, result = await node._create_and_wait(client, version_id, {"prompt": "cold"})
+            elapsed = time.monotonic() - start
+
+        assert result.status == "succeeded"
+        assert elapsed < 5, f"副本应绕过冷启动，实际耗时 {elapsed:.2f}s"
+        assert budget.hedges == hedges_before + 1
+        statuses = {pid: fake._snapshot(record)["status"] for pid, record in fake.predictions.items()}
+        assert statuses[prediction.id] == "succeeded"
+        assert list(statuses.values()).count("canceled") == 1, statuses
+        print(f"✅ 对冲副本胜出并取消冷启动预测: {elapsed:.2f}s")
+
+
+def test_hedge_beats_cold_start():
+    asyncio.run(_hedge_beats_cold_start())
+
+
+def test_hedge_budget_caps_overhead():
+    budget = HedgeBudget(ratio=0.1, reserve=2)
+    spent = 0
+    for _ in range(100):
+        budget.record_primary()
+        if budget.try_spend():
+            spent += 1
+    # 初始预留 2 次，此后每 10 个预测最多 1 次
+    assert spent <= 2 + 10, spent
+    assert budget.stats()["denied"] > 0
+    print(f"✅ 对冲预算限制额外开销: 100 个预测对冲 {spent} 次")
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("Replicate 对冲预测测试")
+    print("=" * 60)
+    test_hedge_beats_cold_start()
+    test_hedge_budget_caps_overhead()
+
+
+if __name__ == "__main__":
+    main()
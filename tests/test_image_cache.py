@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+参考图缓存测试
+验证按内容哈希复用编码结果与已上传文件地址、按总字节数 LRU 淘汰，以及上传地址的有效期
+"""
+
+import asyncio
+import dataclasses
+import os
+import sys
+
+import numpy as np
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import core.image_cache as image_cache
+from core.image_cache import ImageCache
+from core.nodes import ReplicateNanoBanana
+from core.replicate_client import ReplicateClient
+from core.utils import EncodedImage, UploadEncoding
+from fake_replicate import FakeReplicate
+
+
+class _CachingNanoBanana(ReplicateNanoBanana):
+    MODEL_NAME = "nano-banana-cache-test"
+
+
+def _batch(seed=0, count=2):
+    return np.random.default_rng(seed).random((count, 48, 48, 3), dtype=np.float32)
+
+
+def _use_cache(cache):
+    image_cache._default_cache = cache
+    return cache
+
+
+def test_lru_evicts_by_total_bytes():
+    cache = ImageCache(max_bytes=250, url_ttl=60)
+    for name in ("a", "b", "c"):
+        cache.put(name, EncodedImage(b"x" * 100, "png", 0.0))
+        if name == "b":
+            assert cache.get("a") is not None  # a 变为最近使用
+
+    assert cache.get("b") is None, "最久未使用的 b 应被淘汰"
+    assert cache.get("a") is not None and cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["bytes"] == 200 and stats["evictions"] == 1
+    print(f"✅ 按字节数 LRU 淘汰: {stats}")
+
+
+def test_unchanged_images_skip_encoding():
+    cache = _use_cache(ImageCache(max_bytes=16 * 1024 * 1024))
+    node = _CachingNanoBanana()
+    batch = _batch()
+
+    first = node._encode_images([batch])
+    second = node._encode_images([batch.copy()])
+    assert [item.data for item in first] == [item.data for item in second]
+    assert not any(item.cached for item in first) and all(item.cached for item in second)
+
+    # 命中缓存时记录的是查找耗时，而非首次编码耗时
+    slow = dataclasses.replace(cache.get(first[0].key), seconds=123.0)
+    cache.put(first[0].key, slow)
+    rerun = node._encode_images([batch])
+    assert rerun[0].cached and rerun[0].seconds < 1.0, rerun[0].seconds
+
+    changed = batch.copy()
+    changed[1, 0, 0, 0] = 1.0 - changed[1, 0, 0, 0]
+    third = node._encode_images([changed])
+    assert third[0].cached and not third[1].cached, "只有修改过的图片需要重新编码"
+
+    # 编码策略不同时不复用
+    node.UPLOAD_ENCODING = UploadEncoding(format="jpeg")
+    assert not any(item.cached for item in node._encode_images([batch]))
+    assert cache.stats()["hits"] == 6
+    print(f"✅ 未变化的参考图跳过编码: {cache.stats()}")
+
+
+async def _uploads_reused_until_ttl():
+    cache = _use_cache(ImageCache(max_bytes=16 * 1024 * 1024, url_ttl=3600))
+    node = _CachingNanoBanana()
+    batch = _batch(1)
+    async with FakeReplicate() as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            # 同一批次中的重复图片也只上传一次
+            encoded = node._encode_images([np.concatenate([batch, batch[:1]])])
+            first = await node._upload_images(client, encoded)
+            assert len(fake.uploads) == 2 and first[0] == first[2]
+
+            second = await node._upload_images(client, node._encode_images([batch]))
+            assert second == first[:2] and len(fake.uploads) == 2, "重跑不应再次上传"
+
+            async with ReplicateClient("other-token", base_url=fake.base_url) as other:
+                await node._upload_images(other, node._encode_images([batch]))
+            assert len(fake.uploads) == 4, "其他账号不能复用上传地址"
+
+            cache.url_ttl = 0
+            cache.put_url(encoded[0].key, cache.token_scope("test-token"), first[0])
+            third = await node._upload_images(client, node._encode_images([batch[:1]]))
+            assert third[0] != first[0] and len(fake.uploads) == 5, "过期地址应重新上传"
+
+    assert cache.stats()["url_hits"] == 2
+    print(f"✅ 上传地址在有效期内复用: {cache.stats()}")
+
+
+def test_uploads_reused_until_ttl():
+    asyncio.run(_uploads_reused_until_ttl())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("参考图缓存测试")
+    print("=" * 60)
+    test_lru_evicts_by_total_bytes()
+    test_unchanged_images_skip_encoding()
+    test_uploads_reused_until_ttl()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+大批量生成测试
+验证超过单波上限的数量按波次生成、写入预分配输出，并在失败后从检查点继续
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from core.batch import BatchCheckpoint, ImageBatchBuffer
+from core.nodes import ReplicateNanoBanana
+from core.replicate_client import ReplicateAPIError, ReplicateClient
+from fake_replicate import FakeReplicate
+
+
+class _WaveNode(ReplicateNanoBanana):
+    MODEL_NAME = "nano-banana-large-batch-test"
+    SYNC_WAIT_SECONDS = 5
+    SLOT_RETRY_BUDGET = 0
+    BATCH_WAVE_SIZE = 4
+
+
+async def _run(node, payload, count, image_keys=None, **fake_kwargs):
+    """运行一次批量生成，返回结果（或 API 错误）与替身服务创建的预测数"""
+    async with FakeReplicate(default_duration=0.05, **fake_kwargs) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            try:
+                outcome = await node._run_prediction_batch(
+                    client, payload, count, concurrent=True, image_keys=image_keys
+                )
+            except ReplicateAPIError as exc:
+                outcome = exc
+    return outcome, len(fake.predictions)
+
+
+async def _waves_fill_preallocated_batch():
+    node = _WaveNode()
+    (images, _, records), created = await _run(node, {"prompt": "waves"}, 10)
+
+    assert isinstance(images, np.ndarray) and images.shape == (10, 8, 8, 3), getattr(images, "shape", None)
+    assert created == 10
+    assert sorted({record["wave"] for record in records}) == [1, 2, 3]
+    assert all("inputs" not in record for record in records)
+    print(f"✅ 10 张图像分 3 波写入预分配输出: {images.shape}")
+
+
+async def _resume_from_checkpoint():
+    node = _WaveNode()
+    payload = {"prompt": "resume"}
+    checkpoint = BatchCheckpoint.for_run(node._model_key(), payload, 10)
+
+    outcome, _ = await _run(node, payload, 10, create_faults=[None] * 4 + ["reject"])
+    assert isinstance(outcome, ReplicateAPIError), "第二波应因致命错误失败"
+    assert checkpoint.completed() == 4, checkpoint.completed()
+
+    (images, _, _), created = await _run(node, payload, 10)
+    assert images.shape[0] == 10
+    assert created == 6, "应只生成检查点之后的图像"
+    assert not os.path.exists(checkpoint.directory), "完成后应清理检查点"
+    print("✅ 失败后重新运行从检查点继续")
+
+
+async def _resume_after_reupload():
+    node = _WaveNode()
+    # 重启后同一参考图会以新的文件地址上传
+    first = {"prompt": "resume", "image": ["https://api.example/files/file-1"]}
+    second = {"prompt": "resume", "image": ["https://api.example/files/file-2"]}
+
+    outcome, _ = await _run(
+        node, first, 10, image_keys={first["image"][0]: "content-a"},
+        create_faults=[None] * 4 + ["reject"],
+    )
+    assert isinstance(outcome, ReplicateAPIError)
+
+    (images, _, _), created = await _run(
+        node, second, 10, image_keys={second["image"][0]: "content-a"}
+    )
+    assert images.shape[0] == 10
+    assert created == 6, "同一内容的参考图应命中检查点"
+    assert not os.listdir(os.environ["REPLICATE_CHECKPOINT_DIR"]), "完成后应清理检查点"
+    print("✅ 参考图重新上传后仍从检查点继续")
+
+
+def test_resume_after_reupload():
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["REPLICATE_CHECKPOINT_DIR"] = directory
+        try:
+            asyncio.run(_resume_after_reupload())
+        finally:
+            os.environ.pop("REPLICATE_CHECKPOINT_DIR", None)
+
+
+def test_stale_checkpoints_pruned():
+    with tempfile.TemporaryDirectory() as directory:
+        stale = BatchCheckpoint(os.path.join(directory, "stale"))
+        fresh = BatchCheckpoint(os.path.join(directory, "fresh"))
+        for checkpoint in (stale, fresh):
+            checkpoint.save(np.zeros((1, 4, 4, 3), dtype=np.float32), 0)
+        old = time.time() - 30 * 86400
+        os.utime(stale.directory, (old, old))
+
+        assert BatchCheckpoint.prune(directory, 7 * 86400) == 1
+        assert sorted(os.listdir(directory)) == ["fresh"]
+    print("✅ 过期检查点被清理")
+
+
+def test_waves_fill_preallocated_batch():
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["REPLICATE_CHECKPOINT_DIR"] = directory
+        try:
+            asyncio.run(_waves_fill_preallocated_batch())
+        finally:
+            os.environ.pop("REPLICATE_CHECKPOINT_DIR", None)
+
+
+def test_resume_from_checkpoint():
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["REPLICATE_CHECKPOINT_DIR"] = directory
+        try:
+            asyncio.run(_resume_from_checkpoint())
+        finally:
+            os.environ.pop("REPLICATE_CHECKPOINT_DIR", None)
+
+
+def test_checkpoint_loads_one_image_at_a_time():
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint = BatchCheckpoint(os.path.join(directory, "lazy"))
+        saved = np.random.default_rng(0).random((3, 4, 4, 3), dtype=np.float32)
+        checkpoint.save(saved, 0)
+
+        loaded = checkpoint.load(limit=2)
+        assert not isinstance(loaded, list), "恢复时不应先解码出全部图像"
+        buffer = ImageBatchBuffer(2)
+        for image in loaded:
+            buffer.put(image)
+        assert buffer.count == 2
+        assert np.allclose(buffer.result(), saved[:2], atol=1 / 255)
+    print("✅ 检查点逐张解码写入预分配输出")
+
+
+def test_buffer_resizes_mismatched_images():
+    buffer = ImageBatchBuffer(2)
+    buffer.put(np.zeros((8, 8, 3), dtype=np.float32))
+    buffer.put(np.ones((16, 12, 3), dtype=np.float32))
+    assert buffer.result().shape == (2, 8, 8, 3)
+    assert np.allclose(buffer.result()[1], 1.0)
+    print("✅ 尺寸不一致的图像缩放到批次尺寸")
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("Replicate 大批量生成测试")
+    print("=" * 60)
+    test_waves_fill_preallocated_batch()
+    test_resume_from_checkpoint()
+    test_resume_after_reupload()
+    test_stale_checkpoints_pruned()
+    test_checkpoint_loads_one_image_at_a_time()
+    test_buffer_resizes_mismatched_images()
+
+
+if __name__ == "__main__":
+    main()
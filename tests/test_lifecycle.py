@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+预测生命周期测试
+验证超时、中断与同批次致命失败时取消远端预测，并统计回收的算力
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.lifecycle import PredictionLifecycle, get_lifecycle_registry
+from core.nodes import ReplicateNanoBanana
+from core.replicate_client import ReplicateAPIError, ReplicateClient
+from core.runtime import BackgroundLoopRunner
+from fake_replicate import FakeReplicate
+
+
+class _LifecycleNode(ReplicateNanoBanana):
+    MODEL_NAME = "nano-banana-lifecycle-test"
+    SYNC_WAIT_SECONDS = 0
+    SLOT_RETRY_BUDGET = 0
+
+
+def _statuses(fake):
+    return sorted(fake._snapshot(record)["status"] for record in fake.predictions.values())
+
+
+async def _timeout_cancels_prediction():
+    node = _LifecycleNode()
+    node.REQUEST_TIMEOUT = 0.5
+    async with FakeReplicate(default_duration=30) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            try:
+                await node._run_prediction_batch(client, {"prompt": "slow"}, 1)
+                raise AssertionError("应当超时")
+            except TimeoutError:
+                pass
+        assert _statuses(fake) == ["canceled"], _statuses(fake)
+        print("✅ 等待超时后取消远端预测")
+
+
+async def _sibling_fatal_failure_cancels_batch():
+    node = _LifecycleNode()
+    async with FakeReplicate(default_duration=30, create_faults=[None, "reject"]) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            try:
+                await node._run_prediction_batch(client, {"prompt": "hi"}, 3, concurrent=True)
+                raise AssertionError("应当因致命错误失败")
+            except ReplicateAPIError as exc:
+                assert exc.status == 422
+        statuses = _statuses(fake)
+        assert statuses and all(status == "canceled" for status in statuses), statuses
+        print(f"✅ 同批次致命失败后取消其余 {len(statuses)} 个预测")
+
+
+def test_timeout_cancels_prediction():
+    asyncio.run(_timeout_cancels_prediction())
+
+
+def test_sibling_fatal_failure_cancels_batch():
+    asyncio.run(_sibling_fatal_failure_cancels_batch())
+
+
+def test_interrupt_cancels_predictions():
+    runner = BackgroundLoopRunner(name="lifecycle-test-loop")
+    fake = FakeReplicate(default_duration=30)
+    runner.run(fake.start())
+    canceled_before = get_lifecycle_registry().canceled
+    interrupt = threading.Event()
+    threading.Timer(0.5, interrupt.set).start()
+
+    async def execution():
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            async with PredictionLifecycle(client, "interrupt-test") as lifecycle:
+                await _LifecycleNode()._run_prediction_batch(
+                    client, {"prompt": "hi"}, 2, concurrent=True, lifecycle=lifecycle
+                )
+
+    try:
+        try:
+            runner.run(execution(), cancel_check=interrupt.is_set)
+            raise AssertionError("应当被中断")
+        except InterruptedError:
+            pass
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and _statuses(fake) != ["canceled", "canceled"]:
+            time.sleep(0.05)
+        assert _statuses(fake) == ["canceled", "canceled"], _statuses(fake)
+        assert get_lifecycle_registry().canceled - canceled_before == 2
+        print("✅ 中断后取消全部在途预测")
+    finally:
+        runner.run(fake.stop())
+        runner.stop()
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("Replicate 预测生命周期测试")
+    print("=" * 60)
+    test_timeout_cancels_prediction()
+    test_sibling_fatal_failure_cancels_batch()
+    test_interrupt_cancels_predictions()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+原生批量混合扇出测试
+验证 Seedream 等原生批量模型把大批量拆分为多个并行请求，并遵守单请求上限与参考图容量规则
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.nodes import ReplicateSeedream4
+from core.replicate_client import ReplicateClient
+from fake_replicate import FakeReplicate
+
+
+class _Seedream(ReplicateSeedream4):
+    MODEL_NAME = "seedream-native-batch-test"
+
+
+def test_plan_respects_reference_capacity():
+    node = _Seedream()
+    assert node._plan_native_batches({"image_input": []}, 5) == [3, 2]
+    assert node._plan_native_batches({"image_input": []}, 4) == [4]
+    # 12 张参考图时单请求最多 3 张
+    assert node._plan_native_batches({"image_input": ["ref"] * 12}, 7) == [3, 2, 2]
+    print("✅ 拆分计划遵守单请求上限与参考图容量")
+
+
+async def _native_batches_run_in_parallel():
+    node = _Seedream()
+    payload = {"prompt": "hi", "image_input": [], "sequential_image_generation": "disabled"}
+    duration = 2.0
+    async with FakeReplicate(default_duration=duration) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            start = time.monotonic()
+            images, _, records = await node._run_prediction_batch(client, payload, 5)
+            elapsed = time.monotonic() - start
+
+        requested = sorted(record["input"]["max_images"] for record in fake.predictions.values())
+        assert len(images) == 5
+        assert requested == [2, 3], requested
+        # 串行补足至少需要两个预测时长
+        assert elapsed < 2 * duration, f"并行请求应在一个往返内完成，实际 {elapsed:.2f}s"
+        print(f"✅ 5 张图像拆分为 {len(records)} 个并行请求: {elapsed:.2f}s")
+
+
+def test_native_batches_run_in_parallel():
+    asyncio.run(_native_batches_run_in_parallel())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("Replicate 原生批量混合扇出测试")
+    print("=" * 60)
+    test_plan_respects_reference_capacity()
+    test_native_batches_run_in_parallel()
+
+
+if __name__ == "__main__":
+    main()
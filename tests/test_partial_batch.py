@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+并发批量部分成功测试
+本地 Replicate 替身服务让部分预测失败，验证保留成功结果、在重试预算内重提失败槽位
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.nodes import ReplicateNanoBanana
+from core.replicate_client import ReplicateClient
+from fake_replicate import FAKE_VERSION_ID, FakeReplicate
+
+
+class _FastNanoBanana(ReplicateNanoBanana):
+    MODEL_NAME = "nano-banana-partial-test"
+    SYNC_WAIT_SECONDS = 5
+
+
+async def _run_batch(node, fail_predictions: int, desired_count: int, **fake_kwargs):
+    async with FakeReplicate(default_duration=0.1, fail_predictions=fail_predictions, **fake_kwargs) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            images, texts, records = await node._run_prediction_batch(
+                client, {"prompt": "hi"}, desired_count, concurrent=True
+            )
+        return images, texts, records, len(fake.predictions)
+
+
+async def _failed_slots_resubmitted_within_budget():
+    node = _FastNanoBanana()
+    node.SLOT_RETRY_BUDGET = 2
+    images, _, records, created = await _run_batch(node, fail_predictions=2, desired_count=3)
+
+    assert len(images) == 3
+    assert created == 5, "只应重提失败的两个槽位"
+    failed = [record for record in records if record["status"] == "failed"]
+    assert len(failed) == 2 and all(record["attempt"] == 1 for record in failed)
+    assert sorted({record["slot"] for record in records}) == [1, 2, 3]
+    print(f"✅ 失败槽位在预算内重提: 共创建 {created} 个预测")
+
+
+async def _partial_success_kept_when_budget_exhausted():
+    node = _FastNanoBanana()
+    node.SLOT_RETRY_BUDGET = 0
+    images, texts, records, created = await _run_batch(node, fail_predictions=2, desired_count=3)
+
+    assert len(images) == 1, "应保留成功槽位的结果"
+    assert created == 3
+    assert [record["status"] for record in records].count("succeeded") == 1
+    assert any("部分预测失败" in text for text in texts)
+    print("✅ 预算耗尽时保留部分成功结果")
+
+
+async def _sensitive_content_not_resubmitted():
+    node = _FastNanoBanana()
+    node.SLOT_RETRY_BUDGET = 2
+    images, texts, records, created = await _run_batch(
+        node, fail_predictions=1, desired_count=2,
+        failure_error="The input or output was flagged as sensitive. Please try again with different inputs. (E005)",
+    )
+
+    assert created == 2, "内容审核拒绝不应重提"
+    assert len(images) == 1
+    failed = [record for record in records if record["status"] == "failed"]
+    assert len(failed) == 1 and "E005" in failed[0]["error"]
+    print("✅ 内容审核拒绝（E005）不消耗重试预算")
+
+
+async def _lost_create_does_not_take_sibling_result():
+    node = _FastNanoBanana()
+    # 第三个创建请求在提交前失败，另外两个仍保持连接等待结果
+    async with FakeReplicate(default_duration=0.5, create_faults=["ok", "ok", "before"]) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            images, _, records = await node._run_prediction_batch(
+                client, {"prompt": "siblings"}, 3, concurrent=True
+            )
+
+    ids = [record["prediction_id"] for record in records]
+    assert len(images) == 3 and len(set(ids)) == 3, f"每个槽位应有自己的预测: {ids}"
+    assert set(ids) == set(fake.predictions)
+    print(f"✅ 创建失败的槽位不会认领兄弟槽位的预测: {ids}")
+
+
+async def _ambiguous_create_fails_only_its_slot():
+    node = _FastNanoBanana()
+    node.SLOT_RETRY_BUDGET = 2
+    payload = {"prompt": "ambiguous"}
+    # 另一次执行先以相同输入创建了预测；本批次第三个创建请求的响应丢失
+    async with FakeReplicate(default_duration=0.1, create_faults=["ok", "ok", "ok", "after"]) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as other:
+            await other.create_prediction(FAKE_VERSION_ID, payload)
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            images, texts, records = await node._run_prediction_batch(client, payload, 3, concurrent=True)
+
+    assert len(images) == 2, "其余槽位的结果应保留"
+    assert any("部分预测失败" in text for text in texts)
+    failed = [record for record in records if record["status"] == "error"]
+    assert len(failed) == 1 and "matching predictions" in failed[0]["error"], "无法确定的创建不应重提"
+    assert len(fake.predictions) == 4
+    assert all(record["status"] == "succeeded" for record in fake.predictions.values()), "兄弟预测不应被取消"
+    print("✅ 无法确定的创建只让本槽位失败")
+
+
+def test_sensitive_content_not_resubmitted():
+    asyncio.run(_sensitive_content_not_resubmitted())
+
+
+def test_lost_create_does_not_take_sibling_result():
+    asyncio.run(_lost_create_does_not_take_sibling_result())
+
+
+def test_ambiguous_create_fails_only_its_slot():
+    asyncio.run(_ambiguous_create_fails_only_its_slot())
+
+
+def test_failed_slots_resubmitted_within_budget():
+    asyncio.run(_failed_slots_resubmitted_within_budget())
+
+
+def test_partial_success_kept_when_budget_exhausted():
+    asyncio.run(_partial_success_kept_when_budget_exhausted())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("Replicate 并发批量部分成功测试")
+    print("=" * 60)
+    test_failed_slots_resubmitted_within_budget()
+    test_partial_success_kept_when_budget_exhausted()
+    test_sensitive_content_not_resubmitted()
+    test_lost_create_does_not_take_sibling_result()
+    test_ambiguous_create_fails_only_its_slot()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+流水线顺序模式测试
+验证顺序生成时上一张图像的下载解码与下一次预测重叠，且远端始终只有一个预测在运行
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.nodes import ReplicateNanoBanana
+from core.replicate_client import ReplicateClient
+from core.runtime import BackgroundLoopRunner
+from fake_replicate import FakeReplicate
+
+
+class _SequentialNode(ReplicateNanoBanana):
+    MODEL_NAME = "nano-banana-pipeline-test"
+    SYNC_WAIT_SECONDS = 5
+
+
+async def _timed_run(fake, pipelined: bool):
+    node = _SequentialNode()
+    node.PIPELINE_SEQUENTIAL = pipelined
+    fake.predictions.clear()
+    async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+        start = time.monotonic()
+        images, _, records = await node._run_prediction_batch(client, {"prompt": "hi"}, 3)
+        elapsed = time.monotonic() - start
+
+    # 任一时刻远端最多一个预测：后一个必须在前一个完成后创建
+    ordered = sorted(fake.predictions.values(), key=lambda record: record["started"])
+    for previous, current in zip(ordered, ordered[1:]):
+        assert current["started"] >= previous["started"] + previous["duration"] - 0.05
+    assert len(images) == 3 and len(records) == 3
+    return elapsed
+
+
+def test_pipelining_hides_decode_time():
+    # 替身服务运行在独立线程的事件循环上，计时不受被测客户端的本地处理影响
+    runner = BackgroundLoopRunner(name="pipeline-fake-loop")
+    fake = FakeReplicate(default_duration=0.5, output_urls=True, download_delay=0.5)
+    runner.run(fake.start())
+    try:
+        serial = asyncio.run(_timed_run(fake, pipelined=False))
+        pipelined = asyncio.run(_timed_run(fake, pipelined=True))
+    finally:
+        runner.run(fake.stop())
+        runner.stop()
+
+    print(f"   顺序 {serial:.2f}s，流水线 {pipelined:.2f}s")
+    assert serial - pipelined >= 0.6, "流水线应隐藏大部分下载解码时间"
+    print("✅ 流水线顺序模式重叠解码与下一次预测")
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("Replicate 流水线顺序模式测试")
+    print("=" * 60)
+    test_pipelining_hides_decode_time()
+
+
+if __name__ == "__main__":
+    main()
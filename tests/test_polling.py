@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+共享轮询器测试
+验证多个预测同时到期时用一次列表请求代替逐个查询，以及单个卡住的查询不会拖住其他预测
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.polling import PollingPolicy, PredictionPoller
+from core.replicate_client import PredictionStatus, ReplicateClient
+from fake_replicate import FAKE_VERSION_ID, FakeReplicate
+
+
+async def _bulk_listing_replaces_individual_polls():
+    async with FakeReplicate() as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            predictions = [
+                await client.create_prediction(FAKE_VERSION_ID, {"prompt": f"bulk {index}", "_duration": 0.8})
+                for index in range(6)
+            ]
+            results = await asyncio.gather(*(
+                client.wait_for_prediction(
+                    prediction.id, timeout=10, poll_interval=PollingPolicy.fixed(0.2)
+                )
+                for prediction in predictions
+            ))
+
+    assert all(result.status == "succeeded" for result in results)
+    listings = sum(1 for method, path in fake.request_log if method == "GET" and path == "/v1/predictions")
+    individual = fake.count_requests("GET")
+    assert listings >= 2, "多个预测同时到期时应使用列表请求"
+    assert individual <= 8, f"只有完成的预测需要单独查询，实际 {individual} 次"
+    print(f"✅ 6 个预测共 {listings} 次列表请求、{individual} 次单独查询")
+
+
+def test_bulk_listing_replaces_individual_polls():
+    asyncio.run(_bulk_listing_replaces_individual_polls())
+
+
+class _StubClient:
+    """stuck 预测的查询永不返回，其余预测立即完成，并记录每次查询的发送时间"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def get_prediction(self, prediction_id):
+        self.sent.append((prediction_id, asyncio.get_running_loop().time()))
+        if prediction_id == "stuck":
+            await asyncio.sleep(3600)
+        return PredictionStatus(id=prediction_id, status="succeeded", input={})
+
+    async def list_predictions(self, cursor=None):
+        return [], None
+
+
+async def _stuck_poll_does_not_stall_others():
+    client = _StubClient()
+    poller = PredictionPoller(client, max_requests_per_second=20, bulk_threshold=100)
+    policy = PollingPolicy.fixed(0.05)
+    stuck = asyncio.ensure_future(poller.wait("stuck", timeout=1.0, policy=policy))
+    await asyncio.sleep(0)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    results = await asyncio.wait_for(asyncio.gather(*(
+        poller.wait(f"p{index}", timeout=5, policy=policy) for index in range(4)
+    )), timeout=2)
+    elapsed = loop.time() - start
+    assert [result.id for result in results] == [f"p{index}" for index in range(4)]
+    assert elapsed < 0.5, f"其他预测被卡住的查询拖慢 {elapsed:.2f}s"
+
+    # 并发发出的查询仍按共享预算间隔发送
+    times = [moment for _, moment in client.sent]
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert min(gaps) >= 0.05 - 0.005, f"查询间隔低于预算: {gaps}"
+
+    try:
+        await stuck
+    except TimeoutError:
+        pass
+    else:
+        raise AssertionError("卡住的预测应在自身超时后失败")
+    await poller.close()
+    print(f"✅ 卡住的查询不影响其他预测（{elapsed:.2f}s），发送间隔 ≥ {min(gaps):.3f}s")
+
+
+def test_stuck_poll_does_not_stall_others():
+    asyncio.run(_stuck_poll_does_not_stall_others())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("共享轮询器测试")
+    print("=" * 60)
+    test_bulk_listing_replaces_individual_polls()
+    test_stuck_poll_does_not_stall_others()
+
+
+if __name__ == "__main__":
+    main()
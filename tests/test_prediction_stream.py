@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+预测事件流测试
+验证 SSE 事件按日志、输出、结束的顺序到达，有事件流时不再轮询状态，以及事件流中途断开时回退到轮询
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.replicate_client import ReplicateClient
+from fake_replicate import FAKE_VERSION_ID, FakeReplicate
+
+
+def _status_polls(fake):
+    """预测状态查询次数（不含事件流请求）"""
+    return sum(
+        1 for method, path in fake.request_log
+        if method == "GET" and path.startswith("/v1/predictions/") and not path.endswith("/stream")
+    )
+
+
+async def _events_arrive_in_order():
+    output = ["https://example.invalid/a.png", "https://example.invalid/b.png"]
+    async with FakeReplicate(default_duration=0.4, stream=True, output=output) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            prediction = await client.create_prediction(FAKE_VERSION_ID, {"prompt": "stream"})
+            events = [event async for event in client.stream_prediction(prediction)]
+
+    kinds = [event.event for event in events]
+    first_output = kinds.index("output")
+    assert kinds[-1] == "done" and kinds.count("done") == 1
+    assert first_output > 0 and set(kinds[:first_output]) == {"logs"}, f"日志应先于输出: {kinds}"
+    assert [event.data for event in events if event.event == "output"] == output
+    assert [event.id for event in events if event.event == "logs"] == [
+        str(step) for step in range(1, first_output + 1)
+    ]
+    assert _status_polls(fake) == 0
+    print(f"✅ 事件顺序: {first_output} 条日志 → {len(output)} 个输出 → done")
+
+
+def test_events_arrive_in_order():
+    asyncio.run(_events_arrive_in_order())
+
+
+async def _stream_replaces_polling():
+    async with FakeReplicate(default_duration=0.6, stream=True) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            prediction = await client.create_prediction(FAKE_VERSION_ID, {"prompt": "no polls"})
+            result = await client.wait_for_prediction(
+                prediction.id, timeout=10, poll_interval=0.1,
+                stream_url=prediction.urls["stream"],
+            )
+
+    assert result.status == "succeeded"
+    assert _status_polls(fake) == 1 and result.poll_count == 1, "结束后只需查询一次最终状态"
+    assert fake.count_requests("GET", "/v1/predictions") == 2
+    print("✅ 有事件流时不轮询状态，仅在 done 后查询一次")
+
+
+def test_stream_replaces_polling():
+    asyncio.run(_stream_replaces_polling())
+
+
+async def _dropped_stream_falls_back_to_polling():
+    async with FakeReplicate(default_duration=0.8, stream=True, stream_drop_after=2) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            prediction = await client.create_prediction(FAKE_VERSION_ID, {"prompt": "drop"})
+            result = await client.wait_for_prediction(
+                prediction.id, timeout=10, poll_interval=0.1,
+                stream_url=prediction.urls["stream"],
+            )
+
+    assert result.status == "succeeded" and result.output
+    assert _status_polls(fake) >= 2, "事件流断开后应改为轮询直到完成"
+    print(f"✅ 事件流在 done 前断开，回退轮询 {_status_polls(fake)} 次后完成")
+
+
+def test_dropped_stream_falls_back_to_polling():
+    asyncio.run(_dropped_stream_falls_back_to_polling())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("预测事件流测试")
+    print("=" * 60)
+    test_events_arrive_in_order()
+    test_stream_replaces_polling()
+    test_dropped_stream_falls_back_to_polling()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+客户端限流测试
+验证令牌桶按预约顺序（FIFO）放行并保持间隔、429 后整体暂停，以及排队耗时的统计
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.rate_limit import RateLimitConfig, RateLimiter, TokenBucket
+from core.replicate_client import ReplicateClient
+from fake_replicate import FAKE_VERSION_ID, FakeReplicate
+
+# 事件循环调度误差
+TOLERANCE = 0.02
+
+
+async def _acquire_all(bucket, count):
+    """同时发起 count 次申请，返回 (放行顺序, 各自放行时刻, 各自排队耗时)"""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    order, released = [], [0.0] * count
+
+    async def one(index):
+        waited = await bucket.acquire()
+        order.append(index)
+        released[index] = loop.time() - start
+        return waited
+
+    waits = await asyncio.gather(*(one(index) for index in range(count)))
+    return order, released, waits
+
+
+async def _reservations_are_fifo_and_spaced():
+    bucket = TokenBucket(rate=20, burst=2)
+    order, released, waits = await _acquire_all(bucket, 6)
+
+    assert order == list(range(6)), f"应按申请顺序放行: {order}"
+    assert waits[:2] == [0.0, 0.0], "突发额度内不排队"
+    for index in range(2, 6):
+        expected = (index - 1) * 0.05
+        assert abs(waits[index] - expected) < 5e-3, f"第 {index} 个预约应等待 {expected}s"
+        assert released[index] >= expected - TOLERANCE
+    gaps = [later - earlier for earlier, later in zip(released[1:], released[2:])]
+    assert min(gaps) >= 0.05 - TOLERANCE, f"放行间隔低于速率: {gaps}"
+
+    stats = bucket.stats()
+    assert stats["acquired"] == 6 and stats["waited"] == 4
+    assert abs(stats["max_wait"] - 0.2) < 5e-3 and abs(stats["total_wait"] - 0.5) < 0.02
+    print(f"✅ 6 次申请按 FIFO 放行，间隔 ≥ {min(gaps):.3f}s，统计: {stats}")
+
+
+def test_reservations_are_fifo_and_spaced():
+    asyncio.run(_reservations_are_fifo_and_spaced())
+
+
+async def _pause_holds_callers_then_keeps_rate():
+    bucket = TokenBucket(rate=20, burst=1)
+    bucket.pause(0.3)
+    order, released, waits = await _acquire_all(bucket, 3)
+
+    assert order == [0, 1, 2]
+    for wait, expected in zip(waits, (0.3, 0.35, 0.4)):
+        assert abs(wait - expected) < 5e-3, f"暂停后应逐个放行: {waits}"
+    assert released[0] >= 0.3 - TOLERANCE
+    print(f"✅ 暂停 0.3s 后按速率放行: {[round(moment, 3) for moment in released]}")
+
+
+def test_pause_holds_callers_then_keeps_rate():
+    asyncio.run(_pause_holds_callers_then_keeps_rate())
+
+
+async def _cancelled_waiter_returns_its_token():
+    bucket = TokenBucket(rate=10, burst=1)
+    await bucket.acquire()
+    waiter = asyncio.ensure_future(bucket.acquire())
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    try:
+        await waiter
+    except asyncio.CancelledError:
+        pass
+
+    waited = await bucket.acquire()
+    assert waited <= 0.1 + 1e-3, f"取消的预约应归还令牌，实际等待 {waited:.3f}s"
+    assert bucket.stats()["acquired"] == 2
+    print(f"✅ 取消排队后令牌归还，下一个申请等待 {waited:.3f}s")
+
+
+def test_cancelled_waiter_returns_its_token():
+    asyncio.run(_cancelled_waiter_returns_its_token())
+
+
+async def _creates_queue_after_throttle():
+    limiter = RateLimiter(RateLimitConfig(create_rate=10, create_burst=2, read_rate=50, read_burst=50))
+    async with FakeReplicate(create_faults=["throttle"]) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url, rate_limiter=limiter) as client:
+            predictions = await asyncio.gather(*(
+                client.create_prediction(FAKE_VERSION_ID, {"prompt": f"limited {index}"})
+                for index in range(4)
+            ))
+
+    assert len({prediction.id for prediction in predictions}) == 4
+    assert limiter.throttle_events == 1, "429 应暂停整个限流器"
+    create = limiter.stats()["create"]
+    # 4 次首发 + 被 429 拒绝后的 1 次重试
+    assert create["acquired"] == 5 and fake.count_requests("POST", "/v1/predictions") == 5
+    assert create["waited"] >= 3 and create["max_wait"] >= 0.2 - TOLERANCE
+    waits = sorted(prediction.queue_wait for prediction in predictions)
+    assert waits[:2] == [0.0, 0.0] and waits[-1] > 0, f"超出突发额度的创建应排队: {waits}"
+    print(f"✅ 429 后创建请求排队重试，queue_wait: {[round(w, 3) for w in waits]}，统计: {create}")
+
+
+def test_creates_queue_after_throttle():
+    asyncio.run(_creates_queue_after_throttle())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("客户端限流测试")
+    print("=" * 60)
+    test_reservations_are_fifo_and_spaced()
+    test_pause_holds_callers_then_keeps_rate()
+    test_cancelled_waiter_returns_its_token()
+    test_creates_queue_after_throttle()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+重试与熔断测试
+使用本地 Replicate 替身服务注入故障，验证有界重试、创建请求不重复提交以及熔断
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.replicate_client import ReplicateClient
+from core.retry import (
+    AmbiguousCreateError, CircuitBreaker, CircuitOpenError, ReplicateNetworkError, RetryPolicy,
+    call_with_retry,
+)
+from fake_replicate import FAKE_VERSION_ID, FakeReplicate
+
+FAST_RETRY = RetryPolicy(max_attempts=4, base_delay=0.05, max_delay=0.2, deadline=10)
+
+
+async def _create_retries_when_not_submitted():
+    async with FakeReplicate(create_faults=["before", "throttle"]) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url, retry_policy=FAST_RETRY) as client:
+            prediction = await client.create_prediction(FAKE_VERSION_ID, {"prompt": "retry"})
+
+        assert prediction.id in fake.predictions
+        assert len(fake.predictions) == 1
+        assert fake.count_requests("POST", "/v1/predictions") == 3
+        print(f"✅ 未提交的创建请求被重试: {prediction.id}")
+
+
+async def _create_recovers_instead_of_resubmitting():
+    async with FakeReplicate(create_faults=["after"]) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url, retry_policy=FAST_RETRY) as client:
+            prediction = await client.create_prediction(FAKE_VERSION_ID, {"prompt": "lost response"})
+
+        assert len(fake.predictions) == 1, "响应丢失时不得重复提交预测"
+        assert prediction.id in fake.predictions
+        assert fake.count_requests("POST", "/v1/predictions") == 1
+        print(f"✅ 响应丢失后找回已创建的预测: {prediction.id}")
+
+
+async def _concurrent_recovery_claims_own_prediction():
+    payload = {"prompt": "same payload"}
+    async with FakeReplicate(create_faults=["after"]) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url, retry_policy=FAST_RETRY) as client:
+            predictions = await asyncio.gather(
+                client.create_prediction(FAKE_VERSION_ID, payload),
+                client.create_prediction(FAKE_VERSION_ID, payload),
+            )
+
+        ids = [prediction.id for prediction in predictions]
+        assert len(set(ids)) == 2, f"并发槽位不得认领同一个预测: {ids}"
+        assert set(ids) == set(fake.predictions), "不应留下未被认领的预测"
+        print(f"✅ 并发创建各自找回自己的预测: {ids}")
+
+
+async def _recovery_waits_for_open_sibling():
+    payload = {"prompt": "held open", "_duration": 1.0}
+    # 兄弟槽位的创建请求因 Prefer: wait 保持连接，其预测已存在但尚未被认领；
+    # 本槽位的创建在提交前失败，找回时不得把兄弟的预测当作自己的
+    async with FakeReplicate(create_faults=["ok", "before"]) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url, retry_policy=FAST_RETRY) as client:
+            sibling = asyncio.ensure_future(client.create_prediction(FAKE_VERSION_ID, payload, wait=5))
+            await asyncio.sleep(0.2)
+            own = await client.create_prediction(FAKE_VERSION_ID, payload, wait=5)
+            held = await sibling
+
+        assert own.id != held.id, f"不得认领兄弟槽位的预测: {own.id}"
+        assert set(fake.predictions) == {own.id, held.id}
+        assert fake.count_requests("POST", "/v1/predictions") == 3
+        print(f"✅ 找回前等待保持连接的兄弟创建请求: {held.id} / {own.id}")
+
+
+async def _ambiguous_recovery_does_not_guess():
+    payload = {"prompt": "same payload"}
+    # 另一次执行先用相同输入创建了预测，本客户端的创建响应随后丢失
+    async with FakeReplicate(create_faults=["ok", "after"]) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url, retry_policy=FAST_RETRY) as other:
+            await other.create_prediction(FAKE_VERSION_ID, payload)
+        async with ReplicateClient("test-token", base_url=fake.base_url, retry_policy=FAST_RETRY) as client:
+            try:
+                await client.create_prediction(FAKE_VERSION_ID, payload)
+                raise AssertionError("存在多个候选预测时应放弃猜测")
+            except AmbiguousCreateError as exc:
+                assert "matching predictions" in str(exc)
+
+        assert len(fake.predictions) == 2, "无法确定时不得重复提交"
+        print("✅ 多个候选预测时放弃猜测")
+
+
+async def _circuit_opens_and_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    calls = 0
+
+    async def unreachable():
+        nonlocal calls
+        calls += 1
+        raise ReplicateNetworkError("down", connect_failed=True)
+
+    try:
+        await call_with_retry(unreachable, FAST_RETRY, breaker=breaker)
+    except (ReplicateNetworkError, CircuitOpenError):
+        pass
+
+    assert breaker.state == CircuitBreaker.OPEN
+    calls_before = calls
+    try:
+        await call_with_retry(unreachable, FAST_RETRY, breaker=breaker)
+        raise AssertionError("熔断打开后应直接失败")
+    except CircuitOpenError:
+        pass
+    assert calls == calls_before, "熔断打开后不应再发送请求"
+    print("✅ 连续失败后熔断并快速失败")
+
+
+def test_create_retries_when_not_submitted():
+    asyncio.run(_create_retries_when_not_submitted())
+
+
+def test_create_recovers_instead_of_resubmitting():
+    asyncio.run(_create_recovers_instead_of_resubmitting())
+
+
+def test_concurrent_recovery_claims_own_prediction():
+    asyncio.run(_concurrent_recovery_claims_own_prediction())
+
+
+def test_recovery_waits_for_open_sibling():
+    asyncio.run(_recovery_waits_for_open_sibling())
+
+
+def test_ambiguous_recovery_does_not_guess():
+    asyncio.run(_ambiguous_recovery_does_not_guess())
+
+
+def test_circuit_opens_and_fails_fast():
+    asyncio.run(_circuit_opens_and_fails_fast())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("Replicate 重试与熔断测试")
+    print("=" * 60)
+    test_create_retries_when_not_submitted()
+    test_create_recovers_instead_of_resubmitting()
+    test_concurrent_recovery_claims_own_prediction()
+    test_recovery_waits_for_open_sibling()
+    test_ambiguous_recovery_does_not_guess()
+    test_circuit_opens_and_fails_fast()
+
+
+if __name__ == "__main__":
+    main()
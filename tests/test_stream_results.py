@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+按完成顺序处理结果测试
+验证并发模式下每个预测成功后立即下载解码，慢预测不再拖延其余结果，且输出顺序保持确定
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.nodes import ReplicateNanoBanana
+from core.replicate_client import ReplicateClient
+from fake_replicate import FakeReplicate
+
+
+class _StreamingNanoBanana(ReplicateNanoBanana):
+    MODEL_NAME = "nano-banana-stream-test"
+    SYNC_WAIT_SECONDS = 5
+
+
+async def _outputs_decoded_as_predictions_finish():
+    node = _StreamingNanoBanana()
+    slow, download = 1.5, 0.4
+    async with FakeReplicate(
+        default_duration=0.1, cold_starts=[0, 0, slow], output_urls=True, download_delay=download
+    ) as fake:
+        # One download at a time: collecting after the slowest prediction would take 3 downloads
+        async with ReplicateClient(
+            "test-token", base_url=fake.base_url, download_concurrency=1
+        ) as client:
+            start = time.monotonic()
+            images, _, records = await node._run_prediction_batch(
+                client, {"prompt": "hi"}, 3, concurrent=True
+            )
+            elapsed = time.monotonic() - start
+
+    assert len(images) == 3
+    assert elapsed < slow + 2 * download, f"慢预测之后应只剩一次下载，实际 {elapsed:.2f}s"
+    assert [record["slot"] for record in records] == [1, 2, 3], "结果应按槽位顺序排列"
+    print(f"✅ 三个预测（最慢 {slow}s）共耗时 {elapsed:.2f}s")
+
+
+def test_outputs_decoded_as_predictions_finish():
+    asyncio.run(_outputs_decoded_as_predictions_finish())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("按完成顺序处理结果测试")
+    print("=" * 60)
+    test_outputs_decoded_as_predictions_finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+同步模式（Prefer: wait）测试
+使用本地 Replicate 替身服务，验证阻塞式创建与回退轮询
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.replicate_client import ReplicateClient
+from fake_replicate import FAKE_VERSION_ID, FakeReplicate
+
+
+async def _sync_create_returns_result():
+    async with FakeReplicate(default_duration=0.3) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            prediction = await client.create_prediction(FAKE_VERSION_ID, {"prompt": "hi"}, wait=5)
+
+        assert prediction.status == "succeeded", prediction.status
+        assert prediction.output, "同步模式应直接返回输出"
+        assert fake.count_requests("GET") == 0, "同步模式不应产生轮询请求"
+        print(f"✅ 同步创建直接返回结果: {prediction.id}")
+
+
+async def _sync_create_falls_back_to_polling():
+    async with FakeReplicate(default_duration=1.5) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            prediction = await client.create_prediction(FAKE_VERSION_ID, {"prompt": "hi"}, wait=1)
+            assert prediction.status != "succeeded", "等待上限应早于预测完成"
+
+            result = await client.wait_for_prediction(prediction.id, timeout=10, poll_interval=1)
+
+        assert result.status == "succeeded", result.status
+        assert fake.count_requests("GET") >= 1
+        print(f"✅ 超过等待上限后回退轮询: {fake.count_requests('GET')} 次查询")
+
+
+async def _sync_mode_saves_poll_interval():
+    async with FakeReplicate(default_duration=0.3) as fake:
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            start = time.monotonic()
+            prediction = await client.create_prediction(FAKE_VERSION_ID, {"prompt": "poll"})
+            await client.wait_for_prediction(prediction.id, timeout=10, poll_interval=2)
+            polling_latency = time.monotonic() - start
+
+            start = time.monotonic()
+            await client.create_prediction(FAKE_VERSION_ID, {"prompt": "sync"}, wait=5)
+            sync_latency = time.monotonic() - start
+
+    print(f"   轮询耗时 {polling_latency:.2f}s，同步耗时 {sync_latency:.2f}s")
+    assert polling_latency - sync_latency >= 1.5, "同步模式应省去至少一个轮询间隔"
+    print("✅ 同步模式省去轮询等待")
+
+
+def test_sync_create_returns_result():
+    asyncio.run(_sync_create_returns_result())
+
+
+def test_sync_create_falls_back_to_polling():
+    asyncio.run(_sync_create_falls_back_to_polling())
+
+
+def test_sync_mode_saves_poll_interval():
+    asyncio.run(_sync_mode_saves_poll_interval())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("Replicate 同步模式测试")
+    print("=" * 60)
+    test_sync_create_returns_result()
+    test_sync_create_falls_back_to_polling()
+    test_sync_mode_saves_poll_interval()
+    print("\n🎉 同步模式测试通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+上传编码策略测试
+验证 PNG 压缩级别、无损 WebP 以及按字节预算搜索质量的 JPEG/WebP 编码，并报告格式、字节数与耗时
+"""
+
+import base64
+import io
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.utils import UploadEncoding, encode_image
+
+
+def _photo(seed=0, size=512):
+    """平滑渐变叠加噪声，接近照片的压缩特性"""
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 200, size, dtype=np.float32)
+    base = ramp[:, None, None] * 0.5 + ramp[None, :, None] * 0.5
+    pixels = base + rng.normal(0, 12, (size, size, 3))
+    return np.clip(pixels, 0, 255).astype(np.uint8)
+
+
+def _decode(data_uri):
+    header, data = data_uri.split(",", 1)
+    return header, np.asarray(Image.open(io.BytesIO(base64.b64decode(data))).convert("RGB"))
+
+
+def test_lossless_formats_round_trip():
+    pixels = _photo()
+    for encoding in (
+        UploadEncoding(format="png", png_compress_level=1),
+        UploadEncoding(format="png", png_compress_level=9),
+        UploadEncoding(format="webp_lossless"),
+    ):
+        encoded = encode_image(pixels, encoding)
+        header, decoded = _decode(encoded.data_uri)
+        assert np.array_equal(decoded, pixels), f"{encoding.format} 应为无损编码"
+        assert encoded.quality is None and encoded.seconds > 0
+        print(f"✅ {header}: {encoded.report()}")
+
+
+def test_quality_search_fits_byte_budget():
+    pixels = _photo(1)
+    for fmt in ("jpeg", "webp"):
+        unbounded = encode_image(pixels, UploadEncoding(format=fmt, quality=90))
+        budget = unbounded.bytes // 2
+        encoded = encode_image(pixels, UploadEncoding(format=fmt, quality=90, max_bytes=budget))
+
+        assert encoded.bytes <= budget, f"{fmt} 应在预算 {budget} 字节内"
+        assert 40 <= encoded.quality < 90
+        # 预算内取最高质量：再高一档就会超出预算
+        higher = encode_image(
+            pixels, UploadEncoding(format=fmt, quality=encoded.quality + 1, max_bytes=None)
+        )
+        assert higher.bytes > budget
+        assert encoded.report()["format"] == fmt
+        print(f"✅ {fmt} 预算 {budget} 字节 -> 质量 {encoded.quality}，{encoded.bytes} 字节")
+
+
+def test_unreachable_budget_uses_min_quality():
+    encoded = encode_image(_photo(2), UploadEncoding(format="jpeg", max_bytes=100, min_quality=30))
+    assert encoded.quality == 30
+    print(f"✅ 预算不可达时使用最低质量: {encoded.bytes} 字节")
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("上传编码策略测试")
+    print("=" * 60)
+    test_lossless_formats_round_trip()
+    test_quality_search_fits_byte_budget()
+    test_unreachable_budget_uses_min_quality()
+
+
+if __name__ == "__main__":
+    main()
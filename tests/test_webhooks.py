@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Webhook 推送测试
+本地 Replicate 替身服务在预测完成后回调内嵌 webhook 端点，验证等待协程被推送唤醒
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加插件根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import aiohttp
+
+import core.webhooks as webhooks
+from core.nodes import ReplicateNanoBanana
+from core.polling import PollingPolicy
+from core.replicate_client import ReplicateClient
+from core.webhooks import WEBHOOK_EVENTS, WebhookConfig, WebhookReceiver
+from fake_replicate import FAKE_VERSION_ID, FakeReplicate
+
+# 安全网轮询足够慢，确保结果只能来自 webhook 推送
+SAFETY_NET = PollingPolicy(initial_interval=30.0, multiplier=1.0, max_interval=30.0, jitter=0.0)
+
+
+async def _webhook_wakes_waiter():
+    async with FakeReplicate(default_duration=0.5) as fake:
+        receiver = WebhookReceiver(WebhookConfig(
+            enabled=True, mode="embedded", port=0, allow_local_url=True,
+        ))
+        async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+            await receiver.ensure_started(client)
+            try:
+                start = time.monotonic()
+                prediction = await client.create_prediction(
+                    FAKE_VERSION_ID,
+                    {"prompt": "hi"},
+                    webhook=receiver.webhook_url,
+                    webhook_events_filter=WEBHOOK_EVENTS,
+                )
+                receiver.subscribe(prediction.id, client.poller.notify)
+                result = await client.wait_for_prediction(
+                    prediction.id, timeout=10, poll_interval=SAFETY_NET, first_poll_delay=30.0
+                )
+                elapsed = time.monotonic() - start
+            finally:
+                receiver.unsubscribe(prediction.id)
+                await receiver.stop()
+
+        assert result.status == "succeeded", result.status
+        assert result.output, "webhook 事件应携带输出"
+        assert fake.count_requests("GET") == 0, "结果应由 webhook 推送而非轮询获得"
+        assert elapsed < 5, f"等待耗时过长: {elapsed:.2f}s"
+        assert receiver.events_received == 1
+        print(f"✅ webhook 推送唤醒等待协程，耗时 {elapsed:.2f}s")
+
+
+async def _unsigned_events_rejected():
+    async with FakeReplicate() as fake:
+        receiver = WebhookReceiver(WebhookConfig(
+            enabled=True, mode="embedded", port=0, secret=fake.webhook_secret, allow_local_url=True,
+        ))
+        await receiver.ensure_started()
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(receiver.webhook_url, json={"id": "pred-x", "status": "succeeded"}) as response:
+                    unsigned_status = response.status
+
+                body = b'{"id": "pred-x", "status": "succeeded"}'
+                headers = {
+                    "webhook-id": "msg_x",
+                    "webhook-timestamp": str(int(time.time())),
+                    "webhook-signature": "v1,invalid",
+                }
+                async with session.post(receiver.webhook_url, data=body, headers=headers) as response:
+                    forged_status = response.status
+        finally:
+            await receiver.stop()
+
+    assert unsigned_status == 401 and forged_status == 401
+    assert receiver.events_rejected == 2 and receiver.events_received == 0
+    print("✅ 未签名或签名错误的事件被拒绝")
+
+
+class _WebhookNanoBanana(ReplicateNanoBanana):
+    MODEL_NAME = "nano-banana-webhook-test"
+    SYNC_WAIT_SECONDS = 5
+
+
+def _config_from_env(**env):
+    keys = ("REPLICATE_WEBHOOK_ENABLED", "REPLICATE_WEBHOOK_URL")
+    saved = {key: os.environ.pop(key, None) for key in keys}
+    os.environ.update(env)
+    try:
+        return WebhookConfig.from_env()
+    finally:
+        for key in keys:
+            os.environ.pop(key, None)
+            if saved[key] is not None:
+                os.environ[key] = saved[key]
+
+
+def test_unreachable_urls_disable_webhooks():
+    config = _config_from_env(REPLICATE_WEBHOOK_ENABLED="1")
+    assert config.enabled and config.host == "127.0.0.1", "内嵌端点默认只监听本机"
+    receiver = WebhookReceiver(config)
+    assert not receiver.enabled and "REPLICATE_WEBHOOK_URL" in receiver.disabled_reason
+
+    for url in ("http://127.0.0.1:8190/replicate/webhook", "http://localhost/hook",
+                "http://[::1]:8190/hook", "http://0.0.0.0:8190/hook"):
+        receiver = WebhookReceiver(_config_from_env(REPLICATE_WEBHOOK_URL=url))
+        assert not receiver.enabled, f"{url} 不能被 Replicate 访问"
+
+    receiver = WebhookReceiver(_config_from_env(REPLICATE_WEBHOOK_URL="https://hooks.example.com/replicate"))
+    assert receiver.enabled and receiver.webhook_url == "https://hooks.example.com/replicate"
+    print("✅ 未设置或回环地址的 webhook URL 被拒绝")
+
+
+async def _unreachable_url_falls_back_to_polling():
+    receiver = WebhookReceiver(WebhookConfig(enabled=True, mode="embedded", port=0))
+    try:
+        await receiver.ensure_started()
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("没有可访问的 URL 时不应启动端点")
+    assert receiver._runner is None
+
+    previous, webhooks._default_receiver = webhooks._default_receiver, receiver
+    try:
+        async with FakeReplicate(default_duration=0.2) as fake:
+            async with ReplicateClient("test-token", base_url=fake.base_url) as client:
+                images, _, _ = await _WebhookNanoBanana()._run_prediction_batch(client, {"prompt": "hi"}, 1)
+    finally:
+        webhooks._default_receiver = previous
+
+    assert len(images) == 1
+    assert all(record["webhook"] is None for record in fake.predictions.values()), "不应把回环地址发给 Replicate"
+    assert not fake.webhook_deliveries
+    print("✅ webhook 不可用时回退到普通轮询")
+
+
+def test_unreachable_url_falls_back_to_polling():
+    asyncio.run(_unreachable_url_falls_back_to_polling())
+
+
+def test_webhook_wakes_waiter():
+    asyncio.run(_webhook_wakes_waiter())
+
+
+def test_unsigned_events_rejected():
+    asyncio.run(_unsigned_events_rejected())
+
+
+def main():
+    """运行全部测试"""
+    print("=" * 60)
+    print("Replicate Webhook 测试")
+    print("=" * 60)
+    test_webhook_wakes_waiter()
+    test_unsigned_events_rejected()
+    test_unreachable_urls_disable_webhooks()
+    test_unreachable_url_falls_back_to_polling()
+    print("\n🎉 Webhook 测试通过")
+
+
+if __name__ == "__main__":
+    main()